@@ -1,327 +1,638 @@
-import os
-import re
-import asyncio
-import psycopg2
-from psycopg2.extras import RealDictCursor
-from flask import Flask, render_template, request, redirect, url_for, session, flash
-from dotenv import load_dotenv
-
-# Загрузка переменных окружения
-load_dotenv()
-DATABASE_URL = os.getenv("DATABASE_URL")
-SCHEDULE_DATABASE_URL = os.getenv("SCHEDULE_DATABASE_URL")
-FLASK_SECRET_KEY = os.getenv("FLASK_SECRET_KEY", "your_secret_key")
-TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_TOKEN")
-
-app = Flask(__name__)
-app.secret_key = FLASK_SECRET_KEY
-
-
-# -------------------- Функции подключения к базам данных --------------------
-
-def get_db_connection():
-    """Подключение к основной базе (students, deans)."""
-    return psycopg2.connect(DATABASE_URL, cursor_factory=RealDictCursor)
-
-def get_schedule_db_connection():
-    """Подключение к базе расписания."""
-    return psycopg2.connect(SCHEDULE_DATABASE_URL, cursor_factory=RealDictCursor)
-
-# -------------------- Инициализация таблиц --------------------
-
-def init_db():
-    """
-    Создаем таблицы для студентов и деканата.
-    Поля direction и group_number выделяются отдельно.
-    """
-    conn = get_db_connection()
-    with conn.cursor() as cursor:
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS students (
-                id SERIAL PRIMARY KEY,
-                telegram_id BIGINT UNIQUE,
-                first_name TEXT,
-                last_name TEXT,
-                direction TEXT,
-                group_number TEXT
-            )
-        ''')
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS deans (
-                id SERIAL PRIMARY KEY,
-                username TEXT UNIQUE,
-                password TEXT
-            )
-        ''')
-    conn.commit()
-    conn.close()
-
-def init_schedule_db():
-    """
-    Создаем таблицы расписания для направлений.
-    Для каждого направления создаем уникальный индекс, чтобы не дублировать запись по 
-    (group_number, week_type, day_of_week) или (direction, group_number, week_type, day_of_week) для schedule_other.
-    """
-    conn = get_schedule_db_connection()
-    with conn.cursor() as cursor:
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS schedule_PI (
-                id SERIAL PRIMARY KEY,
-                group_number TEXT,
-                week_type TEXT,
-                day_of_week TEXT,
-                schedule_text TEXT
-            )
-        ''')
-        cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS schedule_pi_unique_idx ON schedule_PI (group_number, week_type, day_of_week)")
-
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS schedule_PRI (
-                id SERIAL PRIMARY KEY,
-                group_number TEXT,
-                week_type TEXT,
-                day_of_week TEXT,
-                schedule_text TEXT
-            )
-        ''')
-        cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS schedule_pri_unique_idx ON schedule_PRI (group_number, week_type, day_of_week)")
-
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS schedule_BI (
-                id SERIAL PRIMARY KEY,
-                group_number TEXT,
-                week_type TEXT,
-                day_of_week TEXT,
-                schedule_text TEXT
-            )
-        ''')
-        cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS schedule_bi_unique_idx ON schedule_BI (group_number, week_type, day_of_week)")
-
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS schedule_other (
-                id SERIAL PRIMARY KEY,
-                direction TEXT,
-                group_number TEXT,
-                week_type TEXT,
-                day_of_week TEXT,
-                schedule_text TEXT
-            )
-        ''')
-        cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS schedule_other_unique_idx ON schedule_other (direction, group_number, week_type, day_of_week)")
-    conn.commit()
-    conn.close()
-
-# -------------------- Маршруты веб-интерфейса --------------------
-
-@app.route('/')
-def index():
-    return render_template('index.html')
-
-@app.route('/login', methods=['GET', 'POST'])
-def login():
-    if request.method == 'POST':
-        username = request.form.get('username')
-        password = request.form.get('password')
-        conn = get_db_connection()
-        cur = conn.cursor()
-        cur.execute("SELECT * FROM deans WHERE username = %s", (username,))
-        dean = cur.fetchone()
-        conn.close()
-        if dean and dean['password'] == password:
-            session['user'] = username
-            return redirect(url_for('dashboard'))
-        else:
-            flash('Неверный логин или пароль', 'error')
-    return render_template('login.html')
-
-@app.route('/register_dean', methods=['GET', 'POST'])
-def register_dean():
-    if request.method == 'POST':
-        username = request.form.get('username')
-        password = request.form.get('password')
-        conn = get_db_connection()
-        cur = conn.cursor()
-        try:
-            cur.execute("INSERT INTO deans (username, password) VALUES (%s, %s)", (username, password))
-            conn.commit()
-            flash('Регистрация прошла успешно. Теперь авторизуйтесь.', 'success')
-            return redirect(url_for('login'))
-        except psycopg2.IntegrityError:
-            conn.rollback()
-            flash('Пользователь с таким логином уже существует', 'error')
-        finally:
-            conn.close()
-    return render_template('register_dean.html')
-
-@app.route('/dashboard')
-def dashboard():
-    if 'user' not in session:
-        return redirect(url_for('login'))
-    return render_template('dashboard.html')
-
-@app.route('/create_event', methods=['GET', 'POST'])
-def create_event():
-    if 'user' not in session:
-        return redirect(url_for('login'))
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM students")
-    students = cur.fetchall()
-    conn.close()
-    if request.method == 'POST':
-        selected_ids = request.form.getlist('student')
-        message_text = request.form.get('message')
-        async def send_notifications(chat_ids, text):
-            from aiogram import Bot
-            bot = Bot(token=TELEGRAM_BOT_TOKEN)
-            for chat_id in chat_ids:
-                try:
-                    await bot.send_message(chat_id=chat_id, text=text)
-                except Exception as e:
-                    print(f"Ошибка при отправке уведомления пользователю {chat_id}: {e}")
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        loop.run_until_complete(send_notifications(selected_ids, message_text))
-        loop.close()
-        flash("Уведомления отправлены!", "success")
-        return render_template('create_event.html', students=students)
-    return render_template('create_event.html', students=students)
-
-@app.route('/add_schedule', methods=['GET', 'POST'])
-def add_schedule():
-    if 'user' not in session:
-        return redirect(url_for('login'))
-    
-    # Определяем временные интервалы для пар
-    pairs_info = [
-        ("08:00", "09:30"),
-        ("09:40", "11:10"),
-        ("11:20", "12:50"),
-        ("13:20", "14:50"),
-        ("15:00", "16:30"),
-        ("16:40", "18:10"),
-        ("18:20", "19:50"),
-        ("19:55", "21:25"),
-    ]
-    
-    if request.method == 'POST':
-        direction = request.form.get('direction', '').strip().upper()
-        group_number = request.form.get('group_number', '').strip()
-        day_of_week = request.form.get('day_of_week', '').strip()
-        week_type = request.form.get('week_type', '').strip()
-        
-        # Собираем данные для каждой пары (4 поля: предмет, тип занятия, преподаватель, аудитория)
-        schedule_lines = []
-        for i, (start_time, end_time) in enumerate(pairs_info):
-            subject = request.form.get(f"subject_{i}", "").strip()
-            lesson_type = request.form.get(f"type_{i}", "").strip()
-            teacher = request.form.get(f"teacher_{i}", "").strip()
-            room = request.form.get(f"room_{i}", "").strip()
-            
-            # Если все поля пустые, считаем, что пары нет; иначе формируем красиво отформатированную строку
-            if not any([subject, lesson_type, teacher, room]):
-                schedule_lines.append(f"{i+1}) {start_time}-{end_time}: Пары нет.")
-            else:
-                # Форматирование:
-                # Предмет – жирным, преподаватель – курсивом, аудитория – верхним регистром.
-                line = f"{i+1}) {start_time}-{end_time}: "
-                line += f"<b>{subject or '-'}</b>"
-                if lesson_type:
-                    line += f" ({lesson_type})"
-                if teacher:
-                    line += f"<br><i>{teacher}</i>"
-                if room:
-                    line += f", ауд. {room.upper()}"
-                schedule_lines.append(line)
-        
-        schedule_text = "<br>".join(schedule_lines)  # Используем <br> для переноса строк в HTML
-
-        if not all([direction, group_number, day_of_week, week_type]):
-            flash("Направление, номер группы, тип недели и день недели обязательны для заполнения!", "error")
-            return render_template('add_schedule.html', pairs_info=pairs_info, enumerate=enumerate)
-        
-        # Определяем таблицу расписания по направлению
-        if direction == "ПИ":
-            table_name = "schedule_PI"
-        elif direction == "ПРИ":
-            table_name = "schedule_PRI"
-        elif direction == "БИ":
-            table_name = "schedule_BI"
-        else:
-            table_name = "schedule_other"
-        
-        try:
-            conn = get_schedule_db_connection()
-            cur = conn.cursor()
-            if table_name == "schedule_other":
-                query = f"""
-                    INSERT INTO {table_name} (direction, group_number, week_type, day_of_week, schedule_text)
-                    VALUES (%s, %s, %s, %s, %s)
-                    ON CONFLICT (direction, group_number, week_type, day_of_week)
-                    DO UPDATE SET schedule_text = EXCLUDED.schedule_text
-                """
-                cur.execute(query, (direction, group_number, week_type, day_of_week, schedule_text))
-            else:
-                query = f"""
-                    INSERT INTO {table_name} (group_number, week_type, day_of_week, schedule_text)
-                    VALUES (%s, %s, %s, %s)
-                    ON CONFLICT (group_number, week_type, day_of_week)
-                    DO UPDATE SET schedule_text = EXCLUDED.schedule_text
-                """
-                cur.execute(query, (group_number, week_type, day_of_week, schedule_text))
-            conn.commit()
-            conn.close()
-            flash("Расписание успешно добавлено/обновлено", "success")
-            return render_template('add_schedule.html', pairs_info=pairs_info, enumerate=enumerate)
-        except Exception as e:
-            flash(f"Ошибка при добавлении расписания: {e}", "error")
-            return render_template('add_schedule.html', pairs_info=pairs_info, enumerate=enumerate)
-    
-    return render_template('add_schedule.html', pairs_info=pairs_info, enumerate=enumerate)
-
-@app.route('/register', methods=['GET', 'POST'])
-def register_handler():
-    if request.method == 'POST':
-        data = request.form.get('data', '').strip()
-        parts = data.split()
-        if len(parts) != 3:
-            flash("Неверный формат. Введите данные как: Имя Фамилия Группа", "error")
-            return redirect(url_for('register_handler'))
-        first_name, last_name, group = parts
-        match = re.match(r"([А-ЯЁA-Z]+)-?(\d+)", group, re.IGNORECASE)
-        if match:
-            direction = match.group(1).upper()
-            group_number = match.group(2)
-        else:
-            direction = "OTHER"
-            group_number = group
-        telegram_id = request.form.get('telegram_id', '')
-        conn = get_db_connection()
-        with conn.cursor() as cursor:
-            cursor.execute(
-                """
-                INSERT INTO students (telegram_id, first_name, last_name, group_name, direction, group_number)
-                VALUES (%s, %s, %s, %s, %s, %s)
-                ON CONFLICT (telegram_id) DO UPDATE
-                SET first_name = EXCLUDED.first_name,
-                    last_name = EXCLUDED.last_name,
-                    group_name = EXCLUDED.group_name,
-                    direction = EXCLUDED.direction,
-                    group_number = EXCLUDED.group_number;
-                """,
-                (telegram_id, first_name, last_name, group, direction, group_number)
-            )
-        conn.commit()
-        conn.close()
-        flash("Вы успешно зарегистрированы!", "success")
-        return redirect(url_for('index'))
-    return render_template('register.html')
-
-@app.route('/index')
-def start_page():
-    return render_template('index.html')
-
-if __name__ == '__main__':
-    init_db()
-    init_schedule_db()
-    app.run(debug=True, host='0.0.0.0', port=5000)
+import os
+import json
+import atexit
+import time
+import hashlib
+import asyncio
+import threading
+import psycopg2
+from psycopg2.errors import UniqueViolation
+from flask import Flask, Blueprint, render_template, request, redirect, url_for, session, flash, abort
+from jinja2 import FileSystemBytecodeCache
+from dotenv import load_dotenv
+from schedule_db import (
+    PAIRS_INFO, WEEK_TYPES, DAYS_OF_WEEK, ScheduleConflictError,
+    init_schedule_slots, init_schedule_versions, init_schedule_history, rebuild_schedule_slots,
+    init_schedule_coverage, get_schedule_coverage, init_timetable_images,
+    save_day_schedule, find_slot_conflicts, find_teacher_slots, get_schedule_version, get_group_slots,
+)
+from students_db import (
+    parse_group, init_roster, parse_roster_csv, import_roster, init_group_stats, get_group_stats,
+)
+from schedule_ical import ical_etag, render_group_calendar
+from http_cache import VersionedCache, conditional_response, compress_response
+from static_assets import init_static_assets
+from metrics import init_flask
+from db import main_database, schedule_database, get_db_connection, get_schedule_db_connection
+from profiling import install_flask_profiler
+# aiogram нужен только для рассылки из create_event, но импортируется здесь, а не в запросе:
+# с gunicorn --preload это происходит один раз в главном процессе до fork (aiogram есть в requirements.txt)
+from aiogram import Bot
+from fanout import telegram_session, broadcast
+
+# Загрузка переменных окружения
+load_dotenv()
+FLASK_SECRET_KEY = os.getenv("FLASK_SECRET_KEY", "your_secret_key")
+TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_TOKEN")
+# Скомпилированные шаблоны сохраняются между перезапусками
+JINJA_CACHE_DIR = os.getenv("JINJA_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".jinja_cache"))
+
+# Маршруты панели; само приложение собирает create_app()
+panel = Blueprint('panel', __name__)
+
+# Кэши готовых ответов по версии расписания группы (iCal-ленты и JSON API)
+ical_cache = VersionedCache(maxsize=512, name="ical")
+api_cache = VersionedCache(maxsize=2048, name="schedule_api")
+
+
+# -------------------- Подключения к базам данных --------------------
+# Запись – get_db_connection() / get_schedule_db_connection() (основная база),
+# чтение – read_connection(): реплика, если она задана и не отстаёт.
+
+def mark_written():
+    """
+    Время последней записи хранится в сессии, а не в процессе: следующий запрос того же
+    декана может попасть в другой процесс gunicorn, но тоже прочитает из основной базы.
+    """
+    session['db_written_at'] = time.time()
+
+def read_connection(database):
+    return database.connect_read(written_at=session.get('db_written_at'))
+
+# -------------------- Инициализация таблиц --------------------
+# Без preload каждый рабочий процесс gunicorn создаёт схему сам; блокировка на время
+# транзакции не даёт им одновременно выполнять CREATE TABLE IF NOT EXISTS
+SCHEMA_LOCK_ID = 7310421
+
+def init_db():
+    """
+    Создаем таблицы для студентов и деканата.
+    Поля direction и group_number выделяются отдельно.
+    """
+    conn = get_db_connection()
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_xact_lock(%s)", (SCHEMA_LOCK_ID,))
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS students (
+                id SERIAL PRIMARY KEY,
+                telegram_id BIGINT UNIQUE,
+                first_name TEXT,
+                last_name TEXT,
+                direction TEXT,
+                group_number TEXT
+            )
+        ''')
+        init_roster(cursor)
+        # Подписка на утреннюю рассылку расписания и журнал отправленных рассылок
+        cursor.execute("ALTER TABLE students ADD COLUMN IF NOT EXISTS digest_enabled BOOLEAN NOT NULL DEFAULT FALSE")
+        # Логин и пароль портала сохраняет бот; сводка group_stats считает их заполненность
+        cursor.execute("ALTER TABLE students ADD COLUMN IF NOT EXISTS user_login TEXT")
+        cursor.execute("ALTER TABLE students ADD COLUMN IF NOT EXISTS user_password TEXT")
+        init_group_stats(cursor)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS digest_deliveries (
+                digest_date DATE NOT NULL,
+                telegram_id BIGINT NOT NULL,
+                PRIMARY KEY (digest_date, telegram_id)
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS deans (
+                id SERIAL PRIMARY KEY,
+                username TEXT UNIQUE,
+                password TEXT
+            )
+        ''')
+    conn.commit()
+    conn.close()
+
+def init_schedule_db():
+    """
+    Создаем таблицы расписания для направлений.
+    Для каждого направления создаем уникальный индекс, чтобы не дублировать запись по 
+    (group_number, week_type, day_of_week) или (direction, group_number, week_type, day_of_week) для schedule_other.
+    """
+    conn = get_schedule_db_connection()
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_xact_lock(%s)", (SCHEMA_LOCK_ID,))
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS schedule_PI (
+                id SERIAL PRIMARY KEY,
+                group_number TEXT,
+                week_type TEXT,
+                day_of_week TEXT,
+                schedule_text TEXT
+            )
+        ''')
+        cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS schedule_pi_unique_idx ON schedule_PI (group_number, week_type, day_of_week)")
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS schedule_PRI (
+                id SERIAL PRIMARY KEY,
+                group_number TEXT,
+                week_type TEXT,
+                day_of_week TEXT,
+                schedule_text TEXT
+            )
+        ''')
+        cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS schedule_pri_unique_idx ON schedule_PRI (group_number, week_type, day_of_week)")
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS schedule_BI (
+                id SERIAL PRIMARY KEY,
+                group_number TEXT,
+                week_type TEXT,
+                day_of_week TEXT,
+                schedule_text TEXT
+            )
+        ''')
+        cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS schedule_bi_unique_idx ON schedule_BI (group_number, week_type, day_of_week)")
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS schedule_other (
+                id SERIAL PRIMARY KEY,
+                direction TEXT,
+                group_number TEXT,
+                week_type TEXT,
+                day_of_week TEXT,
+                schedule_text TEXT
+            )
+        ''')
+        cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS schedule_other_unique_idx ON schedule_other (direction, group_number, week_type, day_of_week)")
+
+        # Структурированные пары для поиска по преподавателю; при первом запуске заполняем по старым данным
+        init_schedule_slots(cursor)
+        init_schedule_versions(cursor)
+        init_schedule_history(cursor)
+        cursor.execute("SELECT EXISTS (SELECT 1 FROM schedule_slots) AS filled")
+        if not cursor.fetchone()["filled"]:
+            rebuild_schedule_slots(cursor)
+        init_schedule_coverage(cursor)
+        init_timetable_images(cursor)
+    conn.commit()
+    conn.close()
+
+# -------------------- Маршруты веб-интерфейса --------------------
+
+@panel.route('/')
+def index():
+    return render_template('index.html')
+
+# Вход и рассылка есть и здесь, и в asgi.py (Quart с асинхронным пулом): запросы, проверка
+# и тексты общие, различается только способ обращения к базе и к Telegram
+DEAN_BY_USERNAME = "SELECT * FROM deans WHERE username = %s"
+ALL_STUDENTS = "SELECT * FROM students"
+LOGIN_FAILED = 'Неверный логин или пароль'
+EVENT_SENT = "Уведомления отправлены!"
+
+def authenticate_dean(dean, password) -> bool:
+    return bool(dean) and dean['password'] == password
+
+@panel.route('/login', methods=['GET', 'POST'])
+def login():
+    if request.method == 'POST':
+        username = request.form.get('username')
+        password = request.form.get('password')
+        conn = read_connection(main_database)
+        cur = conn.cursor()
+        cur.execute(DEAN_BY_USERNAME, (username,))
+        dean = cur.fetchone()
+        conn.close()
+        if authenticate_dean(dean, password):
+            session['user'] = username
+            return redirect(url_for('panel.dashboard'))
+        else:
+            flash(LOGIN_FAILED, 'error')
+    return render_template('login.html')
+
+@panel.route('/register_dean', methods=['GET', 'POST'])
+def register_dean():
+    if request.method == 'POST':
+        username = request.form.get('username')
+        password = request.form.get('password')
+        conn = get_db_connection()
+        cur = conn.cursor()
+        try:
+            cur.execute("INSERT INTO deans (username, password) VALUES (%s, %s)", (username, password))
+            conn.commit()
+            mark_written()
+            flash('Регистрация прошла успешно. Теперь авторизуйтесь.', 'success')
+            return redirect(url_for('panel.login'))
+        except psycopg2.IntegrityError:
+            conn.rollback()
+            flash('Пользователь с таким логином уже существует', 'error')
+        finally:
+            conn.close()
+    return render_template('register_dean.html')
+
+@panel.route('/dashboard')
+def dashboard():
+    if 'user' not in session:
+        return redirect(url_for('panel.login'))
+    groups, totals = dashboard_stats()
+    return render_template('dashboard.html', groups=groups, totals=totals)
+
+def dashboard_stats():
+    """
+    Статистика по группам для главной: студенты и привязка бота из group_stats (основная база),
+    заполненность расписания из schedule_coverage (база расписания). Обе сводки поддерживаются
+    триггерами при записи, поэтому здесь читается по строке на группу, а не все students и пары.
+    """
+    conn = read_connection(main_database)
+    cur = conn.cursor()
+    students = get_group_stats(cur)
+    conn.close()
+    conn = read_connection(schedule_database)
+    cur = conn.cursor()
+    coverage = {(row['direction'], row['group_number']): row for row in get_schedule_coverage(cur)}
+    conn.close()
+
+    groups = []
+    for row in students:
+        schedule = coverage.pop((row['direction'], row['group_number']), None)
+        groups.append({**row, 'days': schedule['days'] if schedule else 0,
+                       'pairs': schedule['pairs'] if schedule else 0})
+    # Расписание заполнено, а студентов в списке ещё нет
+    for (direction, group_number), schedule in coverage.items():
+        groups.append({'direction': direction, 'group_number': group_number, 'students': 0,
+                       'registered': 0, 'with_credentials': 0,
+                       'days': schedule['days'], 'pairs': schedule['pairs']})
+    groups.sort(key=lambda g: (g['direction'], g['group_number']))
+    totals = {
+        'groups': len(groups),
+        'students': sum(g['students'] for g in groups),
+        'registered': sum(g['registered'] for g in groups),
+        'with_credentials': sum(g['with_credentials'] for g in groups),
+        'without_schedule': sum(1 for g in groups if not g['pairs']),
+    }
+    return groups, totals
+
+class NotificationSender:
+    """
+    Рассылка для синхронного create_event: один цикл событий в фоновом потоке и один Bot
+    с постоянной сессией на процесс, а не новый цикл и новая сессия на каждый запрос.
+    Поток создаётся при первой рассылке, то есть уже в рабочем процессе после fork.
+    """
+
+    def __init__(self):
+        self._loop = None
+        self._bot = None
+        self._lock = threading.Lock()
+
+    def run(self, coro):
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="notifications", daemon=True).start()
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    async def broadcast(self, chat_ids, text) -> int:
+        if self._bot is None:
+            self._bot = Bot(token=TELEGRAM_BOT_TOKEN, session=telegram_session())
+        return await broadcast(self._bot, chat_ids, text)
+
+    def close(self):
+        """Закрывает сессию Bot и останавливает цикл при выходе рабочего процесса."""
+        if self._loop is None:
+            return
+        if self._bot is not None:
+            self.run(self._bot.session.close())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+notification_sender = NotificationSender()
+atexit.register(notification_sender.close)
+
+@panel.route('/create_event', methods=['GET', 'POST'])
+def create_event():
+    """
+    Устаревший синхронный вариант: под asgi.py этот маршрут обслуживает асинхронный
+    asgi.create_event, здесь он остаётся для запуска панели одним gunicorn без ASGI.
+    """
+    if 'user' not in session:
+        return redirect(url_for('panel.login'))
+    conn = read_connection(main_database)
+    cur = conn.cursor()
+    cur.execute(ALL_STUDENTS)
+    students = cur.fetchall()
+    conn.close()
+    if request.method == 'POST':
+        selected_ids = request.form.getlist('student')
+        message_text = request.form.get('message')
+        notification_sender.run(notification_sender.broadcast(selected_ids, message_text))
+        flash(EVENT_SENT, "success")
+    return render_template('create_event.html', students=students)
+
+def flash_slot_conflicts(conflicts: list[dict]):
+    """Сообщение о каждом занятом слоте: пара, аудитория или преподаватель и чья это пара."""
+    for c in conflicts:
+        what = f"Аудитория {c['value']}" if c['kind'] == 'room' else f"Преподаватель {c['value']}"
+        flash(f"Пара {c['pair_number']}: {what} уже занят(а) у группы {c['direction']}-{c['group_number']}", "error")
+
+@panel.route('/add_schedule', methods=['GET', 'POST'])
+def add_schedule():
+    if 'user' not in session:
+        return redirect(url_for('panel.login'))
+    
+    # Определяем временные интервалы для пар
+    pairs_info = PAIRS_INFO
+    
+    if request.method == 'POST':
+        direction = request.form.get('direction', '').strip().upper()
+        group_number = request.form.get('group_number', '').strip()
+        day_of_week = request.form.get('day_of_week', '').strip()
+        week_type = request.form.get('week_type', '').strip()
+        
+        # Собираем данные для каждой пары (4 поля: предмет, тип занятия, преподаватель, аудитория)
+        schedule_lines = []
+        pairs = []
+        for i, (start_time, end_time) in enumerate(pairs_info):
+            subject = request.form.get(f"subject_{i}", "").strip()
+            lesson_type = request.form.get(f"type_{i}", "").strip()
+            teacher = request.form.get(f"teacher_{i}", "").strip()
+            room = request.form.get(f"room_{i}", "").strip()
+            
+            # Если все поля пустые, считаем, что пары нет; иначе формируем красиво отформатированную строку
+            if not any([subject, lesson_type, teacher, room]):
+                schedule_lines.append(f"{i+1}) {start_time}-{end_time}: Пары нет.")
+            else:
+                # Форматирование:
+                # Предмет – жирным, преподаватель – курсивом, аудитория – верхним регистром.
+                line = f"{i+1}) {start_time}-{end_time}: "
+                line += f"<b>{subject or '-'}</b>"
+                if lesson_type:
+                    line += f" ({lesson_type})"
+                if teacher:
+                    line += f"<br><i>{teacher}</i>"
+                if room:
+                    line += f", ауд. {room.upper()}"
+                schedule_lines.append(line)
+                pairs.append({
+                    "pair_number": i + 1,
+                    "subject": subject,
+                    "lesson_type": lesson_type,
+                    "teacher": teacher,
+                    "room": room.upper(),
+                })
+        
+        schedule_text = "<br>".join(schedule_lines)  # Используем <br> для переноса строк в HTML
+
+        if not all([direction, group_number, day_of_week, week_type]):
+            flash("Направление, номер группы, тип недели и день недели обязательны для заполнения!", "error")
+            return render_template('add_schedule.html', pairs_info=pairs_info, enumerate=enumerate)
+        
+        conn = None
+        try:
+            conn = get_schedule_db_connection()
+            cur = conn.cursor()
+            save_day_schedule(cur, direction, group_number, week_type, day_of_week, schedule_text, pairs)
+            conn.commit()
+            conn.close()
+            mark_written()
+            flash("Расписание успешно добавлено/обновлено", "success")
+            return render_template('add_schedule.html', pairs_info=pairs_info, enumerate=enumerate)
+        except ScheduleConflictError as e:
+            conn.rollback()
+            conn.close()
+            # Сообщаем обо всех конфликтах дня сразу и возвращаем введённые данные в форму
+            flash_slot_conflicts(e.conflicts)
+            return render_template('add_schedule.html', pairs_info=pairs_info, enumerate=enumerate, form=request.form)
+        except UniqueViolation:
+            # Слот заняли между проверкой и вставкой (другой декан сохранял одновременно):
+            # уникальный индекс schedule_slots отклонил запись. Проверяем заново в новой транзакции.
+            conn.rollback()
+            try:
+                conflicts = find_slot_conflicts(cur, direction, group_number, week_type, day_of_week, pairs)
+                conn.rollback()
+            except Exception:
+                conflicts = []
+            finally:
+                conn.close()
+            if conflicts:
+                flash_slot_conflicts(conflicts)
+            else:
+                flash("Аудиторию или преподавателя только что заняла другая группа. Проверьте пары и сохраните ещё раз.", "error")
+            return render_template('add_schedule.html', pairs_info=pairs_info, enumerate=enumerate, form=request.form)
+        except Exception as e:
+            if conn is not None:
+                conn.rollback()
+                conn.close()
+            print(f"Ошибка при добавлении расписания: {e}")
+            flash("Не удалось сохранить расписание, попробуйте ещё раз", "error")
+            return render_template('add_schedule.html', pairs_info=pairs_info, enumerate=enumerate, form=request.form)
+    
+    return render_template('add_schedule.html', pairs_info=pairs_info, enumerate=enumerate)
+
+@panel.route('/import_roster', methods=['GET', 'POST'])
+def import_roster_page():
+    """Загрузка списка студентов (CSV: имя, фамилия, группа[, telegram_id]) одной транзакцией."""
+    if 'user' not in session:
+        return redirect(url_for('panel.login'))
+    if request.method == 'POST':
+        file = request.files.get('roster')
+        if not file or not file.filename:
+            flash("Выберите CSV-файл со списком студентов", "error")
+            return render_template('import_roster.html')
+        try:
+            rows, skipped = parse_roster_csv(file.read())
+        except ValueError as e:
+            flash(str(e), "error")
+            return render_template('import_roster.html')
+        if not rows:
+            flash("В файле нет ни одной корректной строки", "error")
+            return render_template('import_roster.html')
+
+        conn = get_db_connection()
+        try:
+            stats = import_roster(conn, rows)
+        except Exception as e:
+            conn.rollback()
+            flash(f"Ошибка при загрузке списка: {e}", "error")
+            return render_template('import_roster.html')
+        finally:
+            conn.close()
+        mark_written()
+
+        flash(f"Загружено строк: {len(rows)}. С Telegram: {stats['linked']}, "
+              f"новых без Telegram: {stats['unlinked']}", "success")
+        if skipped:
+            flash(f"Пропущены некорректные строки: {', '.join(map(str, skipped))}", "error")
+    return render_template('import_roster.html')
+
+@panel.route('/teacher_schedule')
+def teacher_schedule():
+    """Поиск занятий преподавателя по началу ФИО (без учёта регистра)."""
+    if 'user' not in session:
+        return redirect(url_for('panel.login'))
+    query = request.args.get('q', '').strip()
+    slots = []
+    if query:
+        conn = read_connection(schedule_database)
+        cur = conn.cursor()
+        slots = find_teacher_slots(cur, query)
+        conn.close()
+    return render_template('teacher_schedule.html', query=query, slots=slots, pairs_info=PAIRS_INFO)
+
+@panel.route('/ical/<feed>.ics')
+def ical_feed(feed):
+    """
+    iCalendar-лента группы, например /ical/ПИ-201.ics.
+    Клиенты календарей опрашивают её регулярно, поэтому сначала проверяем только версию
+    расписания: если она не изменилась, отвечаем 304 без построения ленты.
+    """
+    direction, _, group_number = feed.rpartition('-')
+    direction = direction.strip().upper()
+    group_number = group_number.strip()
+    if not direction or not group_number:
+        abort(404)
+
+    conn = read_connection(schedule_database)
+    cur = conn.cursor()
+    try:
+        version_row = get_schedule_version(cur, direction, group_number)
+        if not version_row:
+            abort(404)
+        updated_at = version_row['updated_at'].replace(microsecond=0)
+        return conditional_response(
+            ical_cache, (direction, group_number), version_row['version'],
+            ical_etag(direction, group_number, version_row['version']), updated_at,
+            lambda: render_group_calendar(direction, group_number,
+                                          get_group_slots(cur, direction, group_number), updated_at),
+            mimetype='text/calendar', max_age=300,
+        )
+    finally:
+        conn.close()
+
+# -------------------- JSON API расписания (только чтение) --------------------
+
+def _api_pair(slot):
+    start_time, end_time = PAIRS_INFO[slot['pair_number'] - 1]
+    return {
+        'pair_number': slot['pair_number'],
+        'start': start_time,
+        'end': end_time,
+        'subject': slot['subject'],
+        'lesson_type': slot['lesson_type'],
+        'teacher': slot['teacher'],
+        'room': slot['room'],
+    }
+
+def _api_schedule_response(direction, group_number, week_type=None, day_of_week=None):
+    """
+    Общая часть маршрутов API: версия расписания группы -> сильный ETag,
+    304 при совпадении, иначе JSON из кэша (gzip, если клиент поддерживает).
+    """
+    direction = direction.strip().upper()
+    group_number = group_number.strip()
+    conn = read_connection(schedule_database)
+    cur = conn.cursor()
+    try:
+        version_row = get_schedule_version(cur, direction, group_number)
+        if not version_row:
+            abort(404)
+        version = version_row['version']
+        updated_at = version_row['updated_at'].replace(microsecond=0)
+        key = (direction, group_number, week_type, day_of_week)
+        etag = hashlib.sha1(f"v1|{'|'.join(map(str, key))}|{version}".encode('utf-8')).hexdigest()[:20]
+
+        def render():
+            slots = get_group_slots(cur, direction, group_number)
+            data = {
+                'direction': direction,
+                'group_number': group_number,
+                'version': version,
+                'updated_at': updated_at.isoformat(),
+            }
+            if day_of_week:
+                data['week_type'] = week_type
+                data['day_of_week'] = day_of_week
+                data['pairs'] = [_api_pair(s) for s in slots
+                                 if s['week_type'] == week_type and s['day_of_week'] == day_of_week]
+            else:
+                weeks = {}
+                for s in slots:
+                    weeks.setdefault(s['week_type'], {}).setdefault(s['day_of_week'], []).append(_api_pair(s))
+                data['weeks'] = weeks
+            return json.dumps(data, ensure_ascii=False)
+
+        return conditional_response(api_cache, key, version, etag, updated_at, render,
+                                    mimetype='application/json', max_age=60, compress=True)
+    finally:
+        conn.close()
+
+@panel.route('/api/v1/schedule/<direction>/<group_number>')
+def api_week_schedule(direction, group_number):
+    """Расписание группы на обе недели."""
+    return _api_schedule_response(direction, group_number)
+
+@panel.route('/api/v1/schedule/<direction>/<group_number>/<week_type>/<day_of_week>')
+def api_day_schedule(direction, group_number, week_type, day_of_week):
+    """Расписание группы на один день выбранной недели."""
+    if week_type not in WEEK_TYPES or day_of_week not in DAYS_OF_WEEK:
+        abort(404)
+    return _api_schedule_response(direction, group_number, week_type, day_of_week)
+
+@panel.route('/register', methods=['GET', 'POST'])
+def register_handler():
+    if request.method == 'POST':
+        data = request.form.get('data', '').strip()
+        parts = data.split()
+        if len(parts) != 3:
+            flash("Неверный формат. Введите данные как: Имя Фамилия Группа", "error")
+            return redirect(url_for('panel.register_handler'))
+        first_name, last_name, group = parts
+        direction, group_number = parse_group(group)
+        telegram_id = request.form.get('telegram_id', '')
+        conn = get_db_connection()
+        with conn.cursor() as cursor:
+            cursor.execute(
+                """
+                INSERT INTO students (telegram_id, first_name, last_name, group_name, direction, group_number)
+                VALUES (%s, %s, %s, %s, %s, %s)
+                ON CONFLICT (telegram_id) DO UPDATE
+                SET first_name = EXCLUDED.first_name,
+                    last_name = EXCLUDED.last_name,
+                    group_name = EXCLUDED.group_name,
+                    direction = EXCLUDED.direction,
+                    group_number = EXCLUDED.group_number;
+                """,
+                (telegram_id, first_name, last_name, group, direction, group_number)
+            )
+        conn.commit()
+        conn.close()
+        mark_written()
+        flash("Вы успешно зарегистрированы!", "success")
+        return redirect(url_for('panel.index'))
+    return render_template('register.html')
+
+@panel.route('/index')
+def start_page():
+    return render_template('index.html')
+
+# -------------------- Фабрика приложения --------------------
+
+def create_app(init_schema: bool = True) -> Flask:
+    """
+    Собирает приложение панели. Таблицы создаются здесь же, поэтому и запуск через
+    gunicorn (Procfile), и python app.py получают готовую схему. С preload_app
+    (gunicorn.conf.py) фабрика вызывается один раз в главном процессе.
+    """
+    app = Flask(__name__)
+    app.secret_key = FLASK_SECRET_KEY
+    init_flask(app)
+    install_flask_profiler(app)
+    init_static_assets(app)
+    app.after_request(compress_response)
+    app.register_blueprint(panel)
+
+    os.makedirs(JINJA_CACHE_DIR, exist_ok=True)
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(JINJA_CACHE_DIR)
+    # Все шаблоны компилируются сразу (с preload – один раз до fork), а не первым запросом
+    for name in app.jinja_env.list_templates():
+        app.jinja_env.get_template(name)
+    if init_schema:
+        init_db()
+        init_schedule_db()
+    return app
+
+if __name__ == '__main__':
+    create_app().run(debug=True, host='0.0.0.0', port=5000)
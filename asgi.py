@@ -0,0 +1,161 @@
+"""
+Асинхронный режим панели деканата (ASGI):
+    hypercorn asgi:application --bind 0.0.0.0:5000
+Обычный запуск через gunicorn (Procfile, app.create_app) продолжает работать без изменений.
+
+Quart с асинхронным пулом подключений psycopg и одним объектом Bot на процесс обслуживает
+только маршруты, которые ждут Telegram или одного запроса к базе: вход и рассылку create_event
+(плюс статическую главную). Рассылка не создаёт цикл событий на запрос, а долгие рассылки
+и входы не занимают потоки. Логика входа и рассылки общая с app.py (authenticate_dean, broadcast),
+различается только способ обращения к базе.
+Маршруты с основной работой в базе (главная со статистикой, расписание, загрузка списков,
+iCal, API, /metrics, статика /assets) по-прежнему выполняются Flask-приложением через WsgiToAsgi
+в потоках, с его подключениями, репликами и кэшами: их одновременность ограничена пулом потоков,
+как и у gunicorn с потоками. Перенос этих маршрутов на асинхронный пул – отдельная работа.
+Quart получает те же хуки, что Flask в create_app: время маршрутов (init_quart), выборочное
+профилирование и сжатие ответов; запросы пула пишутся в те же метрики SQL.
+Сессия общая: Quart и Flask подписывают cookie одним ключом в одном формате.
+"""
+import os
+import time
+
+from quart import Quart, Blueprint, render_template, request, redirect, url_for, session, flash
+from psycopg import AsyncCursor
+from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool
+from asgiref.wsgi import WsgiToAsgi
+from werkzeug.exceptions import HTTPException
+from aiogram import Bot
+
+import app as panel_app
+from fanout import telegram_session, broadcast
+from static_assets import asset_url
+from metrics import init_quart, observe_query
+from profiling import install_quart_profiler
+from http_cache import compress_quart_response
+
+# Размер пула подключений к основной базе на один процесс
+ASYNC_POOL_MIN = int(os.getenv("ASYNC_POOL_MIN", "1"))
+ASYNC_POOL_MAX = int(os.getenv("ASYNC_POOL_MAX", "10"))
+
+# Эндпоинты, которые обслуживает Quart; остальные уходят во Flask
+NATIVE_ENDPOINTS = {"index", "start_page", "login", "create_event"}
+
+flask_app = panel_app.create_app()
+quart_app = Quart(__name__)
+quart_app.secret_key = panel_app.FLASK_SECRET_KEY
+quart_app.jinja_env.globals['asset_url'] = asset_url
+init_quart(quart_app)
+install_quart_profiler(quart_app)
+quart_app.after_request(compress_quart_response)
+panel = Blueprint('panel', __name__)
+
+
+class TimedAsyncCursor(AsyncCursor):
+    """Курсор пула: время запросов пишется в db_query_duration_seconds, как у TimedCursor."""
+
+    async def execute(self, query, params=None, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await super().execute(query, params, **kwargs)
+        finally:
+            observe_query(query, started)
+
+
+pool = AsyncConnectionPool(
+    conninfo=os.getenv("DATABASE_URL") or "", min_size=ASYNC_POOL_MIN, max_size=ASYNC_POOL_MAX,
+    kwargs={"row_factory": dict_row, "cursor_factory": TimedAsyncCursor}, open=False,
+)
+bot = None
+
+
+@quart_app.before_serving
+async def startup():
+    global bot
+    await pool.open()
+    bot = Bot(token=panel_app.TELEGRAM_BOT_TOKEN, session=telegram_session())
+
+
+@quart_app.after_serving
+async def shutdown():
+    if bot is not None:
+        await bot.session.close()
+    await pool.close()
+
+
+# -------------------- Маршруты --------------------
+
+@panel.route('/')
+async def index():
+    return await render_template('index.html')
+
+@panel.route('/index')
+async def start_page():
+    return await render_template('index.html')
+
+@panel.route('/login', methods=['GET', 'POST'])
+async def login():
+    if request.method == 'POST':
+        form = await request.form
+        username = form.get('username')
+        password = form.get('password')
+        async with pool.connection() as conn:
+            cur = await conn.execute(panel_app.DEAN_BY_USERNAME, (username,))
+            dean = await cur.fetchone()
+        if panel_app.authenticate_dean(dean, password):
+            session['user'] = username
+            return redirect(url_for('panel.dashboard'))
+        else:
+            await flash(panel_app.LOGIN_FAILED, 'error')
+    return await render_template('login.html')
+
+@panel.route('/create_event', methods=['GET', 'POST'])
+async def create_event():
+    if 'user' not in session:
+        return redirect(url_for('panel.login'))
+    async with pool.connection() as conn:
+        cur = await conn.execute(panel_app.ALL_STUDENTS)
+        students = await cur.fetchall()
+    if request.method == 'POST':
+        form = await request.form
+        selected_ids = form.getlist('student')
+        message_text = form.get('message')
+        await broadcast(bot, selected_ids, message_text)
+        await flash(panel_app.EVENT_SENT, "success")
+    return await render_template('create_event.html', students=students)
+
+
+def _forwarded(**kwargs):
+    # Сюда запросы не доходят: application() отдаёт эти маршруты Flask
+    raise RuntimeError("Маршрут обслуживается Flask-приложением")
+
+# Остальные маршруты панели регистрируются без обработчика, чтобы url_for('panel.…')
+# в шаблонах, которые отдаёт Quart, строил те же адреса
+for rule in flask_app.url_map.iter_rules():
+    blueprint, _, endpoint = rule.endpoint.rpartition('.')
+    if blueprint == 'panel' and endpoint not in NATIVE_ENDPOINTS:
+        panel.add_url_rule(rule.rule, endpoint, _forwarded, methods=rule.methods - {'HEAD', 'OPTIONS'})
+
+quart_app.register_blueprint(panel)
+
+
+# -------------------- Диспетчер --------------------
+
+wsgi_app = WsgiToAsgi(flask_app)
+_url_adapter = quart_app.url_map.bind('localhost')
+
+
+def _is_native(scope) -> bool:
+    try:
+        endpoint, _ = _url_adapter.match(scope['path'], method=scope['method'])
+    except HTTPException:
+        return False
+    return endpoint.rpartition('.')[2] in NATIVE_ENDPOINTS and endpoint.startswith('panel.')
+
+
+async def application(scope, receive, send):
+    """Точка входа ASGI: lifespan и «родные» маршруты – Quart, остальное – Flask."""
+    if scope['type'] == 'http' and not _is_native(scope):
+        await wsgi_app(scope, receive, send)
+    else:
+        await quart_app(scope, receive, send)
@@ -0,0 +1,457 @@
+"""
+Ассистент «Задать вопрос»: ответы на вопросы студентов локальной моделью (API Ollama).
+- Поиск по документам: FAQ факультета (файлы .md/.txt в ASSISTANT_FAQ_DIR, делятся на фрагменты
+  по заголовкам и абзацам) и расписание группы студента из schedule_slots. Индекс BM25 строится
+  в памяти и перестраивается раз в ASSISTANT_INDEX_REFRESH секунд; в модель уходят только
+  ASSISTANT_TOP_K лучших фрагментов.
+- Кэш ответов (LRU + TTL) по нормализованному вопросу и найденным фрагментам: повторный вопрос
+  не доходит до модели, а после изменения FAQ или расписания меняются хэши фрагментов и ключ.
+  Одинаковые вопросы, заданные одновременно, ждут один ответ модели.
+- Ответ печатается по мере генерации: сообщение редактируется не чаще раза в ASSISTANT_EDIT_INTERVAL с.
+- Лимиты: у студента не больше ASSISTANT_USER_CONCURRENT вопросов одновременно, к модели –
+  не больше ASSISTANT_MAX_CONCURRENT запросов; кто не дождался очереди за ASSISTANT_QUEUE_TIMEOUT,
+  получает AssistantBusy.
+Для проверок без модели – bench/fake_ollama.py (OLLAMA_URL=http://127.0.0.1:11435).
+"""
+import os
+import re
+import json
+import math
+import time
+import heapq
+import asyncio
+import hashlib
+import logging
+from collections import Counter, OrderedDict, defaultdict
+from dataclasses import dataclass
+
+import aiohttp
+from aiogram.exceptions import TelegramRetryAfter, TelegramBadRequest
+
+from schedule_db import PAIRS_INFO
+from db import schedule_database
+from paginator import MAX_MESSAGE_LENGTH
+from metrics import ASSISTANT_ANSWER_SECONDS, ASSISTANT_FAILURES, cache_hit, cache_miss
+
+OLLAMA_URL = os.getenv("OLLAMA_URL", "http://127.0.0.1:11434").rstrip("/")
+OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3.1:8b")
+ASSISTANT_FAQ_DIR = os.getenv("ASSISTANT_FAQ_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "faq"))
+ASSISTANT_INDEX_REFRESH = float(os.getenv("ASSISTANT_INDEX_REFRESH", "600"))
+ASSISTANT_TOP_K = int(os.getenv("ASSISTANT_TOP_K", "4"))
+ASSISTANT_CACHE_SIZE = int(os.getenv("ASSISTANT_CACHE_SIZE", "500"))
+ASSISTANT_CACHE_TTL = float(os.getenv("ASSISTANT_CACHE_TTL", str(6 * 3600)))
+ASSISTANT_MAX_CONCURRENT = int(os.getenv("ASSISTANT_MAX_CONCURRENT", "2"))
+ASSISTANT_USER_CONCURRENT = int(os.getenv("ASSISTANT_USER_CONCURRENT", "1"))
+ASSISTANT_QUEUE_TIMEOUT = float(os.getenv("ASSISTANT_QUEUE_TIMEOUT", "30"))
+ASSISTANT_TIMEOUT = float(os.getenv("ASSISTANT_TIMEOUT", "120"))
+ASSISTANT_MAX_TOKENS = int(os.getenv("ASSISTANT_MAX_TOKENS", "512"))
+ASSISTANT_EDIT_INTERVAL = float(os.getenv("ASSISTANT_EDIT_INTERVAL", "1.0"))
+# Размер фрагмента FAQ в символах
+FAQ_CHUNK_SIZE = 1000
+
+# Параметры BM25
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+SYSTEM_PROMPT = (
+    "Ты помощник студентов Института информационных технологий. Отвечай по-русски, кратко и по делу, "
+    "опираясь только на приведённые фрагменты документов и расписания. Если ответа во фрагментах нет, "
+    "так и скажи и посоветуй обратиться в деканат."
+)
+
+WORD_RE = re.compile(r"[a-zа-я0-9]+")
+STOP_WORDS = frozenset(
+    "а в во да для до же за и из или как к ко ли на над не нет ни но о об от по под при про с со то "
+    "у что чтобы это я мне меня мой моя мы вы ты он она они их его её ее где когда какой какая какие "
+    "можно нужно ли бы был была были есть будет".split()
+)
+# Окончания для грубого стемминга: «расписание», «расписания», «расписанию» -> «расписан»
+ENDINGS = sorted((
+    "ями", "ами", "иями", "ого", "его", "ому", "ему", "ыми", "ими", "ой", "ей", "ий", "ый", "ая", "яя",
+    "ое", "ее", "ые", "ие", "ов", "ев", "ам", "ям", "ах", "ях", "ом", "ем", "ию", "ия", "ии",
+    "а", "я", "о", "е", "ы", "и", "у", "ю", "ь",
+), key=len, reverse=True)
+
+
+class AssistantBusy(Exception):
+    """Вопрос не принят: у студента уже есть вопрос в работе или очередь к модели не движется."""
+
+
+class AssistantUnavailable(Exception):
+    """Модель не ответила или вернула ошибку."""
+
+    user_message = "Ассистент сейчас недоступен. Попробуйте позже или обратитесь в деканат."
+
+
+def _words(text: str) -> list[str]:
+    return WORD_RE.findall(text.lower().replace("ё", "е"))
+
+
+def _stem(word: str) -> str:
+    for ending in ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= 3:
+            return word[:-len(ending)]
+    return word
+
+
+def tokenize(text: str) -> list[str]:
+    return [_stem(w) for w in _words(text) if w not in STOP_WORDS and len(w) > 1]
+
+
+def normalize_question(text: str) -> str:
+    """Ключ кэша: регистр, «ё», знаки препинания и лишние пробелы не важны."""
+    return " ".join(_words(text))
+
+
+# -------------------- Поиск по документам --------------------
+
+@dataclass(frozen=True)
+class Document:
+    title: str
+    text: str
+    # (направление, группа) для расписания; None – документ доступен всем
+    group: tuple | None = None
+
+    @property
+    def key(self) -> str:
+        return hashlib.sha1(f"{self.title}\n{self.text}".encode("utf-8")).hexdigest()[:12]
+
+
+class SearchIndex:
+    """Инвертированный индекс BM25: термин -> [(номер документа, частота)]."""
+
+    def __init__(self, documents: list[Document]):
+        self.documents = documents
+        self.built_at = time.monotonic()
+        self.postings = defaultdict(list)
+        self.lengths = []
+        for i, doc in enumerate(documents):
+            terms = Counter(tokenize(f"{doc.title}\n{doc.text}"))
+            self.lengths.append(sum(terms.values()))
+            for term, tf in terms.items():
+                self.postings[term].append((i, tf))
+        self.avg_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 1.0
+
+    def search(self, query: str, group: tuple | None = None, limit: int = ASSISTANT_TOP_K) -> list[Document]:
+        """Лучшие фрагменты для вопроса: FAQ и расписание только группы студента."""
+        total = len(self.documents)
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+            for i, tf in postings:
+                doc_group = self.documents[i].group
+                if doc_group is not None and doc_group != group:
+                    continue
+                length_norm = 1 - BM25_B + BM25_B * self.lengths[i] / self.avg_length
+                scores[i] += idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * length_norm)
+        best = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+        return [self.documents[i] for i, _ in best]
+
+
+def _chunks(paragraphs: list[str], size: int = FAQ_CHUNK_SIZE):
+    chunk = []
+    for paragraph in paragraphs:
+        if chunk and sum(len(p) for p in chunk) + len(paragraph) > size:
+            yield "\n\n".join(chunk)
+            chunk = []
+        chunk.append(paragraph)
+    if chunk:
+        yield "\n\n".join(chunk)
+
+
+def load_faq_documents(faq_dir: str = ASSISTANT_FAQ_DIR) -> list[Document]:
+    """Файлы FAQ -> фрагменты по разделам (строки «# Заголовок») и абзацам."""
+    if not os.path.isdir(faq_dir):
+        logging.info(f"Каталог FAQ {faq_dir} не найден, ассистент ищет только по расписанию.")
+        return []
+    documents = []
+    for root, _, files in sorted(os.walk(faq_dir)):
+        for name in sorted(files):
+            if not name.endswith((".md", ".txt")):
+                continue
+            path = os.path.join(root, name)
+            with open(path, encoding="utf-8") as f:
+                content = f.read()
+            source = os.path.splitext(os.path.relpath(path, faq_dir))[0]
+            sections = [(source, [])]
+            for block in re.split(r"\n\s*\n", content):
+                block = block.strip()
+                if block.startswith("#"):
+                    heading, _, rest = block.partition("\n")
+                    sections.append((f"{source}: {heading.lstrip('#').strip()}", []))
+                    block = rest.strip()
+                if block:
+                    sections[-1][1].append(block)
+            for title, paragraphs in sections:
+                documents.extend(Document(title, chunk) for chunk in _chunks(paragraphs))
+    return documents
+
+
+def load_timetable_documents() -> list[Document]:
+    """Расписание: один документ на день группы (тип недели, день, все пары)."""
+    conn = schedule_database.connect_read()
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT direction, group_number, week_type, day_of_week, pair_number, subject, lesson_type, teacher, room
+          FROM schedule_slots
+         ORDER BY direction, group_number, week_type, day_of_week, pair_number
+    """)
+    rows = cur.fetchall()
+    conn.close()
+
+    days = OrderedDict()
+    for row in rows:
+        key = (row["direction"], row["group_number"], row["week_type"], row["day_of_week"])
+        start_time, end_time = PAIRS_INFO[row["pair_number"] - 1]
+        line = f"{row['pair_number']} пара ({start_time}-{end_time}): {row['subject'] or '-'}"
+        if row["lesson_type"]:
+            line += f" ({row['lesson_type']})"
+        if row["teacher"]:
+            line += f", преподаватель {row['teacher']}"
+        if row["room"]:
+            line += f", ауд. {row['room']}"
+        days.setdefault(key, []).append(line)
+    return [
+        Document(f"Расписание {direction}-{group_number}, {week_type} неделя, {day_of_week}",
+                 "\n".join(lines), group=(direction, group_number))
+        for (direction, group_number, week_type, day_of_week), lines in days.items()
+    ]
+
+
+# -------------------- Кэш ответов --------------------
+
+class AnswerCache:
+    """LRU-кэш ответов с временем жизни: ключ -> (время, ответ)."""
+
+    def __init__(self, maxsize: int = ASSISTANT_CACHE_SIZE, ttl: float = ASSISTANT_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+
+    def get(self, key):
+        entry = self._data.get(key)
+        if entry is None or time.monotonic() - entry[0] > self.ttl:
+            self._data.pop(key, None)
+            cache_miss("assistant")
+            return None
+        self._data.move_to_end(key)
+        cache_hit("assistant")
+        return entry[1]
+
+    def put(self, key, answer: str):
+        self._data[key] = (time.monotonic(), answer)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+
+# -------------------- Вывод в Telegram --------------------
+
+def split_text(text: str, limit: int = MAX_MESSAGE_LENGTH) -> list[str]:
+    """Обычный текст -> части не длиннее limit, по возможности по границам строк."""
+    parts = []
+    while len(text) > limit:
+        cut = text.rfind("\n", 0, limit)
+        if cut <= 0:
+            cut = limit
+        parts.append(text[:cut])
+        text = text[cut:].lstrip("\n")
+    parts.append(text)
+    return parts
+
+
+class MessageStreamer:
+    """Показывает ответ по мере генерации, редактируя одно сообщение (без parse_mode)."""
+
+    def __init__(self, message, interval: float = ASSISTANT_EDIT_INTERVAL):
+        self.message = message
+        self.interval = interval
+        self.shown = ""
+        self.last_edit = 0.0
+        self.edits = 0
+
+    async def update(self, text: str):
+        if time.monotonic() - self.last_edit < self.interval:
+            return
+        # Пока ответ не закончен, показывается его начало, помещающееся в одно сообщение
+        await self._edit(split_text(text, MAX_MESSAGE_LENGTH - 2)[0] + " …", final=False)
+
+    async def finish(self, text: str):
+        parts = split_text(text.strip() or "Не удалось сформулировать ответ.")
+        await self._edit(parts[0], final=True)
+        for part in parts[1:]:
+            await self.message.answer(part)
+
+    async def _edit(self, text: str, final: bool):
+        if text == self.shown:
+            return
+        while True:
+            try:
+                await self.message.edit_text(text)
+                self.shown = text
+                self.edits += 1
+                break
+            except TelegramRetryAfter as e:
+                # Промежуточное обновление можно пропустить, итоговое – нет
+                if not final:
+                    break
+                await asyncio.sleep(e.retry_after)
+            except TelegramBadRequest as e:
+                logging.debug(f"Не удалось обновить ответ ассистента: {e}")
+                break
+        self.last_edit = time.monotonic()
+
+
+# -------------------- Ассистент --------------------
+
+class Assistant:
+    def __init__(self, url: str = OLLAMA_URL, model: str = OLLAMA_MODEL, faq_dir: str = ASSISTANT_FAQ_DIR,
+                 load_timetable=load_timetable_documents, cache: AnswerCache | None = None,
+                 max_concurrent: int = ASSISTANT_MAX_CONCURRENT, user_concurrent: int = ASSISTANT_USER_CONCURRENT,
+                 index_refresh: float = ASSISTANT_INDEX_REFRESH):
+        self.url = url
+        self.model = model
+        self.faq_dir = faq_dir
+        self.load_timetable = load_timetable
+        self.cache = cache or AnswerCache()
+        self.user_concurrent = user_concurrent
+        self.index_refresh = index_refresh
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self._active = Counter()
+        self._inflight = {}
+        self._index = None
+        self._index_lock = asyncio.Lock()
+        self._session = None
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    # ----- индекс -----
+
+    def build_index(self) -> SearchIndex:
+        documents = load_faq_documents(self.faq_dir)
+        try:
+            documents += self.load_timetable()
+        except Exception as e:
+            logging.error(f"Ассистент: не удалось загрузить расписание для поиска: {e}")
+        logging.info(f"Ассистент: индекс построен, фрагментов {len(documents)}.")
+        return SearchIndex(documents)
+
+    async def get_index(self) -> SearchIndex:
+        index = self._index
+        if index is not None and time.monotonic() - index.built_at < self.index_refresh:
+            return index
+        # Пока индекс перестраивается, остальные вопросы ищут по старому
+        if index is not None and self._index_lock.locked():
+            return index
+        async with self._index_lock:
+            if self._index is None or time.monotonic() - self._index.built_at >= self.index_refresh:
+                self._index = await asyncio.to_thread(self.build_index)
+            return self._index
+
+    # ----- ответ -----
+
+    async def ask(self, user_id: int, question: str, group: tuple | None, streamer: MessageStreamer) -> str:
+        """Ответ на вопрос студента; текст выводится через streamer."""
+        if self._active[user_id] >= self.user_concurrent:
+            ASSISTANT_FAILURES.labels("busy").inc()
+            raise AssistantBusy("Дождитесь ответа на предыдущий вопрос.")
+        self._active[user_id] += 1
+        started = time.perf_counter()
+        try:
+            index = await self.get_index()
+            documents = index.search(question, group)
+            key = (normalize_question(question), tuple(doc.key for doc in documents))
+
+            answer = self.cache.get(key)
+            source = "cache"
+            if answer is None:
+                inflight = self._inflight.get(key)
+                if inflight is not None:
+                    answer = await asyncio.shield(inflight)
+                    source = "shared"
+                else:
+                    answer = await self._generate_once(key, question, documents, streamer)
+                    source = "model"
+            await streamer.finish(answer)
+            ASSISTANT_ANSWER_SECONDS.labels(source).observe(time.perf_counter() - started)
+            return answer
+        finally:
+            self._active[user_id] -= 1
+            if not self._active[user_id]:
+                del self._active[user_id]
+
+    async def _generate_once(self, key, question: str, documents: list[Document], streamer) -> str:
+        future = asyncio.get_running_loop().create_future()
+        # Ошибку получат только те, кто ждёт этот ответ; без ожидающих она не должна попадать в лог
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._inflight[key] = future
+        try:
+            answer = await self._generate(question, documents, streamer)
+        except asyncio.CancelledError:
+            future.set_exception(AssistantUnavailable("запрос к модели отменён"))
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            del self._inflight[key]
+        self.cache.put(key, answer)
+        future.set_result(answer)
+        return answer
+
+    def _messages(self, question: str, documents: list[Document]) -> list[dict]:
+        if documents:
+            context = "\n\n".join(f"[{i}] {doc.title}\n{doc.text}" for i, doc in enumerate(documents, 1))
+        else:
+            context = "Подходящих фрагментов не найдено."
+        return [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": f"Фрагменты:\n{context}\n\nВопрос студента: {question}"},
+        ]
+
+    async def _generate(self, question: str, documents: list[Document], streamer) -> str:
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), ASSISTANT_QUEUE_TIMEOUT)
+        except asyncio.TimeoutError:
+            ASSISTANT_FAILURES.labels("busy").inc()
+            raise AssistantBusy("Ассистент сейчас отвечает другим студентам. Попробуйте через минуту.")
+        try:
+            if self._session is None:
+                self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=ASSISTANT_TIMEOUT))
+            payload = {
+                "model": self.model,
+                "messages": self._messages(question, documents),
+                "stream": True,
+                "options": {"num_predict": ASSISTANT_MAX_TOKENS},
+            }
+            answer = ""
+            async with self._session.post(f"{self.url}/api/chat", json=payload) as response:
+                if response.status != 200:
+                    raise AssistantUnavailable(f"HTTP {response.status}: {(await response.text())[:200]}")
+                # Ответ Ollama – по одному JSON-объекту на строку
+                async for line in response.content:
+                    if not line.strip():
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get("error"):
+                        raise AssistantUnavailable(chunk["error"])
+                    answer += chunk.get("message", {}).get("content", "")
+                    if chunk.get("done"):
+                        break
+                    await streamer.update(answer)
+            return answer
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError, AssistantUnavailable) as e:
+            ASSISTANT_FAILURES.labels("error").inc()
+            logging.error(f"Ассистент: ошибка запроса к модели {self.model}: {e!r}")
+            raise AssistantUnavailable(str(e)) from e
+        finally:
+            self._semaphore.release()
+
+
+assistant = Assistant()
@@ -0,0 +1,200 @@
+"""
+Проверка ассистента «Задать вопрос» (assistant.py) на фейковой модели bench/fake_ollama.py,
+без Telegram и без базы: сообщения заменены заглушкой, расписание – тестовыми документами.
+
+Проверяется:
+    search     – вопрос находит нужный раздел FAQ, расписание видно только своей группе;
+    stream     – ответ приходит несколькими редактированиями одного сообщения;
+    cache      – тот же вопрос в другом регистре и с другой пунктуацией не доходит до модели;
+    shared     – одинаковые вопросы от разных студентов одновременно – один запрос к модели;
+    user_limit – второй вопрос студента, пока первый не отвечен, отклоняется;
+    model_limit – к модели одновременно не больше ASSISTANT_MAX_CONCURRENT запросов;
+    unavailable – модель недоступна -> AssistantUnavailable.
+Затем замеряется время ответа разных вопросов (модель) и повторных (кэш).
+
+    python bench/bench_assistant.py --latency 0.3 --token-delay 0.01 --questions 40 --save
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+import threading
+
+from bench_utils import ROOT_DIR, free_port, percentile, save_results
+from fake_ollama import serve
+
+sys.path.insert(0, ROOT_DIR)
+
+FAQ = {
+    "documents.md": (
+        "# Справка об обучении\n\nСправку об обучении заказывают в деканате или через портал, "
+        "срок изготовления – три рабочих дня.\n\n"
+        "# Академический отпуск\n\nЗаявление на академический отпуск подаётся в деканат вместе с "
+        "подтверждающими документами."
+    ),
+    "study.txt": "Пересдачи проводятся по графику кафедры. Допуск на пересдачу выдаёт деканат.",
+}
+
+
+class FakeMessage:
+    """Заглушка aiogram Message: запоминает редактирования и новые сообщения."""
+
+    def __init__(self):
+        self.edits = []
+        self.sent = []
+
+    async def edit_text(self, text, **kwargs):
+        self.edits.append(text)
+
+    async def answer(self, text, **kwargs):
+        self.sent.append(text)
+        return FakeMessage()
+
+
+def check(name: str, ok: bool, details: str = ""):
+    print(f"{'OK  ' if ok else 'FAIL'} {name}{': ' + details if details else ''}")
+    return ok
+
+
+def timetable():
+    from assistant import Document
+    return [
+        Document("Расписание ПИ-201, Четная неделя, Понедельник",
+                 "1 пара (08:30-10:00): Математический анализ (лекция), ауд. 101", group=("ПИ", "201")),
+        Document("Расписание БИ-101, Четная неделя, Понедельник",
+                 "2 пара (10:10-11:40): Экономика (практика), ауд. 202", group=("БИ", "101")),
+    ]
+
+
+def make_assistant(url: str, faq_dir: str, **kwargs):
+    from assistant import Assistant, AnswerCache
+    return Assistant(url=url, model="fake", faq_dir=faq_dir, load_timetable=timetable,
+                     cache=AnswerCache(), **kwargs)
+
+
+async def ask(assistant, user_id: int, question: str, group=("ПИ", "201")):
+    from assistant import MessageStreamer
+    message = FakeMessage()
+    streamer = MessageStreamer(message, interval=0)
+    answer = await assistant.ask(user_id, question, group, streamer)
+    return answer, message
+
+
+async def run_checks(url: str, model, faq_dir: str) -> bool:
+    from assistant import AssistantBusy, AssistantUnavailable
+
+    assistant = make_assistant(url, faq_dir, max_concurrent=2)
+    index = await assistant.get_index()
+    found = index.search("Как получить справку об обучении?", ("ПИ", "201"))
+    ok = check("search", bool(found) and "Справка" in found[0].title, found[0].title if found else "ничего")
+    own = index.search("Когда математический анализ в понедельник", ("ПИ", "201"))
+    other = index.search("Когда математический анализ в понедельник", ("БИ", "101"))
+    ok &= check("search (группа)", any(d.group == ("ПИ", "201") for d in own)
+                and not any(d.group == ("ПИ", "201") for d in other))
+
+    model.reset()
+    answer, message = await ask(assistant, 1, "Как получить справку об обучении?")
+    ok &= check("stream", len(message.edits) >= 3 and message.edits[-1] == answer.strip(),
+                f"{len(message.edits)} редактирований")
+    _, message = await ask(assistant, 2, "  как получить СПРАВКУ об обучении ")
+    ok &= check("cache", model.stats()["requests"] == 1 and len(message.edits) == 1,
+                f"запросов к модели {model.stats()['requests']}")
+
+    model.reset()
+    await asyncio.gather(*(ask(assistant, 10 + i, "Как оформить академический отпуск?") for i in range(5)))
+    ok &= check("shared", model.stats()["requests"] == 1, f"запросов к модели {model.stats()['requests']}")
+
+    first = asyncio.ensure_future(ask(assistant, 3, "Где проходят пересдачи?"))
+    await asyncio.sleep(0)
+    try:
+        await ask(assistant, 3, "Кто выдаёт допуск на пересдачу?")
+        rejected = False
+    except AssistantBusy:
+        rejected = True
+    await first
+    ok &= check("user_limit", rejected)
+
+    model.reset()
+    await asyncio.gather(*(ask(assistant, 100 + i, f"Вопрос номер {i} про пересдачи") for i in range(6)))
+    ok &= check("model_limit", model.stats()["max_active"] <= 2, f"одновременно {model.stats()['max_active']}")
+    await assistant.close()
+
+    broken = make_assistant(f"http://127.0.0.1:{free_port()}", faq_dir)
+    try:
+        await ask(broken, 4, "Как получить справку?")
+        failed = False
+    except AssistantUnavailable:
+        failed = True
+    await broken.close()
+    ok &= check("unavailable", failed)
+    return ok
+
+
+async def run_load(url: str, faq_dir: str, questions: int, concurrency: int) -> list[dict]:
+    assistant = make_assistant(url, faq_dir, max_concurrent=concurrency, user_concurrent=questions)
+    semaphore = asyncio.Semaphore(concurrency)
+    results = []
+    for phase in ("model", "cache"):
+        latencies = []
+
+        async def one(i):
+            async with semaphore:
+                started = time.perf_counter()
+                await ask(assistant, i, f"Вопрос {i}: как получить справку об обучении?")
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(questions)))
+        wall = time.perf_counter() - started
+        results.append({
+            "scenario": "assistant", "operation": phase, "concurrency": concurrency, "requests": questions,
+            "rps": questions / wall if wall else 0.0,
+            "p50_ms": percentile(latencies, 50) * 1000, "p95_ms": percentile(latencies, 95) * 1000,
+            "max_ms": max(latencies, default=0.0) * 1000,
+        })
+    await assistant.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Проверка ассистента на фейковой модели")
+    parser.add_argument("--latency", type=float, default=0.3, help="задержка модели до первого слова, с")
+    parser.add_argument("--token-delay", type=float, default=0.01, help="задержка между словами, с")
+    parser.add_argument("--questions", type=int, default=40, help="вопросов в замере")
+    parser.add_argument("--concurrency", type=int, default=4, help="одновременных вопросов в замере")
+    parser.add_argument("--checks-only", action="store_true", help="только проверки")
+    parser.add_argument("--save", action="store_true", help="сохранить результаты в bench/results")
+    parser.add_argument("--json", help="сохранить результаты в указанный файл")
+    args = parser.parse_args()
+
+    server = serve(port=free_port(), latency=args.latency, token_delay=args.token_delay)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    with tempfile.TemporaryDirectory() as faq_dir:
+        for name, text in FAQ.items():
+            with open(os.path.join(faq_dir, name), "w", encoding="utf-8") as f:
+                f.write(text)
+        if not asyncio.run(run_checks(url, server.model, faq_dir)):
+            sys.exit(1)
+        if args.checks_only:
+            return
+        results = asyncio.run(run_load(url, faq_dir, args.questions, args.concurrency))
+    server.shutdown()
+
+    header = f"{'phase':>6} {'conc':>5} {'req':>5} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(f"{r['operation']:>6} {r['concurrency']:>5} {r['requests']:>5} {r['rps']:>8.1f} "
+              f"{r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} {r['max_ms']:>8.1f}")
+    if args.save or args.json:
+        params = {"latency": args.latency, "token_delay": args.token_delay,
+                  "questions": args.questions, "concurrency": args.concurrency}
+        print(f"Результаты: {save_results('assistant', results, params, args.json)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+"""
+Нагрузочный тест бота без Telegram: синтетические обновления подаются прямо в dp.feed_update,
+а все ответы бота уходят на локальную замену Bot API (bench/fake_telegram.py).
+
+Каждый пользователь проходит сценарий просмотра расписания:
+    /start -> menu:schedule -> week:<тип недели> -> day:<день>
+Для каждого шага и уровня одновременности печатаются обновлений в секунду, p50/p95/p99,
+вызовы Bot API и число подключений к Postgres (по pg_stat_activity).
+
+Нужна локальная тестовая база: DATABASE_URL и SCHEDULE_DATABASE_URL должны указывать на localhost.
+    python bench/bench_bot.py --users 200 --concurrency 10,50,200 --save
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import logging
+import argparse
+import subprocess
+import urllib.request
+
+from bench_utils import (
+    BENCH_DIR, ROOT_DIR, summarize, free_port, wait_for_port, require_local_dsn,
+    ConnectionSampler, save_results,
+)
+from fake_telegram import BOT_USER
+
+STEPS = ["start", "menu:schedule", "week", "day"]
+
+
+def telegram_call(api_url: str, path: str, data: bytes | None = None):
+    with urllib.request.urlopen(urllib.request.Request(f"{api_url}{path}", data=data)) as response:
+        return json.load(response)
+
+
+def start_fake_telegram(latency: float) -> tuple[subprocess.Popen, str]:
+    port = free_port()
+    process = subprocess.Popen([
+        sys.executable, os.path.join(BENCH_DIR, "fake_telegram.py"), "--port", str(port), "--latency", str(latency),
+    ], stdout=subprocess.DEVNULL)
+    wait_for_port(port, process)
+    return process, f"http://127.0.0.1:{port}"
+
+
+class UpdateFactory:
+    def __init__(self, bot):
+        from aiogram.types import Update
+
+        self.bot = bot
+        self.Update = Update
+        self.update_id = 0
+
+    def _next_id(self) -> int:
+        self.update_id += 1
+        return self.update_id
+
+    @staticmethod
+    def _user(telegram_id: int) -> dict:
+        return {"id": telegram_id, "is_bot": False, "first_name": "Студент", "last_name": "Нагрузочный"}
+
+    def message(self, telegram_id: int, text: str):
+        update_id = self._next_id()
+        message = {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": telegram_id, "type": "private"},
+            "from": self._user(telegram_id),
+            "text": text,
+        }
+        if text.startswith("/"):
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+        return self.Update.model_validate({"update_id": update_id, "message": message}, context={"bot": self.bot})
+
+    def callback(self, telegram_id: int, data: str):
+        update_id = self._next_id()
+        return self.Update.model_validate({
+            "update_id": update_id,
+            "callback_query": {
+                "id": str(update_id),
+                "from": self._user(telegram_id),
+                "chat_instance": str(telegram_id),
+                "data": data,
+                "message": {
+                    "message_id": update_id,
+                    "date": int(time.time()),
+                    "chat": {"id": telegram_id, "type": "private"},
+                    "from": BOT_USER,
+                    "text": "Выберите действие:",
+                },
+            },
+        }, context={"bot": self.bot})
+
+
+async def user_session(dp, bot, factory: UpdateFactory, telegram_id: int, latencies: dict, errors: dict):
+    from schedule_db import DAYS_OF_WEEK, WEEK_TYPES
+
+    updates = [
+        ("start", factory.message(telegram_id, "/start")),
+        ("menu:schedule", factory.callback(telegram_id, "menu:schedule")),
+        ("week", factory.callback(telegram_id, f"week:{random.choice(WEEK_TYPES)}")),
+        ("day", factory.callback(telegram_id, f"day:{random.choice(DAYS_OF_WEEK)}")),
+    ]
+    for step, update in updates:
+        started = time.perf_counter()
+        try:
+            await dp.feed_update(bot, update)
+        except Exception as e:
+            errors[step] += 1
+            logging.warning(f"{step}: {e}")
+            continue
+        latencies[step].append(time.perf_counter() - started)
+
+
+async def run_level(dp, bot, telegram_ids: list[int], concurrency: int) -> tuple[dict, dict, float]:
+    factory = UpdateFactory(bot)
+    latencies = {step: [] for step in STEPS}
+    errors = {step: 0 for step in STEPS}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def limited(telegram_id):
+        async with semaphore:
+            await user_session(dp, bot, factory, telegram_id, latencies, errors)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(limited(telegram_id) for telegram_id in telegram_ids))
+    return latencies, errors, time.perf_counter() - started
+
+
+async def run(args, api_url: str, telegram_ids: list[int]) -> list[dict]:
+    import main
+
+    # Каждое обновление aiogram пишет в лог на уровне INFO – в тесте это только шум
+    logging.getLogger("aiogram").setLevel(logging.WARNING)
+    results = []
+    try:
+        for concurrency in args.concurrency:
+            telegram_call(api_url, "/__reset", b"")
+            with ConnectionSampler(os.getenv("DATABASE_URL")) as sampler:
+                latencies, errors, wall = await run_level(main.dp, main.bot, telegram_ids, concurrency)
+            api_calls = telegram_call(api_url, "/__stats")
+            results.append({
+                "scenario": "bot", "operation": "all", "concurrency": concurrency,
+                **summarize([x for v in latencies.values() for x in v], wall, sum(errors.values())),
+                "telegram_calls": api_calls["by_method"],
+                "db_connections": sampler.summary(),
+            })
+            for step in STEPS:
+                results.append({
+                    "scenario": "bot", "operation": step, "concurrency": concurrency,
+                    **summarize(latencies[step], wall, errors[step]),
+                })
+    finally:
+        await main.write_buffer.close()
+        await main.bot.session.close()
+    return results
+
+
+def print_table(results: list[dict]):
+    header = f"{'operation':<14} {'conc':>5} {'req':>6} {'err':>4} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}  db max"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        db = ", ".join(f"{name}={c['max']}" for name, c in r.get("db_connections", {}).items())
+        print(f"{r['operation']:<14} {r['concurrency']:>5} {r['requests']:>6} {r['errors']:>4} {r['rps']:>8.1f} "
+              f"{r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f}  {db}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест бота с фейковым Telegram")
+    parser.add_argument("--users", type=int, default=200, help="число синтетических студентов")
+    parser.add_argument("--concurrency", default="10,50,200", help="одновременных пользователей, через запятую")
+    parser.add_argument("--telegram-latency", type=float, default=0.02, help="задержка ответа Bot API, с")
+    parser.add_argument("--save", action="store_true", help="сохранить результаты в bench/results")
+    parser.add_argument("--json", help="сохранить результаты в указанный файл")
+    parser.add_argument("--keep-data", action="store_true", help="не удалять тестовых студентов после прогона")
+    args = parser.parse_args()
+    args.concurrency = [int(x) for x in args.concurrency.split(",") if x]
+
+    from dotenv import load_dotenv
+    load_dotenv(os.path.join(ROOT_DIR, ".env"))
+    require_local_dsn(os.getenv("DATABASE_URL"), "DATABASE_URL")
+    require_local_dsn(os.getenv("SCHEDULE_DATABASE_URL"), "SCHEDULE_DATABASE_URL")
+
+    import seed
+
+    process, api_url = start_fake_telegram(args.telegram_latency)
+    os.environ["TELEGRAM_API_URL"] = api_url
+    # Настоящий токен не нужен: все запросы бота уходят на локальную замену Bot API
+    os.environ["TELEGRAM_TOKEN"] = "123456:bench"
+    try:
+        telegram_ids = seed.seed_all(args.users)
+        results = asyncio.run(run(args, api_url, telegram_ids))
+    finally:
+        process.terminate()
+        process.wait()
+        if not args.keep_data:
+            seed.cleanup_all()
+
+    print_table(results)
+    if args.save or args.json:
+        params = {"users": args.users, "concurrency": args.concurrency, "telegram_latency": args.telegram_latency}
+        print(f"Результаты: {save_results('bot', results, params, args.json)}")
+
+
+if __name__ == "__main__":
+    main()
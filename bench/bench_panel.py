@@ -0,0 +1,204 @@
+"""
+Нагрузочный тест панели деканата (app.py) по HTTP.
+Поднимает панель (встроенный сервер Flask или gunicorn) на локальной тестовой базе,
+уведомления /create_event отправляются в локальную замену Bot API (bench/fake_telegram.py).
+
+Маршруты:
+    login        – POST /login тестового декана;
+    add_schedule – POST /add_schedule для тестовых групп;
+    create_event – POST /create_event с рассылкой нескольким тестовым студентам.
+Для каждого маршрута и уровня одновременности печатаются запросов в секунду,
+p50/p95/p99 и число подключений к Postgres (по pg_stat_activity).
+
+    python bench/bench_panel.py --concurrency 1,8,32 --duration 10 --save
+    python bench/bench_panel.py --server gunicorn --workers 4
+    python bench/bench_panel.py --server hypercorn --workers 1   # асинхронный режим (asgi.py)
+    python bench/bench_panel.py --url http://127.0.0.1:5000   # уже запущенная панель
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import threading
+import subprocess
+
+import requests
+
+from bench_utils import (
+    BENCH_DIR, ROOT_DIR, summarize, free_port, wait_for_port, require_local_dsn,
+    ConnectionSampler, save_results,
+)
+
+ROUTES = ["login", "add_schedule", "create_event"]
+
+
+def start_panel(server: str, workers: int, env: dict) -> tuple[subprocess.Popen, str]:
+    port = free_port()
+    if server == "hypercorn":
+        command = ["hypercorn", "-w", str(workers), "-b", f"127.0.0.1:{port}", "asgi:application"]
+    elif server == "gunicorn":
+        command = ["gunicorn", "-c", "gunicorn.conf.py", "-w", str(workers), "--threads", "4",
+                   "-b", f"127.0.0.1:{port}", "app:create_app()"]
+    else:
+        command = [sys.executable, "-c",
+                   f"import app; app.create_app().run(host='127.0.0.1', port={port}, threaded=True, debug=False)"]
+    process = subprocess.Popen(command, cwd=ROOT_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    wait_for_port(port, process, timeout=30)
+    return process, f"http://127.0.0.1:{port}"
+
+
+def start_fake_telegram(latency: float) -> tuple[subprocess.Popen, str]:
+    port = free_port()
+    process = subprocess.Popen([
+        sys.executable, os.path.join(BENCH_DIR, "fake_telegram.py"), "--port", str(port), "--latency", str(latency),
+    ], stdout=subprocess.DEVNULL)
+    wait_for_port(port, process)
+    return process, f"http://127.0.0.1:{port}"
+
+
+class PanelClient:
+    """Один виртуальный пользователь панели со своей сессией (cookie)."""
+
+    def __init__(self, base_url: str, telegram_ids: list[int]):
+        from seed import BENCH_DEAN
+
+        self.base_url = base_url
+        self.telegram_ids = telegram_ids
+        self.username, self.password = BENCH_DEAN
+        self.session = requests.Session()
+        self.counter = 0
+
+    def login(self) -> bool:
+        response = self.session.post(f"{self.base_url}/login", data={"username": self.username, "password": self.password},
+                                     allow_redirects=False)
+        return response.status_code == 302 and response.headers.get("Location", "").endswith("/dashboard")
+
+    def add_schedule(self) -> bool:
+        from seed import BENCH_GROUPS, bench_pairs
+        from schedule_db import DAYS_OF_WEEK, WEEK_TYPES
+
+        self.counter += 1
+        direction, group_number = random.choice(BENCH_GROUPS)
+        day_of_week = random.choice(DAYS_OF_WEEK)
+        form = {"direction": direction, "group_number": group_number,
+                "week_type": random.choice(WEEK_TYPES), "day_of_week": day_of_week}
+        # Чередуем два варианта дня, чтобы часть сохранений действительно меняла пары
+        for pair in bench_pairs(direction, group_number, day_of_week, variant=self.counter):
+            i = pair["pair_number"] - 1
+            form.update({f"subject_{i}": pair["subject"], f"type_{i}": pair["lesson_type"],
+                         f"teacher_{i}": pair["teacher"], f"room_{i}": pair["room"]})
+        response = self.session.post(f"{self.base_url}/add_schedule", data=form, allow_redirects=False)
+        return response.status_code == 200 and "успешно" in response.text
+
+    def create_event(self) -> bool:
+        recipients = random.sample(self.telegram_ids, min(5, len(self.telegram_ids)))
+        response = self.session.post(f"{self.base_url}/create_event", allow_redirects=False,
+                                     data={"student": [str(x) for x in recipients], "message": "Нагрузочный тест"})
+        return response.status_code == 200
+
+
+def run_level(base_url: str, telegram_ids: list[int], route: str, concurrency: int, duration: float):
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def worker():
+        nonlocal errors
+        client = PanelClient(base_url, telegram_ids)
+        if route != "login" and not client.login():
+            with lock:
+                errors += 1
+            return
+        operation = getattr(client, route)
+        while time.perf_counter() < stop_at:
+            started = time.perf_counter()
+            try:
+                ok = operation()
+            except requests.RequestException:
+                ok = False
+            elapsed = time.perf_counter() - started
+            with lock:
+                if ok:
+                    latencies.append(elapsed)
+                else:
+                    errors += 1
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors, time.perf_counter() - started
+
+
+def print_table(results: list[dict]):
+    header = f"{'route':<14} {'conc':>5} {'req':>6} {'err':>5} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}  db max"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        db = ", ".join(f"{name}={c['max']}" for name, c in r["db_connections"].items())
+        print(f"{r['operation']:<14} {r['concurrency']:>5} {r['requests']:>6} {r['errors']:>5} {r['rps']:>8.1f} "
+              f"{r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f}  {db}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест панели деканата")
+    parser.add_argument("--routes", default=",".join(ROUTES), help="маршруты через запятую")
+    parser.add_argument("--concurrency", default="1,8,32", help="одновременных клиентов, через запятую")
+    parser.add_argument("--duration", type=float, default=10.0, help="длительность каждого уровня, с")
+    parser.add_argument("--students", type=int, default=50, help="тестовых студентов для рассылок")
+    parser.add_argument("--server", choices=["flask", "gunicorn", "hypercorn"], default="flask")
+    parser.add_argument("--workers", type=int, default=2, help="процессов gunicorn / hypercorn")
+    parser.add_argument("--url", help="уже запущенная панель (тогда сервер не поднимается)")
+    parser.add_argument("--telegram-latency", type=float, default=0.02, help="задержка ответа Bot API, с")
+    parser.add_argument("--save", action="store_true", help="сохранить результаты в bench/results")
+    parser.add_argument("--json", help="сохранить результаты в указанный файл")
+    args = parser.parse_args()
+    levels = [int(x) for x in args.concurrency.split(",") if x]
+    routes = [x for x in args.routes.split(",") if x]
+
+    from dotenv import load_dotenv
+    load_dotenv(os.path.join(ROOT_DIR, ".env"))
+    require_local_dsn(os.getenv("DATABASE_URL"), "DATABASE_URL")
+    require_local_dsn(os.getenv("SCHEDULE_DATABASE_URL"), "SCHEDULE_DATABASE_URL")
+
+    import seed
+
+    processes = []
+    telegram_process, api_url = start_fake_telegram(args.telegram_latency)
+    processes.append(telegram_process)
+    env = dict(os.environ, TELEGRAM_API_URL=api_url, TELEGRAM_TOKEN="123456:bench")
+    results = []
+    try:
+        telegram_ids = seed.seed_all(args.students)
+        base_url = args.url
+        if not base_url:
+            panel_process, base_url = start_panel(args.server, args.workers, env)
+            processes.append(panel_process)
+        for route in routes:
+            for concurrency in levels:
+                with ConnectionSampler(os.getenv("DATABASE_URL")) as sampler:
+                    latencies, errors, wall = run_level(base_url, telegram_ids, route, concurrency, args.duration)
+                results.append({
+                    "scenario": "panel", "operation": route, "concurrency": concurrency,
+                    **summarize(latencies, wall, errors),
+                    "db_connections": sampler.summary(),
+                })
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
+        seed.cleanup_all()
+
+    print_table(results)
+    if args.save or args.json:
+        params = {"routes": routes, "concurrency": levels, "duration": args.duration,
+                  "server": args.url or args.server, "workers": args.workers}
+        print(f"Результаты: {save_results('panel', results, params, args.json)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""
+Нагрузочное измерение цепочки получения данных с портала без обращения к настоящему eu.iit.csu.ru.
+
+Поднимает bench/fake_portal.py с заданной задержкой и вызывает функции бота
+get_courses_list, get_course_grades, get_all_retakes_tables_html и разбор страниц
+при растущем числе одновременных запросов. Для каждой реализации печатает
+p50/p95 задержки, страниц портала в секунду и пиковый RSS.
+
+Реализации:
+    scrape  – Selenium + BeautifulSoup (нужны Chrome и chromedriver);
+    ws      – веб-сервисы Moodle (moodle_api), пересдачи по-прежнему через Selenium;
+    parsers – только разбор сохранённых страниц, без сети.
+
+Запуск из корня репозитория:
+    python bench/bench_portal.py --impl scrape,ws,parsers --concurrency 1,2,4,8 --latency 0.2
+Каждая реализация выполняется в отдельном процессе, чтобы пиковый RSS не смешивался.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import subprocess
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from bench_utils import BENCH_DIR, ROOT_DIR, percentile, free_port, save_results
+
+PAGES_DIR = os.path.join(BENCH_DIR, "pages")
+
+COURSE_ID = "3100"
+BENCH_LOGIN = "student"
+BENCH_PASSWORD = "secret"
+
+
+def peak_rss_mb() -> dict:
+    """Пиковый RSS процесса и его дочерних процессов (chromedriver, Chrome), МБ."""
+    # ru_maxrss: килобайты в Linux, байты в macOS
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return {
+        "self": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / divisor,
+        "children": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / divisor,
+    }
+
+
+def portal_stats(portal_url: str) -> int:
+    with urllib.request.urlopen(f"{portal_url}/__stats") as response:
+        return json.load(response)["requests"]
+
+
+def portal_reset(portal_url: str):
+    urllib.request.urlopen(urllib.request.Request(f"{portal_url}/__reset", data=b"", method="POST")).close()
+
+
+def load_workloads(impl: str) -> dict:
+    """Имя операции -> функция без аргументов, выполняющая одну операцию."""
+    # main.py читает настройки при импорте: токен бота нужен только для создания объекта Bot
+    os.environ.setdefault("TELEGRAM_TOKEN", "123456:bench")
+    sys.path.insert(0, ROOT_DIR)
+    import main
+
+    if impl == "parsers":
+        pages = {}
+        for name in ("overview.html", "user_report.html", "retakes.html"):
+            with open(os.path.join(PAGES_DIR, name), encoding="utf-8") as f:
+                pages[name] = f.read()
+        return {
+            "parse_courses_overview": lambda: main.parse_courses_overview(pages["overview.html"], "(2 сем.) 2024-2025"),
+            "parse_course_grades": lambda: main.parse_course_grades(pages["user_report.html"]),
+            "parse_all_retakes_tables": lambda: main.parse_all_retakes_tables(pages["retakes.html"]),
+        }
+
+    main.MOODLE_API_MODE = impl
+    return {
+        "get_courses_list": lambda: main.get_courses_list(BENCH_LOGIN, BENCH_PASSWORD),
+        "get_course_grades": lambda: main.get_course_grades(BENCH_LOGIN, BENCH_PASSWORD, COURSE_ID),
+        "get_all_retakes_tables_html": lambda: main.get_all_retakes_tables_html(BENCH_LOGIN, BENCH_PASSWORD),
+    }
+
+
+def run_level(operation, concurrency: int, requests_count: int) -> tuple[list[float], float, int]:
+    latencies = []
+    errors = 0
+
+    def timed():
+        started = time.perf_counter()
+        operation()
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(timed) for _ in range(requests_count)]
+        for future in futures:
+            try:
+                latencies.append(future.result())
+            except Exception:
+                errors += 1
+    return latencies, time.perf_counter() - started, errors
+
+
+def run_worker(impl: str, portal_url: str, levels: list[int], requests_per_worker: int) -> list[dict]:
+    """Выполняется в дочернем процессе: все операции одной реализации на всех уровнях."""
+    os.environ["PORTAL_URL"] = portal_url
+    workloads = load_workloads(impl)
+    results = []
+    for name, operation in workloads.items():
+        operation()  # прогрев: импорт, первый запуск браузера, токен веб-сервиса
+        for concurrency in levels:
+            count = max(concurrency * requests_per_worker, 1)
+            if impl != "parsers":
+                portal_reset(portal_url)
+            latencies, wall, errors = run_level(operation, concurrency, count)
+            pages = portal_stats(portal_url) if impl != "parsers" else len(latencies)
+            results.append({
+                "scenario": "portal",
+                "impl": impl,
+                "operation": name,
+                "concurrency": concurrency,
+                "requests": count,
+                "errors": errors,
+                "p50_ms": percentile(latencies, 50) * 1000,
+                "p95_ms": percentile(latencies, 95) * 1000,
+                "pages_per_s": pages / wall if wall else 0.0,
+            })
+    rss = peak_rss_mb()
+    for row in results:
+        row["peak_rss_mb"] = rss["self"]
+        row["peak_rss_children_mb"] = rss["children"]
+    return results
+
+
+def start_fake_portal(latency: float, jitter: float) -> tuple[subprocess.Popen, str]:
+    port = free_port()
+    process = subprocess.Popen([
+        sys.executable, os.path.join(BENCH_DIR, "fake_portal.py"),
+        "--port", str(port), "--latency", str(latency), "--jitter", str(jitter),
+    ], stdout=subprocess.DEVNULL)
+    portal_url = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        try:
+            portal_stats(portal_url)
+            return process, portal_url
+        except OSError:
+            time.sleep(0.05)
+    process.kill()
+    raise RuntimeError("Фейковый портал не запустился")
+
+
+def print_table(rows: list[dict]):
+    header = f"{'impl':<8} {'operation':<28} {'conc':>4} {'req':>5} {'err':>4} {'p50 ms':>9} {'p95 ms':>9} {'pages/s':>9} {'RSS MB':>8} {'child MB':>9}"
+    print(header)
+    print("-" * len(header))
+    for r in rows:
+        print(f"{r['impl']:<8} {r['operation']:<28} {r['concurrency']:>4} {r['requests']:>5} {r['errors']:>4} "
+              f"{r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f} {r['pages_per_s']:>9.1f} "
+              f"{r['peak_rss_mb']:>8.1f} {r['peak_rss_children_mb']:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочное измерение получения данных с портала")
+    parser.add_argument("--impl", default="scrape,ws,parsers", help="реализации через запятую")
+    parser.add_argument("--concurrency", default="1,2,4,8", help="уровни одновременности через запятую")
+    parser.add_argument("--requests", type=int, default=3, help="запросов на один поток на каждом уровне")
+    parser.add_argument("--latency", type=float, default=0.2, help="задержка ответа фейкового портала, с")
+    parser.add_argument("--jitter", type=float, default=0.2)
+    parser.add_argument("--portal-url", help="уже запущенный портал вместо локального фейкового")
+    parser.add_argument("--save", action="store_true", help="сохранить результаты в bench/results")
+    parser.add_argument("--json", help="сохранить результаты в указанный файл")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    levels = [int(x) for x in args.concurrency.split(",") if x]
+
+    if args.worker:
+        json.dump(run_worker(args.worker, args.portal_url, levels, args.requests), sys.stdout)
+        return
+
+    process, portal_url = (None, args.portal_url) if args.portal_url else start_fake_portal(args.latency, args.jitter)
+    rows = []
+    try:
+        for impl in [x for x in args.impl.split(",") if x]:
+            completed = subprocess.run([
+                sys.executable, os.path.abspath(__file__), "--worker", impl, "--portal-url", portal_url,
+                "--concurrency", args.concurrency, "--requests", str(args.requests),
+            ], capture_output=True, text=True)
+            if completed.returncode != 0:
+                print(f"{impl}: ошибка\n{completed.stderr[-2000:]}", file=sys.stderr)
+                continue
+            rows.extend(json.loads(completed.stdout.strip().splitlines()[-1]))
+    finally:
+        if process:
+            process.terminate()
+            process.wait()
+
+    print_table(rows)
+    if args.save or args.json:
+        params = {"impl": args.impl, "concurrency": levels, "requests": args.requests,
+                  "latency": args.latency, "jitter": args.jitter, "portal_url": args.portal_url}
+        print(f"Результаты: {save_results('portal', rows, params, args.json)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Проверка маршрутизации чтения на реплику (db.py) на двух локальных Postgres.
+Основная база – SCHEDULE_DATABASE_URL, реплика – SCHEDULE_DATABASE_REPLICA_URL
+(потоковая реплика или просто второй сервер: у обычного сервера отставание считается нулевым).
+
+Проверяется:
+    routing   – чтения без недавней записи идут в реплику;
+    own_write – после mark_written() чтения того же пользователя идут в основную базу;
+    fallback  – реплика недоступна (неверный порт) -> чтения в основной базе;
+    load      – чтение расписания из нескольких потоков: запросов в секунду, p50/p95/p99
+                и число подключений к каждому серверу (по pg_stat_activity).
+
+    python bench/bench_replica.py --concurrency 1,8,32 --duration 5 --save
+"""
+import os
+import sys
+import time
+import argparse
+import threading
+
+from bench_utils import ROOT_DIR, summarize, free_port, require_local_dsn, ConnectionSampler, save_results
+
+sys.path.insert(0, ROOT_DIR)
+
+
+def check(name: str, ok: bool, details: str = ""):
+    print(f"{'OK  ' if ok else 'FAIL'} {name}{': ' + details if details else ''}")
+    return ok
+
+
+def routed_to(database, **kwargs) -> str:
+    before = dict(database.routed)
+    database.connect_read(**kwargs).close()
+    return next(target for target in ("replica", "fallback", "primary")
+                if database.routed.get(target, 0) > before.get(target, 0))
+
+
+def run_checks() -> bool:
+    import db
+
+    database = db.Database("schedule", "SCHEDULE_DATABASE_URL", "SCHEDULE_DATABASE_REPLICA_URL")
+    ok = check("routing", routed_to(database) == "replica", str(database.status()))
+    database.mark_written(9_000_000_001)
+    ok &= check("own_write", routed_to(database, key=9_000_000_001) == "primary")
+    ok &= check("own_write (сессия)", routed_to(database, written_at=time.time()) == "primary")
+    ok &= check("other_user", routed_to(database, key=9_000_000_002) == "replica")
+
+    os.environ["BENCH_BROKEN_REPLICA_URL"] = f"postgresql://127.0.0.1:{free_port()}/postgres"
+    broken = db.Database("broken", "SCHEDULE_DATABASE_URL", "BENCH_BROKEN_REPLICA_URL")
+    ok &= check("fallback", routed_to(broken) == "fallback")
+    started = time.perf_counter()
+    routed_to(broken)
+    # После ошибки реплика пропускается, не тратя время на подключение
+    ok &= check("fallback_fast", time.perf_counter() - started < 0.5,
+                f"{(time.perf_counter() - started) * 1000:.0f} мс")
+    return ok
+
+
+def run_level(database, concurrency: int, duration: float):
+    from schedule_db import get_table_name_by_direction
+
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+    table = get_table_name_by_direction("ПИ")
+
+    def worker():
+        nonlocal errors
+        while time.perf_counter() < stop_at:
+            started = time.perf_counter()
+            try:
+                conn = database.connect_read()
+                cur = conn.cursor()
+                cur.execute(f"SELECT schedule_text FROM {table} WHERE group_number = %s LIMIT 1", ("901",))
+                cur.fetchall()
+                conn.close()
+            except Exception:
+                with lock:
+                    errors += 1
+                continue
+            with lock:
+                latencies.append(time.perf_counter() - started)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Проверка чтения с реплики")
+    parser.add_argument("--concurrency", default="1,8,32", help="потоков чтения, через запятую")
+    parser.add_argument("--duration", type=float, default=5.0, help="длительность каждого уровня, с")
+    parser.add_argument("--checks-only", action="store_true", help="только проверки маршрутизации")
+    parser.add_argument("--save", action="store_true", help="сохранить результаты в bench/results")
+    parser.add_argument("--json", help="сохранить результаты в указанный файл")
+    args = parser.parse_args()
+    levels = [int(x) for x in args.concurrency.split(",") if x]
+
+    from dotenv import load_dotenv
+    load_dotenv(os.path.join(ROOT_DIR, ".env"))
+    primary_dsn = os.getenv("SCHEDULE_DATABASE_URL")
+    replica_dsn = os.getenv("SCHEDULE_DATABASE_REPLICA_URL")
+    require_local_dsn(primary_dsn, "SCHEDULE_DATABASE_URL")
+    require_local_dsn(replica_dsn, "SCHEDULE_DATABASE_REPLICA_URL")
+
+    if not run_checks():
+        sys.exit(1)
+    if args.checks_only:
+        return
+
+    import db
+
+    results = []
+    for concurrency in levels:
+        database = db.Database("schedule", "SCHEDULE_DATABASE_URL", "SCHEDULE_DATABASE_REPLICA_URL")
+        with ConnectionSampler(primary_dsn) as primary, ConnectionSampler(replica_dsn) as replica:
+            latencies, errors, wall = run_level(database, concurrency, args.duration)
+        results.append({
+            "scenario": "replica", "operation": "schedule_read", "concurrency": concurrency,
+            **summarize(latencies, wall, errors),
+            "routed": dict(database.routed),
+            "db_connections": {"primary": primary.summary(), "replica": replica.summary()},
+        })
+
+    header = f"{'conc':>5} {'req':>7} {'err':>5} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}  routed"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(f"{r['concurrency']:>5} {r['requests']:>7} {r['errors']:>5} {r['rps']:>8.1f} {r['p50_ms']:>8.1f} "
+              f"{r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f}  {r['routed']}")
+    if args.save or args.json:
+        params = {"concurrency": levels, "duration": args.duration}
+        print(f"Результаты: {save_results('replica', results, params, args.json)}")
+
+
+if __name__ == "__main__":
+    main()
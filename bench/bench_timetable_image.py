@@ -0,0 +1,174 @@
+"""
+Проверка картинок расписания недели (timetable_image.py) на фейковом Telegram (bench/fake_telegram.py).
+База заменена словарём в памяти, отправка идёт через настоящий aiogram Bot.
+
+Проверяется:
+    hash        – хэш не зависит от запроса и меняется при изменении пары;
+    single      – одновременные запросы одной недели: одна отрисовка и одна загрузка, остальным – file_id;
+    restart     – новый процесс (пустая память) берёт file_id из «базы» без отрисовки;
+    change      – после изменения расписания картинка рисуется и загружается один раз заново.
+Затем замеряется время отрисовки полностью заполненной недели и размер PNG.
+
+    python bench/bench_timetable_image.py --requests 50 --save
+"""
+import sys
+import time
+import asyncio
+import argparse
+import threading
+
+from bench_utils import ROOT_DIR, free_port, percentile, save_results
+from fake_telegram import serve
+
+sys.path.insert(0, ROOT_DIR)
+
+SUBJECTS = ["Математический анализ", "Программирование на Python", "Базы данных", "Английский язык",
+            "Дискретная математика", "Операционные системы"]
+
+
+def check(name: str, ok: bool, details: str = ""):
+    print(f"{'OK  ' if ok else 'FAIL'} {name}{': ' + details if details else ''}")
+    return ok
+
+
+def week_slots(pairs_per_day: int) -> list[dict]:
+    from schedule_db import DAYS_OF_WEEK
+    return [
+        {"week_type": "Четная", "day_of_week": day, "pair_number": pair,
+         "subject": SUBJECTS[(d + pair) % len(SUBJECTS)], "lesson_type": "лекция" if pair % 2 else "практика",
+         "teacher": "Иванов Иван Иванович", "room": f"{d + 1}{pair:02d}"}
+        for d, day in enumerate(DAYS_OF_WEEK) for pair in range(1, pairs_per_day + 1)
+    ]
+
+
+class ChatMessage:
+    """То, что бот получает в callback.message: answer() и answer_photo() отправляют в этот чат."""
+
+    def __init__(self, bot, chat_id: int):
+        self.bot = bot
+        self.chat_id = chat_id
+
+    async def answer(self, text, **kwargs):
+        return await self.bot.send_message(self.chat_id, text, **kwargs)
+
+    async def answer_photo(self, photo, **kwargs):
+        return await self.bot.send_photo(self.chat_id, photo, **kwargs)
+
+
+def make_images(slots: dict, stored: dict):
+    from timetable_image import WeekImages
+
+    class MemoryWeekImages(WeekImages):
+        def load_slots(self, direction, group_number, week_type):
+            return slots[(direction, group_number, week_type)]
+
+        def lookup(self, digest):
+            return stored.get(digest)
+
+        def store(self, digest, direction, group_number, week_type, file_id):
+            if file_id is None:
+                stored.pop(digest, None)
+            else:
+                stored[digest] = file_id
+
+    return MemoryWeekImages()
+
+
+async def run_checks(api_url: str, telegram, requests: int) -> bool:
+    from aiogram import Bot
+    from aiogram.client.session.aiohttp import AiohttpSession
+    from aiogram.client.telegram import TelegramAPIServer
+    import timetable_image
+
+    renders = 0
+    render = timetable_image.render_week_png
+
+    def counted_render(*args):
+        nonlocal renders
+        renders += 1
+        return render(*args)
+
+    timetable_image.render_week_png = counted_render
+    bot = Bot(token="123456:bench", session=AiohttpSession(api=TelegramAPIServer.from_base(api_url)))
+    key = ("ПИ", "201", "Четная")
+    slots = {key: week_slots(3)}
+    stored = {}
+
+    first = timetable_image.content_hash(*key, slots[key])
+    changed = [dict(s) for s in slots[key]]
+    changed[0]["room"] = "999"
+    ok = check("hash", first == timetable_image.content_hash(*key, [dict(s) for s in slots[key]])
+               and first != timetable_image.content_hash(*key, changed))
+
+    images = make_images(slots, stored)
+    telegram.reset()
+    await asyncio.gather(*(images.send(ChatMessage(bot, 1000 + i), *key) for i in range(requests)))
+    stats = telegram.stats()["by_method"]
+    ok &= check("single", renders == 1 and stats.get("upload") == 1 and stats.get("sendphoto") == requests,
+                f"отрисовок {renders}, загрузок {stats.get('upload', 0)}, отправок {stats.get('sendphoto', 0)}")
+
+    telegram.reset()
+    await make_images(slots, stored).send(ChatMessage(bot, 1), *key)
+    ok &= check("restart", renders == 1 and not telegram.stats()["by_method"].get("upload"))
+
+    slots[key] = changed
+    telegram.reset()
+    await asyncio.gather(*(images.send(ChatMessage(bot, 2000 + i), *key) for i in range(requests)))
+    stats = telegram.stats()["by_method"]
+    ok &= check("change", renders == 2 and stats.get("upload") == 1 and len(stored) == 2,
+                f"отрисовок {renders}, загрузок {stats.get('upload', 0)}")
+
+    timetable_image.render_week_png = render
+    await bot.session.close()
+    return ok
+
+
+def measure_render(runs: int) -> list[dict]:
+    from timetable_image import render_week_png
+
+    results = []
+    for pairs in (3, 6):
+        slots = week_slots(pairs)
+        timings = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            png = render_week_png("ПИ", "201", "Четная", slots)
+            timings.append(time.perf_counter() - started)
+        results.append({
+            "scenario": "timetable_image", "operation": f"render_{pairs}_pairs", "runs": runs,
+            "p50_ms": percentile(timings, 50) * 1000, "max_ms": max(timings) * 1000, "png_kb": len(png) / 1024,
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Проверка картинок расписания недели")
+    parser.add_argument("--requests", type=int, default=50, help="одновременных запросов одной недели")
+    parser.add_argument("--latency", type=float, default=0.02, help="задержка фейкового Telegram, с")
+    parser.add_argument("--runs", type=int, default=20, help="замеров отрисовки")
+    parser.add_argument("--checks-only", action="store_true", help="только проверки")
+    parser.add_argument("--save", action="store_true", help="сохранить результаты в bench/results")
+    parser.add_argument("--json", help="сохранить результаты в указанный файл")
+    args = parser.parse_args()
+
+    server = serve(port=free_port(), latency=args.latency)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    api_url = f"http://127.0.0.1:{server.server_address[1]}"
+    telegram = server.telegram
+
+    if not asyncio.run(run_checks(api_url, telegram, args.requests)):
+        sys.exit(1)
+    server.shutdown()
+    if args.checks_only:
+        return
+
+    results = measure_render(args.runs)
+    for r in results:
+        print(f"{r['operation']}: p50 {r['p50_ms']:.0f} мс, max {r['max_ms']:.0f} мс, PNG {r['png_kb']:.0f} КБ")
+    if args.save or args.json:
+        params = {"requests": args.requests, "runs": args.runs}
+        print(f"Результаты: {save_results('timetable_image', results, params, args.json)}")
+
+
+if __name__ == "__main__":
+    main()
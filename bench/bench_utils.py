@@ -0,0 +1,152 @@
+"""
+Общие функции нагрузочных тестов: перцентили, сводка по задержкам,
+подсчёт подключений к Postgres и сохранение результатов в JSON для сравнения между коммитами.
+"""
+import os
+import sys
+import json
+import time
+import socket
+import platform
+import threading
+import subprocess
+from datetime import datetime
+from urllib.parse import urlparse
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+
+def percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(q / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(latencies: list[float], wall: float, errors: int = 0) -> dict:
+    """Задержки в секундах -> пропускная способность и перцентили в миллисекундах."""
+    return {
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "rps": len(latencies) / wall if wall else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p90_ms": percentile(latencies, 90) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "max_ms": max(latencies, default=0.0) * 1000,
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port: int, process: subprocess.Popen | None = None, timeout: float = 15.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"Процесс завершился с кодом {process.returncode}")
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"Порт {port} не открылся за {timeout:.0f} с")
+
+
+def require_local_dsn(dsn: str | None, name: str):
+    """Нагрузочные тесты пишут в базу, поэтому запускаются только против локального Postgres."""
+    if not dsn:
+        sys.exit(f"{name} не задан: нужна локальная тестовая база Postgres.")
+    host = urlparse(dsn).hostname if "://" in dsn else None
+    if host not in (None, "", "localhost", "127.0.0.1", "::1") and not os.getenv("BENCH_ALLOW_REMOTE_DB"):
+        sys.exit(f"{name} указывает на {host}. Запустите тест на локальной базе "
+                 f"или задайте BENCH_ALLOW_REMOTE_DB=1, если это действительно тестовый сервер.")
+
+
+class ConnectionSampler:
+    """
+    Фоновый поток, который раз в interval секунд считает подключения в pg_stat_activity
+    по каждой базе. Подключение самого сэмплера в подсчёт не входит.
+    """
+
+    def __init__(self, dsn: str, interval: float = 0.05):
+        self.dsn = dsn
+        self.interval = interval
+        self.samples = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        import psycopg2
+
+        self._conn = psycopg2.connect(self.dsn)
+        self._conn.autocommit = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self._conn.close()
+
+    def _run(self):
+        cur = self._conn.cursor()
+        while not self._stop.is_set():
+            cur.execute("""
+                SELECT datname, count(*)
+                  FROM pg_stat_activity
+                 WHERE backend_type = 'client backend' AND pid <> pg_backend_pid() AND datname IS NOT NULL
+                 GROUP BY datname
+            """)
+            counts = dict(cur.fetchall())
+            for datname in set(self.samples) | set(counts):
+                self.samples.setdefault(datname, []).append(counts.get(datname, 0))
+            self._stop.wait(self.interval)
+
+    def summary(self) -> dict:
+        """{база: {max, mean}} по всем замерам."""
+        return {
+            datname: {"max": max(values), "mean": round(sum(values) / len(values), 2)}
+            for datname, values in self.samples.items() if values
+        }
+
+
+def git_revision() -> dict:
+    def git(*args):
+        try:
+            return subprocess.run(["git", *args], cwd=ROOT_DIR, capture_output=True, text=True).stdout.strip()
+        except OSError:
+            return ""
+    return {"commit": git("rev-parse", "HEAD"), "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+
+
+def save_results(name: str, results: list[dict], params: dict, path: str | None = None) -> str:
+    """
+    Сохраняет результаты в JSON вместе с коммитом и окружением.
+    По умолчанию – bench/results/<name>-<коммит>-<время>.json.
+    """
+    revision = git_revision()
+    payload = {
+        "benchmark": name,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "git": revision,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "params": params,
+        "results": results,
+    }
+    if path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        path = os.path.join(RESULTS_DIR, f"{name}-{(revision['commit'] or 'nogit')[:8]}-{stamp}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False, indent=2)
+    return path
@@ -0,0 +1,84 @@
+"""
+Сравнение двух сохранённых прогонов нагрузочных тестов (bench/results/*.json).
+Строки сопоставляются по сценарию, реализации, операции и уровню одновременности.
+Для каждой метрики печатается изменение в процентах, ухудшения больше --threshold отмечаются,
+и скрипт завершается с кодом 1 – это удобно для проверки перед слиянием.
+
+    python bench/compare.py bench/results/bot-1a2b3c4d-....json bench/results/bot-5e6f7a8b-....json
+"""
+import sys
+import json
+import argparse
+
+KEY_FIELDS = ("scenario", "impl", "operation", "concurrency")
+# Метрика -> True, если больше значит лучше
+METRICS = {
+    "rps": True,
+    "pages_per_s": True,
+    "p50_ms": False,
+    "p95_ms": False,
+    "p99_ms": False,
+    "peak_rss_mb": False,
+}
+
+
+def load(path: str) -> tuple[dict, dict]:
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    rows = {tuple(row.get(k) for k in KEY_FIELDS): row for row in data["results"]}
+    return data, rows
+
+
+def db_max(row: dict) -> int | None:
+    connections = row.get("db_connections")
+    if not connections:
+        return None
+    return sum(c["max"] for c in connections.values())
+
+
+def describe(data: dict) -> str:
+    git = data.get("git") or {}
+    commit = (git.get("commit") or "?")[:8] + ("+" if git.get("dirty") else "")
+    return f"{data.get('benchmark')} {commit} ({data.get('created_at')})"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сравнение двух прогонов нагрузочных тестов")
+    parser.add_argument("base", help="результаты до изменений")
+    parser.add_argument("new", help="результаты после изменений")
+    parser.add_argument("--threshold", type=float, default=10.0, help="допустимое ухудшение, %%")
+    args = parser.parse_args()
+
+    base_data, base_rows = load(args.base)
+    new_data, new_rows = load(args.new)
+    print(f"Было:  {describe(base_data)}")
+    print(f"Стало: {describe(new_data)}\n")
+
+    regressions = 0
+    for key in sorted(base_rows.keys() & new_rows.keys(), key=lambda k: tuple(str(x) for x in k)):
+        base, new = base_rows[key], new_rows[key]
+        label = " ".join(str(x) for x in key if x is not None)
+        changes = []
+        for metric, higher_is_better in METRICS.items():
+            if metric not in base or metric not in new or not base[metric]:
+                continue
+            delta = (new[metric] - base[metric]) / base[metric] * 100
+            worse = -delta if higher_is_better else delta
+            mark = " !" if worse > args.threshold else ""
+            regressions += bool(mark)
+            changes.append(f"{metric} {base[metric]:.1f}->{new[metric]:.1f} ({delta:+.1f}%){mark}")
+        base_db, new_db = db_max(base), db_max(new)
+        if base_db is not None and new_db is not None:
+            changes.append(f"db {base_db}->{new_db}")
+        print(f"{label}: " + ", ".join(changes))
+
+    missing = base_rows.keys() ^ new_rows.keys()
+    if missing:
+        print(f"\nСтрок только в одном из прогонов: {len(missing)}")
+    if regressions:
+        print(f"\nУхудшений больше {args.threshold:g}%: {regressions}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
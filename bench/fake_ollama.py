@@ -0,0 +1,156 @@
+"""
+Локальная замена сервера модели (API Ollama) для проверок ассистента без GPU и без модели.
+POST /api/chat отвечает потоком строк JSON, как Ollama при "stream": true: ответ повторяет вопрос
+и число переданных фрагментов, слова приходят с задержкой --token-delay.
+
+Запуск:
+    python bench/fake_ollama.py --port 11435 --latency 0.5 --token-delay 0.02
+Бот переключается на него переменной OLLAMA_URL=http://127.0.0.1:11435.
+
+Служебные адреса: GET /__stats – число запросов к модели, POST /__reset – обнулить счётчики.
+Вопрос со словом "ошибка" даёт ответ 500.
+"""
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse
+
+
+class FakeOllama:
+    def __init__(self, latency: float = 0.0, token_delay: float = 0.0, words: int = 40):
+        self.latency = latency
+        self.token_delay = token_delay
+        self.words = words
+        self.requests = 0
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+    def begin(self):
+        with self.lock:
+            self.requests += 1
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+
+    def end(self):
+        with self.lock:
+            self.active -= 1
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"requests": self.requests, "active": self.active, "max_active": self.max_active}
+
+    def reset(self):
+        with self.lock:
+            self.requests = 0
+            self.max_active = self.active
+
+    def answer_words(self, messages: list[dict]) -> list[str]:
+        prompt = messages[-1]["content"] if messages else ""
+        question = prompt.rpartition("Вопрос студента:")[2].strip()
+        fragments = prompt.count("\n[")
+        words = f"Ответ на вопрос «{question}» по {fragments} фрагментам.".split()
+        filler = ["Подробности", "уточните", "в", "деканате."]
+        return words + [filler[i % len(filler)] for i in range(max(0, self.words - len(words)))]
+
+
+def make_handler(model: FakeOllama):
+    class Handler(BaseHTTPRequestHandler):
+        # HTTP/1.0: поток ответа заканчивается закрытием соединения, как при chunked у Ollama
+        protocol_version = "HTTP/1.0"
+
+        def log_message(self, format, *args):
+            pass
+
+        def send_json(self, data, status: int = 200):
+            body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            path = urlparse(self.path).path
+            if path == "/__stats":
+                self.send_json(model.stats())
+            elif path == "/api/tags":
+                self.send_json({"models": [{"name": "fake"}]})
+            else:
+                self.send_json({"error": "not found"}, 404)
+
+        def do_POST(self):
+            path = urlparse(self.path).path
+            if path == "/__reset":
+                model.reset()
+                self.send_json({"ok": True})
+                return
+            if path != "/api/chat":
+                self.send_json({"error": "not found"}, 404)
+                return
+            length = int(self.headers.get("Content-Length") or 0)
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            model.begin()
+            try:
+                words = model.answer_words(payload.get("messages", []))
+                if any("ошибка" in w.lower() for w in words):
+                    self.send_json({"error": "model failed"}, 500)
+                    return
+                if model.latency:
+                    time.sleep(model.latency * random.uniform(0.8, 1.2))
+                name = payload.get("model", "fake")
+                if not payload.get("stream", True):
+                    self.send_json({"model": name, "message": {"role": "assistant", "content": " ".join(words)},
+                                    "done": True})
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.end_headers()
+                for i, word in enumerate(words):
+                    chunk = {"model": name, "message": {"role": "assistant", "content": (" " if i else "") + word},
+                             "done": False}
+                    self.wfile.write(json.dumps(chunk, ensure_ascii=False).encode("utf-8") + b"\n")
+                    self.wfile.flush()
+                    if model.token_delay:
+                        time.sleep(model.token_delay)
+                done = {"model": name, "message": {"role": "assistant", "content": ""}, "done": True,
+                        "eval_count": len(words)}
+                self.wfile.write(json.dumps(done).encode("utf-8") + b"\n")
+            finally:
+                model.end()
+
+    return Handler
+
+
+def serve(host: str = "127.0.0.1", port: int = 11435, **model_options):
+    model = FakeOllama(**model_options)
+    server = ThreadingHTTPServer((host, port), make_handler(model))
+    server.daemon_threads = True
+    server.model = model
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Локальная замена сервера модели Ollama")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--latency", type=float, default=0.0, help="задержка до первого слова, с")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="задержка между словами, с")
+    parser.add_argument("--words", type=int, default=40, help="длина ответа в словах")
+    args = parser.parse_args()
+
+    server = serve(args.host, args.port, latency=args.latency, token_delay=args.token_delay, words=args.words)
+    print(f"Фейковая модель: http://{args.host}:{server.server_address[1]} (задержка {args.latency} с)", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
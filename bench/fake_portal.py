@@ -0,0 +1,185 @@
+"""
+Локальная замена портала eu.iit.csu.ru для нагрузочных измерений.
+Отдаёт сохранённые страницы входа, обзора оценок, отчёта по курсу и пересдач
+из bench/pages, а также веб-сервисы Moodle (token.php, server.php) из pages/ws.json.
+
+Запуск:
+    python bench/fake_portal.py --port 8765 --latency 0.3 --jitter 0.2
+Бот и бенчмарк переключаются на него переменной PORTAL_URL=http://127.0.0.1:8765.
+
+Служебные адреса: GET /__stats – число отданных страниц, POST /__reset – обнулить счётчики.
+Пароль "wrong" даёт страницу "Неверный логин или пароль".
+"""
+import os
+import json
+import time
+import random
+import argparse
+import threading
+from collections import Counter
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+PAGES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pages")
+
+# Адрес -> файл страницы (для GET)
+ROUTES = {
+    "/login": "login.html",
+    "/my/": "my.html",
+    "/student/credits": "credits.html",
+    "/grade/report/overview/index.php": "overview.html",
+    "/grade/report/user/index.php": "user_report.html",
+    "/mod/page/view.php": "retakes.html",
+}
+
+
+class FakePortal:
+    def __init__(self, pages_dir: str = PAGES_DIR, latency: float = 0.0, jitter: float = 0.0,
+                 error_rate: float = 0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.pages = {}
+        for name in set(ROUTES.values()) | {"login_error.html"}:
+            with open(os.path.join(pages_dir, name), "rb") as f:
+                self.pages[name] = f.read()
+        with open(os.path.join(pages_dir, "ws.json"), encoding="utf-8") as f:
+            self.ws = json.load(f)
+        self.counts = Counter()
+        self.lock = threading.Lock()
+
+    def delay(self):
+        if self.latency:
+            time.sleep(max(0.0, self.latency * (1 + random.uniform(-self.jitter, self.jitter))))
+
+    def count(self, path: str):
+        with self.lock:
+            self.counts[path] += 1
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"requests": sum(self.counts.values()), "by_path": dict(self.counts)}
+
+    def reset(self):
+        with self.lock:
+            self.counts.clear()
+
+    def ws_call(self, wsfunction: str, params: dict):
+        if wsfunction == "core_webservice_get_site_info":
+            return self.ws["site_info"]
+        if wsfunction == "core_enrol_get_users_courses":
+            return self.ws["courses"]
+        if wsfunction == "gradereport_user_get_grade_items":
+            return self.ws["grade_items"]
+        return {"exception": "invalid_parameter_exception", "errorcode": "invalidrecord",
+                "message": f"Функция {wsfunction} не поддерживается"}
+
+
+def make_handler(portal: FakePortal):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def send_body(self, status: int, body: bytes, content_type: str, headers: dict | None = None):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def send_json(self, data, status: int = 200):
+            self.send_body(status, json.dumps(data, ensure_ascii=False).encode("utf-8"), "application/json; charset=utf-8")
+
+        def read_form(self) -> dict:
+            length = int(self.headers.get("Content-Length") or 0)
+            form = parse_qs(self.rfile.read(length).decode("utf-8"))
+            return {key: values[0] for key, values in form.items()}
+
+        def portal_request(self, path: str) -> bool:
+            """Общая часть для страниц портала: задержка, счётчик и искусственные ошибки."""
+            portal.delay()
+            portal.count(path)
+            if portal.error_rate and random.random() < portal.error_rate:
+                self.send_body(503, b"Service Unavailable", "text/plain")
+                return False
+            return True
+
+        def do_GET(self):
+            path = urlparse(self.path).path
+            if path == "/__stats":
+                self.send_json(portal.stats())
+                return
+            page = ROUTES.get(path)
+            if not page:
+                self.send_body(404, b"Not Found", "text/plain")
+                return
+            if self.portal_request(path):
+                self.send_body(200, portal.pages[page], "text/html; charset=utf-8")
+
+        def do_POST(self):
+            path = urlparse(self.path).path
+            if path == "/__reset":
+                portal.reset()
+                self.send_json({"ok": True})
+                return
+            form = self.read_form()
+            if path == "/login":
+                if not self.portal_request(path):
+                    return
+                if form.get("password") == "wrong":
+                    self.send_body(200, portal.pages["login_error.html"], "text/html; charset=utf-8")
+                else:
+                    self.send_body(303, b"", "text/html", {
+                        "Location": "/my/",
+                        "Set-Cookie": "MoodleSession=bench; Path=/; HttpOnly",
+                    })
+            elif path == "/login/token.php":
+                if not self.portal_request(path):
+                    return
+                if form.get("password") == "wrong":
+                    self.send_json({"error": "Неверный логин или пароль, попробуйте заново.", "errorcode": "invalidlogin"})
+                else:
+                    self.send_json({"token": "bench" + str(abs(hash(form.get("username"))))[:16], "privatetoken": None})
+            elif path == "/webservice/rest/server.php":
+                if self.portal_request(path):
+                    self.send_json(portal.ws_call(form.get("wsfunction", ""), form))
+            else:
+                self.send_body(404, b"Not Found", "text/plain")
+
+    return Handler
+
+
+def serve(host: str = "127.0.0.1", port: int = 8765, **portal_options):
+    portal = FakePortal(**portal_options)
+    server = ThreadingHTTPServer((host, port), make_handler(portal))
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Локальная замена портала eu.iit.csu.ru")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="задержка каждого ответа, с")
+    parser.add_argument("--jitter", type=float, default=0.0, help="разброс задержки, доля от --latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="доля ответов 503")
+    parser.add_argument("--pages", default=PAGES_DIR, help="каталог с сохранёнными страницами")
+    args = parser.parse_args()
+
+    server = serve(args.host, args.port, pages_dir=args.pages, latency=args.latency,
+                   jitter=args.jitter, error_rate=args.error_rate)
+    print(f"Фейковый портал: http://{args.host}:{server.server_address[1]} (задержка {args.latency} с)", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""
+Локальная замена Telegram Bot API для нагрузочных тестов.
+Принимает запросы вида POST /bot<token>/<method> и отвечает так, как ответил бы Telegram:
+sendMessage и editMessageText возвращают объект Message, остальные методы – true.
+sendPhoto с файлом отвечает новым file_id (загрузки считаются в /__stats как "upload"),
+с уже известным file_id – тем же file_id.
+
+Запуск:
+    python bench/fake_telegram.py --port 8081 --latency 0.03
+Бот и панель деканата переключаются на него переменной TELEGRAM_API_URL=http://127.0.0.1:8081.
+
+Служебные адреса: GET /__stats – число вызовов по методам, POST /__reset – обнулить счётчики.
+"""
+import json
+import time
+import email
+import random
+import argparse
+import threading
+from collections import Counter
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+BOT_USER = {"id": 100000001, "is_bot": True, "first_name": "IIT Helper", "username": "iit_helper_bench_bot"}
+# Методы, которые возвращают отправленное или изменённое сообщение
+MESSAGE_METHODS = {"sendmessage", "editmessagetext", "editmessagereplymarkup", "sendphoto", "senddocument"}
+
+
+class FakeTelegram:
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.counts = Counter()
+        self.lock = threading.Lock()
+        self.next_message_id = 1
+
+    def delay(self):
+        if self.latency:
+            time.sleep(max(0.0, self.latency * (1 + random.uniform(-self.jitter, self.jitter))))
+
+    def handle(self, method: str, params: dict):
+        method = method.lower()
+        with self.lock:
+            self.counts[method] += 1
+            message_id = self.next_message_id
+            self.next_message_id += 1
+        if method == "getme":
+            return BOT_USER
+        if method in MESSAGE_METHODS:
+            chat_id = int(params.get("chat_id") or 0)
+            message = {
+                "message_id": int(params.get("message_id") or message_id),
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "from": BOT_USER,
+                "text": params.get("text") or params.get("caption") or "",
+            }
+            if method == "sendphoto":
+                photo = params.get("photo")
+                # aiogram передаёт файл отдельной частью формы: photo=attach://<имя части>
+                if isinstance(photo, str) and photo.startswith("attach://"):
+                    photo = params.get(photo[len("attach://"):])
+                if isinstance(photo, bytes):
+                    with self.lock:
+                        self.counts["upload"] += 1
+                    photo = f"bench-photo-{message_id}"
+                message["photo"] = [{"file_id": photo, "file_unique_id": photo, "width": 1620, "height": 940}]
+            return message
+        return True
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"calls": sum(self.counts.values()), "by_method": dict(self.counts)}
+
+    def reset(self):
+        with self.lock:
+            self.counts.clear()
+
+
+def parse_body(content_type: str, body: bytes) -> dict:
+    """aiogram отправляет параметры как multipart/form-data или x-www-form-urlencoded."""
+    if content_type.startswith("multipart/form-data"):
+        message = email.message_from_bytes(f"Content-Type: {content_type}\r\n\r\n".encode() + body)
+        params = {}
+        for part in message.get_payload() or []:
+            name = part.get_param("name", header="content-disposition")
+            if name:
+                payload = part.get_payload(decode=True) or b""
+                # Файлы (photo, document) остаются байтами
+                params[name] = payload if part.get_filename() else payload.decode("utf-8", "replace")
+        return params
+    if content_type.startswith("application/json"):
+        return json.loads(body or b"{}")
+    return {key: values[0] for key, values in parse_qs(body.decode("utf-8")).items()}
+
+
+def make_handler(telegram: FakeTelegram):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def send_json(self, data, status: int = 200):
+            body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if urlparse(self.path).path == "/__stats":
+                self.send_json(telegram.stats())
+            else:
+                self.send_json({"ok": False, "error_code": 404, "description": "Not Found"}, 404)
+
+        def read_body(self) -> bytes:
+            # Файлы aiogram загружает без Content-Length, частями (chunked)
+            if self.headers.get("Transfer-Encoding", "").lower() != "chunked":
+                return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            body = b""
+            while True:
+                size = int(self.rfile.readline().split(b";")[0].strip() or b"0", 16)
+                if not size:
+                    while self.rfile.readline().strip():
+                        pass
+                    return body
+                body += self.rfile.read(size)
+                self.rfile.readline()
+
+        def do_POST(self):
+            path = urlparse(self.path).path
+            body = self.read_body()
+            if path == "/__reset":
+                telegram.reset()
+                self.send_json({"ok": True})
+                return
+            parts = path.strip("/").split("/")
+            if len(parts) != 2 or not parts[0].startswith("bot"):
+                self.send_json({"ok": False, "error_code": 404, "description": "Not Found"}, 404)
+                return
+            params = parse_body(self.headers.get("Content-Type", ""), body)
+            telegram.delay()
+            self.send_json({"ok": True, "result": telegram.handle(parts[1], params)})
+
+    return Handler
+
+
+def serve(host: str = "127.0.0.1", port: int = 8081, **options):
+    telegram = FakeTelegram(**options)
+    server = ThreadingHTTPServer((host, port), make_handler(telegram))
+    server.daemon_threads = True
+    server.telegram = telegram
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Локальная замена Telegram Bot API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.0, help="задержка каждого ответа, с")
+    parser.add_argument("--jitter", type=float, default=0.0, help="разброс задержки, доля от --latency")
+    args = parser.parse_args()
+
+    server = serve(args.host, args.port, latency=args.latency, jitter=args.jitter)
+    print(f"Фейковый Telegram Bot API: http://{args.host}:{server.server_address[1]}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Время холодного импорта бота и панели деканата (python -X importtime).
+Каждый модуль импортируется --runs раз в новом процессе; печатается медиана и максимум
+полного времени импорта, самые тяжёлые прямые зависимости и загружены ли
+selenium, bs4, requests и PIL (они нужны только для портала и картинок расписания
+и должны импортироваться лениво).
+
+    python bench/import_time.py --save          # сохранить для сравнения через bench/compare.py
+    python bench/import_time.py --modules main --top 15
+"""
+import os
+import sys
+import argparse
+import subprocess
+from collections import defaultdict
+
+from bench_utils import ROOT_DIR, percentile, save_results
+
+MODULES = ["main", "app"]
+# Зависимости, которые не должны загружаться при импорте
+HEAVY = ["selenium", "bs4", "requests", "PIL"]
+
+
+def parse_importtime(stderr: str) -> list[tuple[int, int, str]]:
+    """Строки "import time: self | cumulative | name" -> (глубина, cumulative мкс, имя)."""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        entries.append((depth, int(cumulative), name.strip()))
+    return entries
+
+
+def measure(module: str, env: dict) -> tuple[float, dict, set]:
+    """Одно измерение: полное время импорта (мс), прямые зависимости модуля (мс), все загруженные пакеты."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=ROOT_DIR, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} завершился с ошибкой:\n{result.stderr[-2000:]}")
+    entries = parse_importtime(result.stderr)
+    # -X importtime выводит модуль после всех его зависимостей
+    children = {}
+    total = 0.0
+    for i, (depth, cumulative, name) in enumerate(entries):
+        if depth == 0 and name == module:
+            total = cumulative / 1000
+            j = i - 1
+            while j >= 0 and entries[j][0] > 0:
+                if entries[j][0] == 1:
+                    children[entries[j][2]] = entries[j][1] / 1000
+                j -= 1
+    loaded = {name.split(".")[0] for _, _, name in entries}
+    return total, children, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Время холодного импорта бота и панели")
+    parser.add_argument("--modules", default=",".join(MODULES), help="модули через запятую")
+    parser.add_argument("--runs", type=int, default=7, help="измерений на модуль")
+    parser.add_argument("--top", type=int, default=10, help="сколько тяжёлых зависимостей показать")
+    parser.add_argument("--save", action="store_true", help="сохранить результаты в bench/results")
+    parser.add_argument("--json", help="сохранить результаты в указанный файл")
+    args = parser.parse_args()
+    modules = [x for x in args.modules.split(",") if x]
+
+    # Bot() при импорте main проверяет только формат токена; к базам импорт не подключается
+    env = dict(os.environ, TELEGRAM_TOKEN=os.getenv("TELEGRAM_TOKEN") or "123456:bench")
+    results = []
+    for module in modules:
+        totals = []
+        children = defaultdict(list)
+        loaded = set()
+        for _ in range(args.runs):
+            total, deps, names = measure(module, env)
+            totals.append(total)
+            loaded |= names
+            for name, ms in deps.items():
+                children[name].append(ms)
+        top = sorted(((name, percentile(values, 50)) for name, values in children.items()),
+                     key=lambda x: x[1], reverse=True)[:args.top]
+        results.append({
+            "scenario": "import", "operation": module, "runs": args.runs,
+            "p50_ms": percentile(totals, 50), "max_ms": max(totals),
+            "heavy_loaded": [name for name in HEAVY if name in loaded],
+            "top": [{"module": name, "ms": round(ms, 1)} for name, ms in top],
+        })
+
+    for r in results:
+        print(f"import {r['operation']}: p50 {r['p50_ms']:.0f} мс, max {r['max_ms']:.0f} мс, "
+              f"загружены {', '.join(r['heavy_loaded']) or 'без selenium/bs4/requests/PIL'}")
+        for item in r["top"]:
+            print(f"    {item['ms']:>8.1f} мс  {item['module']}")
+    if args.save or args.json:
+        params = {"modules": modules, "runs": args.runs}
+        print(f"Результаты: {save_results('import_time', results, params, args.json)}")
+
+
+if __name__ == "__main__":
+    main()
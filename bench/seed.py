@@ -0,0 +1,138 @@
+"""
+Тестовые данные для нагрузочных тестов: декан, студенты и расписание групп.
+Все записи отличимы от настоящих (telegram_id от BENCH_TELEGRAM_ID, группы 9xx),
+повторный запуск ничего не дублирует.
+"""
+import os
+import sys
+
+from bench_utils import ROOT_DIR
+
+sys.path.insert(0, ROOT_DIR)
+
+from schedule_db import PAIRS_INFO, DAYS_OF_WEEK, WEEK_TYPES, save_day_schedule  # noqa: E402
+
+BENCH_TELEGRAM_ID = 9_000_000_000
+BENCH_DEAN = ("bench_dean", "bench_password")
+BENCH_GROUPS = [("ПИ", "901"), ("ПИ", "902"), ("ПРИ", "901"), ("ПРИ", "902"), ("БИ", "901")]
+
+
+def bench_pairs(direction: str, group_number: str, day_of_week: str, variant: int = 0) -> list[dict]:
+    """Пары дня с преподавателями и аудиториями, уникальными для группы, чтобы не было конфликтов."""
+    tag = f"{direction}{group_number}"
+    pairs = []
+    for i in range(3):
+        pairs.append({
+            "pair_number": i + 1 + variant % 2,
+            "subject": f"Дисциплина {i + 1} ({day_of_week})",
+            "lesson_type": "лекция" if i == 0 else "практика",
+            "teacher": f"Бенчев-{tag} {chr(0x410 + i)}.А.",
+            "room": f"B-{tag}-{i + 1}",
+        })
+    return pairs
+
+
+def pairs_text(pairs: list[dict]) -> str:
+    by_number = {p["pair_number"]: p for p in pairs}
+    lines = []
+    for i, (start, end) in enumerate(PAIRS_INFO):
+        pair = by_number.get(i + 1)
+        if pair:
+            lines.append(f"{i + 1}) {start}-{end}: <b>{pair['subject']}</b> ({pair['lesson_type']})"
+                         f"<br><i>{pair['teacher']}</i>, ауд. {pair['room']}")
+        else:
+            lines.append(f"{i + 1}) {start}-{end}: Пары нет.")
+    return "<br>".join(lines)
+
+
+def connect(dsn: str):
+    import psycopg2
+    from psycopg2.extras import RealDictCursor
+    return psycopg2.connect(dsn, cursor_factory=RealDictCursor)
+
+
+def init_tables():
+    """Таблицы создаёт панель деканата (app.init_db / app.init_schedule_db)."""
+    import app
+    app.init_db()
+    app.init_schedule_db()
+
+
+def seed_all(students: int) -> list[int]:
+    init_tables()
+    conn = connect(os.getenv("DATABASE_URL"))
+    try:
+        seed_dean(conn)
+        telegram_ids = seed_students(conn, students)
+    finally:
+        conn.close()
+    schedule_conn = connect(os.getenv("SCHEDULE_DATABASE_URL"))
+    try:
+        seed_schedule(schedule_conn)
+    finally:
+        schedule_conn.close()
+    return telegram_ids
+
+
+def cleanup_all():
+    conn = connect(os.getenv("DATABASE_URL"))
+    try:
+        cleanup_students(conn)
+    finally:
+        conn.close()
+
+
+def seed_dean(conn):
+    cur = conn.cursor()
+    cur.execute("""
+        INSERT INTO deans (username, password) VALUES (%s, %s)
+        ON CONFLICT (username) DO UPDATE SET password = EXCLUDED.password
+    """, BENCH_DEAN)
+    conn.commit()
+
+
+def seed_students(conn, count: int) -> list[int]:
+    """Студенты с telegram_id BENCH_TELEGRAM_ID + i, распределённые по тестовым группам."""
+    cur = conn.cursor()
+    telegram_ids = []
+    for i in range(count):
+        direction, group_number = BENCH_GROUPS[i % len(BENCH_GROUPS)]
+        telegram_id = BENCH_TELEGRAM_ID + i
+        cur.execute("""
+            INSERT INTO students (telegram_id, first_name, last_name, direction, group_number)
+            VALUES (%s, %s, %s, %s, %s)
+            ON CONFLICT (telegram_id) DO UPDATE
+            SET direction = EXCLUDED.direction, group_number = EXCLUDED.group_number
+        """, (telegram_id, f"Студент{i}", "Нагрузочный", direction, group_number))
+        telegram_ids.append(telegram_id)
+    conn.commit()
+    return telegram_ids
+
+
+def seed_schedule(schedule_conn):
+    cur = schedule_conn.cursor()
+    for direction, group_number in BENCH_GROUPS:
+        for week_type in WEEK_TYPES:
+            for day_of_week in DAYS_OF_WEEK:
+                pairs = bench_pairs(direction, group_number, day_of_week)
+                save_day_schedule(cur, direction, group_number, week_type, day_of_week, pairs_text(pairs), pairs)
+    schedule_conn.commit()
+
+
+def cleanup_students(conn):
+    cur = conn.cursor()
+    cur.execute("DELETE FROM students WHERE telegram_id >= %s", (BENCH_TELEGRAM_ID,))
+    conn.commit()
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    from bench_utils import require_local_dsn
+
+    load_dotenv(os.path.join(ROOT_DIR, ".env"))
+    require_local_dsn(os.getenv("DATABASE_URL"), "DATABASE_URL")
+    require_local_dsn(os.getenv("SCHEDULE_DATABASE_URL"), "SCHEDULE_DATABASE_URL")
+    if sys.argv[1:] == ["--cleanup"]:
+        cleanup_all()
+    else:
+        print(f"Студентов: {len(seed_all(int(sys.argv[1]) if len(sys.argv) > 1 else 100))}")
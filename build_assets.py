@@ -0,0 +1,85 @@
+"""
+Сборка статики панели деканата:
+    python build_assets.py
+1. Скачивает файлы из static_assets.SOURCES в assets/ и проверяет их SRI-хэш.
+   Уже скачанные файлы используются повторно: для сборки без доступа к CDN
+   их можно положить в assets/ вручную.
+2. Пишет в static/dist копии с хэшем содержимого в имени (bootstrap.min.<хэш>.css),
+   рядом – сжатые .gz и .br (если установлен brotli).
+3. Сохраняет static/dist/manifest.json: исходное имя -> имя с хэшем.
+Запускать при каждом обновлении файлов, перед стартом панели.
+"""
+import os
+import sys
+import gzip
+import json
+import base64
+import shutil
+import hashlib
+import urllib.request
+
+from static_assets import SOURCES, SOURCE_DIR, DIST_DIR, MANIFEST_PATH
+
+try:
+    import brotli
+except ImportError:  # без brotli собираются только .gz
+    brotli = None
+
+
+def sri_matches(data: bytes, integrity: str) -> bool:
+    algorithm, _, expected = integrity.partition("-")
+    return base64.b64encode(hashlib.new(algorithm, data).digest()).decode() == expected
+
+
+def fetch_source(name: str, url: str, integrity: str) -> bytes:
+    path = os.path.join(SOURCE_DIR, name)
+    if not os.path.exists(path):
+        print(f"Скачиваю {url}")
+        os.makedirs(SOURCE_DIR, exist_ok=True)
+        with urllib.request.urlopen(url, timeout=30) as response:
+            data = response.read()
+        if not sri_matches(data, integrity):
+            sys.exit(f"{name}: содержимое не совпадает с {integrity}")
+        with open(path, "wb") as f:
+            f.write(data)
+    with open(path, "rb") as f:
+        data = f.read()
+    if not sri_matches(data, integrity):
+        sys.exit(f"{path}: содержимое не совпадает с {integrity}, удалите файл и запустите сборку заново")
+    return data
+
+
+def hashed_name(name: str, data: bytes) -> str:
+    stem, ext = os.path.splitext(name)
+    return f"{stem}.{hashlib.sha256(data).hexdigest()[:10]}{ext}"
+
+
+def main():
+    shutil.rmtree(DIST_DIR, ignore_errors=True)
+    os.makedirs(DIST_DIR)
+    manifest = {}
+    for name, (url, integrity) in SOURCES.items():
+        data = fetch_source(name, url, integrity)
+        target = hashed_name(name, data)
+        path = os.path.join(DIST_DIR, target)
+        with open(path, "wb") as f:
+            f.write(data)
+        sizes = [f"{len(data) // 1024} КБ"]
+        with open(path + ".gz", "wb") as f:
+            compressed = gzip.compress(data, compresslevel=9, mtime=0)
+            f.write(compressed)
+            sizes.append(f"gzip {len(compressed) // 1024} КБ")
+        if brotli is not None:
+            with open(path + ".br", "wb") as f:
+                compressed = brotli.compress(data, quality=11)
+                f.write(compressed)
+                sizes.append(f"br {len(compressed) // 1024} КБ")
+        manifest[name] = target
+        print(f"{target}: {', '.join(sizes)}")
+    with open(MANIFEST_PATH, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    print(f"Манифест: {MANIFEST_PATH}")
+
+
+if __name__ == "__main__":
+    main()
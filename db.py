@@ -0,0 +1,185 @@
+"""
+Подключения к базам данных для панели деканата и бота.
+У каждой базы может быть реплика только для чтения (DATABASE_REPLICA_URL,
+SCHEDULE_DATABASE_REPLICA_URL). connect() всегда открывает основную базу (запись),
+connect_read() – реплику, но основную, если:
+  - реплика не задана, недоступна или отстаёт больше REPLICA_MAX_LAG секунд;
+  - этот пользователь недавно писал (READ_YOUR_WRITES_WINDOW секунд), чтобы он
+    сразу видел свои изменения.
+Состояние реплики проверяется не чаще раза в REPLICA_CHECK_INTERVAL секунд,
+после ошибки подключения реплика пропускается REPLICA_RETRY_AFTER секунд.
+"""
+import os
+import time
+import logging
+import threading
+from collections import Counter
+
+import psycopg2
+
+from metrics import TimedCursor, DB_CONNECTIONS
+
+REPLICA_MAX_LAG = float(os.getenv("REPLICA_MAX_LAG", "5"))
+REPLICA_CHECK_INTERVAL = float(os.getenv("REPLICA_CHECK_INTERVAL", "5"))
+REPLICA_RETRY_AFTER = float(os.getenv("REPLICA_RETRY_AFTER", "30"))
+READ_YOUR_WRITES_WINDOW = float(os.getenv("READ_YOUR_WRITES_WINDOW", "10"))
+REPLICA_CONNECT_TIMEOUT = int(os.getenv("REPLICA_CONNECT_TIMEOUT", "3"))
+# Сколько недавних писателей держать в памяти, прежде чем чистить устаревшие записи
+MAX_RECENT_WRITERS = 10000
+
+# Отставание реплики в секундах. Если всё полученное уже применено, отставания нет,
+# даже когда основная база давно ничего не писала (время последней транзакции тогда старое).
+# На обычном сервере (не реплике) – 0: так маршрутизацию можно проверить на двух локальных Postgres.
+LAG_QUERY = """
+    SELECT CASE
+             WHEN NOT pg_is_in_recovery() THEN 0
+             WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+             ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+           END
+"""
+
+
+class Database:
+    """
+    Основная база и необязательная реплика. Адреса читаются из переменных окружения
+    при первом подключении, поэтому load_dotenv() можно вызвать и после импорта модуля.
+    """
+
+    def __init__(self, name: str, dsn_env: str, replica_env: str):
+        self.name = name
+        self.dsn_env = dsn_env
+        self.replica_env = replica_env
+        self.reset()
+
+    @property
+    def dsn(self) -> str | None:
+        return os.getenv(self.dsn_env)
+
+    @property
+    def replica_dsn(self) -> str | None:
+        return os.getenv(self.replica_env) or None
+
+    def connect(self):
+        """Подключение к основной базе: запись и чтение сразу после записи."""
+        self.routed["primary"] += 1
+        DB_CONNECTIONS.labels(self.name, "primary").inc()
+        return psycopg2.connect(self.dsn, cursor_factory=TimedCursor)
+
+    def connect_read(self, key=None, written_at: float | None = None):
+        """
+        Подключение для запросов только на чтение.
+        key – кто читает (telegram_id и т.п., см. mark_written), written_at – время его
+        последней записи, если оно хранится снаружи (например, в сессии панели).
+        """
+        if self.replica_dsn and not self.recently_written(key, written_at):
+            if self.replica_available():
+                try:
+                    conn = psycopg2.connect(self.replica_dsn, cursor_factory=TimedCursor,
+                                            connect_timeout=REPLICA_CONNECT_TIMEOUT)
+                except psycopg2.OperationalError as e:
+                    self._replica_failed(e)
+                else:
+                    self.routed["replica"] += 1
+                    DB_CONNECTIONS.labels(self.name, "replica").inc()
+                    return conn
+            # Реплика отстаёт или недоступна
+            self.routed["fallback"] += 1
+            DB_CONNECTIONS.labels(self.name, "fallback").inc()
+        return self.connect()
+
+    def mark_written(self, key):
+        """Запоминает, что key только что писал: его чтения какое-то время идут в основную базу."""
+        now = time.time()
+        with self._lock:
+            self._recent_writers[key] = now
+            if len(self._recent_writers) > MAX_RECENT_WRITERS:
+                self._recent_writers = {
+                    k: t for k, t in self._recent_writers.items() if now - t < READ_YOUR_WRITES_WINDOW
+                }
+
+    def recently_written(self, key=None, written_at: float | None = None) -> bool:
+        if key is not None:
+            written_at = max(written_at or 0.0, self._recent_writers.get(key, 0.0))
+        return bool(written_at) and time.time() - written_at < READ_YOUR_WRITES_WINDOW
+
+    # ---------- состояние реплики ----------
+
+    def replica_available(self) -> bool:
+        now = time.monotonic()
+        if now < self._retry_at:
+            return False
+        if now - self._checked_at < REPLICA_CHECK_INTERVAL:
+            return self._replica_ok
+        # Проверяет один поток, остальные пока пользуются прошлым результатом
+        if not self._check_lock.acquire(blocking=False):
+            return self._replica_ok
+        try:
+            self._check_replica()
+        finally:
+            self._checked_at = time.monotonic()
+            self._check_lock.release()
+        return self._replica_ok
+
+    def _check_replica(self):
+        try:
+            conn = psycopg2.connect(self.replica_dsn, connect_timeout=REPLICA_CONNECT_TIMEOUT)
+            try:
+                cur = conn.cursor()
+                cur.execute(LAG_QUERY)
+                lag = float(cur.fetchone()[0])
+            finally:
+                conn.close()
+        except psycopg2.Error as e:
+            self._replica_failed(e)
+            return
+        was_ok, self._replica_lag = self._replica_ok, lag
+        self._replica_ok = lag <= REPLICA_MAX_LAG
+        if self._replica_ok != was_ok:
+            if self._replica_ok:
+                logging.info(f"Реплика базы {self.name} используется для чтения (отставание {lag:.1f} с)")
+            else:
+                logging.warning(f"Реплика базы {self.name} отстаёт на {lag:.1f} с, чтение идёт из основной базы")
+
+    def _replica_failed(self, error):
+        if self._replica_ok or not self._retry_at:
+            logging.warning(f"Реплика базы {self.name} недоступна, чтение идёт из основной базы: {error}")
+        self._replica_ok = False
+        self._replica_lag = None
+        self._retry_at = time.monotonic() + REPLICA_RETRY_AFTER
+
+    def reset(self):
+        """
+        Вызывается в рабочем процессе после fork (gunicorn.conf.py): блокировки,
+        состояние реплики и недавние писатели главного процесса не наследуются.
+        """
+        self.routed = Counter()          # primary / replica / fallback – для проверки и нагрузочных тестов
+        self._recent_writers = {}        # ключ (telegram_id и т.п.) -> time.time() записи
+        self._lock = threading.Lock()
+        self._check_lock = threading.Lock()
+        self._replica_ok = False
+        self._replica_lag = None
+        self._checked_at = 0.0
+        self._retry_at = 0.0
+
+    def status(self) -> dict:
+        return {
+            "name": self.name,
+            "replica": bool(self.replica_dsn),
+            "replica_ok": self._replica_ok,
+            "replica_lag": self._replica_lag,
+            "routed": dict(self.routed),
+        }
+
+
+main_database = Database("main", "DATABASE_URL", "DATABASE_REPLICA_URL")
+schedule_database = Database("schedule", "SCHEDULE_DATABASE_URL", "SCHEDULE_DATABASE_REPLICA_URL")
+
+
+def get_db_connection():
+    """Подключение к основной базе (students, deans)."""
+    return main_database.connect()
+
+
+def get_schedule_db_connection():
+    """Подключение к базе расписания."""
+    return schedule_database.connect()
@@ -0,0 +1,471 @@
+"""
+Массовые рассылки бота.
+Общий ограничитель скорости отправки в Telegram, утренняя рассылка расписания на сегодня
+и уведомления групп об изменениях расписания.
+"""
+import os
+import html
+import time
+import asyncio
+import logging
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from aiogram.exceptions import TelegramRetryAfter, TelegramForbiddenError, TelegramBadRequest
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+
+from schedule_db import (
+    PAIRS_INFO, DAYS_OF_WEEK, WEEK_TYPES, SEMESTER_START, SEMESTER_END, SCHEDULE_TIMEZONE,
+    week_type_for_date, parse_schedule_text,
+)
+
+# Telegram допускает около 30 сообщений в секунду на бота, оставляем запас
+TELEGRAM_SEND_RATE = float(os.getenv("TELEGRAM_SEND_RATE", "25"))
+# Время утренней рассылки (в часовом поясе расписания) и сколько часов после него
+# можно досылать рассылку после перезапуска бота
+DIGEST_TIME = os.getenv("DIGEST_TIME", "07:00")
+DIGEST_RESUME_HOURS = int(os.getenv("DIGEST_RESUME_HOURS", "3"))
+# Сколько получателей резервируется в базе за один запрос
+DIGEST_CLAIM_BATCH = 100
+# Уведомление об изменении расписания уходит, когда группу не редактировали столько секунд
+SCHEDULE_NOTIFY_DEBOUNCE = int(os.getenv("SCHEDULE_NOTIFY_DEBOUNCE", "300"))
+SCHEDULE_NOTIFY_POLL = 30
+# После стольких неудачных отправок одному студенту уведомление ему больше не повторяется
+SCHEDULE_NOTIFY_MAX_ATTEMPTS = 5
+
+
+def telegram_session():
+    """
+    Сессия для Bot(...). Если задан TELEGRAM_API_URL (локальный Bot API сервер или
+    его замена для нагрузочных тестов), запросы идут туда, иначе – на api.telegram.org.
+    """
+    api_url = os.getenv("TELEGRAM_API_URL")
+    if not api_url:
+        return None
+    return AiohttpSession(api=TelegramAPIServer.from_base(api_url.rstrip("/")))
+
+
+class RateLimiter:
+    """
+    Глобальный ограничитель скорости (token bucket) для всех рассылок бота.
+    При ответе Telegram "retry after" пауза действует на всех отправителей сразу.
+    """
+
+    def __init__(self, rate: float, burst: float | None = None):
+        self.rate = rate
+        self.capacity = burst or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds: float):
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+
+telegram_limiter = RateLimiter(TELEGRAM_SEND_RATE)
+
+
+async def send_limited(bot, chat_id: int, text: str, **kwargs) -> bool:
+    """
+    Отправляет сообщение с учётом общего лимита.
+    Возвращает False, если пользователь заблокировал бота или чат не найден.
+    Остальные ошибки (сеть, таймаут, ошибка разметки в тексте) пробрасываются:
+    получатель доступен, и вызывающий решает, повторять ли отправку.
+    """
+    while True:
+        await telegram_limiter.acquire()
+        try:
+            await bot.send_message(chat_id=chat_id, text=text, **kwargs)
+            return True
+        except TelegramRetryAfter as e:
+            logging.warning(f"Telegram просит подождать {e.retry_after} с.")
+            telegram_limiter.pause(e.retry_after)
+        except TelegramForbiddenError as e:
+            logging.info(f"Не удалось отправить сообщение {chat_id}: {e}")
+            return False
+        except TelegramBadRequest as e:
+            if "chat not found" not in e.message.lower():
+                raise
+            logging.info(f"Не удалось отправить сообщение {chat_id}: {e}")
+            return False
+
+
+async def broadcast(bot, chat_ids: list, text: str) -> int:
+    """
+    Рассылка create_event (синхронной панели и asgi.py) выбранным студентам через общий лимит.
+    Ошибки отдельных получателей пишутся в лог и не прерывают рассылку; возвращает их число.
+    """
+    results = await asyncio.gather(*(send_limited(bot, chat_id, text) for chat_id in chat_ids),
+                                   return_exceptions=True)
+    failed = 0
+    for chat_id, result in zip(chat_ids, results):
+        if isinstance(result, Exception):
+            failed += 1
+            logging.error(f"Ошибка при отправке уведомления пользователю {chat_id}: {result}")
+    return failed
+
+
+# Теги, которыми add_schedule оформляет пары; всё остальное в тексте расписания – данные
+SCHEDULE_TAGS = ("<b>", "</b>", "<i>", "</i>")
+
+
+def schedule_html(schedule_text: str) -> str:
+    """
+    Текст расписания для сообщения с parse_mode="HTML": предмет, преподаватель и аудитория
+    экранируются («&», «<» в названии не ломают разбор), оформление и переносы строк сохраняются.
+    """
+    text = html.escape(schedule_text, quote=False)
+    for tag in SCHEDULE_TAGS:
+        text = text.replace(html.escape(tag, quote=False), tag)
+    return text
+
+
+# ---------- Утренняя рассылка расписания ----------
+
+def _load_digest_groups(get_db_connection, digest_date: date) -> list[dict]:
+    """Подписчики, которым сегодняшняя рассылка ещё не отправлялась, сгруппированные по группам."""
+    conn = get_db_connection()
+    cur = conn.cursor()
+    cur.execute("DELETE FROM digest_deliveries WHERE digest_date < %s", (digest_date - timedelta(days=7),))
+    cur.execute("""
+        SELECT s.direction, s.group_number, array_agg(s.telegram_id) AS chat_ids
+          FROM students s
+         WHERE s.digest_enabled AND s.telegram_id IS NOT NULL
+           AND NOT EXISTS (SELECT 1 FROM digest_deliveries d
+                            WHERE d.digest_date = %s AND d.telegram_id = s.telegram_id)
+         GROUP BY s.direction, s.group_number
+    """, (digest_date,))
+    groups = cur.fetchall()
+    conn.commit()
+    conn.close()
+    return groups
+
+
+def _claim_recipients(get_db_connection, digest_date: date, chat_ids: list[int]) -> list[int]:
+    """
+    Резервирует получателей до отправки. Уже зарезервированные (например, до падения бота)
+    не возвращаются, поэтому повторный запуск никому не отправит рассылку второй раз.
+    """
+    conn = get_db_connection()
+    cur = conn.cursor()
+    cur.execute("""
+        INSERT INTO digest_deliveries (digest_date, telegram_id)
+        SELECT %s, unnest(%s::bigint[])
+        ON CONFLICT DO NOTHING
+        RETURNING telegram_id
+    """, (digest_date, chat_ids))
+    claimed = [row["telegram_id"] for row in cur.fetchall()]
+    conn.commit()
+    conn.close()
+    return claimed
+
+
+def _release_recipients(get_db_connection, digest_date: date, chat_ids: list[int]):
+    """Снимает резерв с получателей, которым не удалось отправить рассылку: их заберёт повторный запуск."""
+    conn = get_db_connection()
+    cur = conn.cursor()
+    cur.execute("DELETE FROM digest_deliveries WHERE digest_date = %s AND telegram_id = ANY(%s)",
+                (digest_date, chat_ids))
+    conn.commit()
+    conn.close()
+
+
+def _disable_digest(get_db_connection, chat_ids: list[int]):
+    conn = get_db_connection()
+    cur = conn.cursor()
+    cur.execute("UPDATE students SET digest_enabled = FALSE WHERE telegram_id = ANY(%s)", (chat_ids,))
+    conn.commit()
+    conn.close()
+
+
+async def run_morning_digest(bot, get_db_connection, get_schedule_text, digest_date: date) -> int:
+    """
+    Рассылка расписания на digest_date всем подписчикам.
+    Текст строится один раз на группу, отправка идёт через общий ограничитель скорости.
+    Подписка отключается только тем, кто заблокировал бота или удалил чат. Если отправка
+    не удалась из-за сети или таймаута, резерв снимается; возвращается число таких получателей.
+    """
+    if digest_date.weekday() >= len(DAYS_OF_WEEK) or not SEMESTER_START <= digest_date <= SEMESTER_END:
+        return 0
+    day = DAYS_OF_WEEK[digest_date.weekday()]
+    week_type = week_type_for_date(digest_date)
+
+    groups = await asyncio.to_thread(_load_digest_groups, get_db_connection, digest_date)
+    sent = failed = 0
+    for group in groups:
+        direction, group_number = group["direction"], group["group_number"]
+        schedule_text = await asyncio.to_thread(get_schedule_text, direction, group_number, week_type, day)
+        if not schedule_text:
+            continue
+        text = (f"<b>Доброе утро! Расписание {direction}-{group_number} на сегодня "
+                f"({day}, {week_type} неделя):</b>\n\n{schedule_html(schedule_text)}")
+
+        chat_ids = group["chat_ids"]
+        for i in range(0, len(chat_ids), DIGEST_CLAIM_BATCH):
+            claimed = await asyncio.to_thread(
+                _claim_recipients, get_db_connection, digest_date, chat_ids[i:i + DIGEST_CLAIM_BATCH]
+            )
+            results = await asyncio.gather(*(send_limited(bot, chat_id, text, parse_mode="HTML")
+                                             for chat_id in claimed), return_exceptions=True)
+            blocked, retry = [], []
+            for chat_id, result in zip(claimed, results):
+                if result is True:
+                    sent += 1
+                elif result is False:
+                    blocked.append(chat_id)
+                elif isinstance(result, TelegramBadRequest):
+                    # Telegram не принял сам текст: повтор не поможет, подписку не трогаем
+                    logging.error(f"Рассылка {direction}-{group_number} не отправлена {chat_id}: {result}")
+                else:
+                    logging.warning(f"Рассылка {direction}-{group_number} не отправлена {chat_id}: {result!r}")
+                    retry.append(chat_id)
+            if blocked:
+                await asyncio.to_thread(_disable_digest, get_db_connection, blocked)
+            if retry:
+                await asyncio.to_thread(_release_recipients, get_db_connection, digest_date, retry)
+                failed += len(retry)
+    logging.info(f"Утренняя рассылка за {digest_date}: отправлено {sent} сообщений, не доставлено {failed}.")
+    return failed
+
+
+async def digest_scheduler(bot, get_db_connection, get_schedule_text):
+    """
+    Фоновая задача бота: каждый день в DIGEST_TIME запускает рассылку.
+    Если бот перезапустился в течение DIGEST_RESUME_HOURS после этого времени,
+    рассылка досылается тем, кому ещё не была отправлена.
+    """
+    tz = ZoneInfo(SCHEDULE_TIMEZONE)
+    hour, minute = map(int, DIGEST_TIME.split(":"))
+    last_run = None
+    while True:
+        now = datetime.now(tz)
+        start = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        deadline = start + timedelta(hours=DIGEST_RESUME_HOURS)
+        if last_run == now.date() or now >= deadline:
+            start += timedelta(days=1)
+        if now < start:
+            await asyncio.sleep((start - now).total_seconds())
+        try:
+            failed = await run_morning_digest(bot, get_db_connection, get_schedule_text, start.date())
+        except Exception as e:
+            # Повторим через минуту: уже отправленные сообщения зарезервированы и не продублируются
+            logging.error(f"Ошибка утренней рассылки: {e}")
+            await asyncio.sleep(60)
+            continue
+        if failed and datetime.now(tz) < start + timedelta(hours=DIGEST_RESUME_HOURS):
+            # Недоставленным из-за сети резерв снят: повторный запуск отправит только им
+            await asyncio.sleep(60)
+            continue
+        last_run = start.date()
+
+
+# ---------- Уведомления об изменении расписания ----------
+
+def _take_pending_changes(get_schedule_db_connection) -> list[dict]:
+    """
+    Неотправленные изменения групп, которые не редактировались последние
+    SCHEDULE_NOTIFY_DEBOUNCE секунд. Отправленными они отмечаются только после
+    доставки всем студентам группы (_mark_notified), поэтому ошибка не теряет уведомление.
+    """
+    conn = get_schedule_db_connection()
+    cur = conn.cursor()
+    cur.execute("""
+        WITH ready AS (
+            SELECT direction, group_number
+              FROM schedule_history
+             WHERE NOT notified
+             GROUP BY direction, group_number
+            HAVING max(changed_at) < now() - make_interval(secs => %s)
+        )
+        SELECT h.id, h.direction, h.group_number, h.week_type, h.day_of_week,
+               h.changed_pairs, h.schedule_text
+          FROM schedule_history h
+          JOIN ready r ON h.direction = r.direction AND h.group_number = r.group_number
+         WHERE NOT h.notified
+    """, (SCHEDULE_NOTIFY_DEBOUNCE,))
+    rows = cur.fetchall()
+    conn.close()
+    return rows
+
+
+def _mark_notified(get_schedule_db_connection, ids: list[int]):
+    """Изменения разосланы всей группе: журнал доставки по ним больше не нужен."""
+    conn = get_schedule_db_connection()
+    cur = conn.cursor()
+    cur.execute("UPDATE schedule_history SET notified = TRUE WHERE id = ANY(%s)", (ids,))
+    cur.execute("DELETE FROM schedule_change_deliveries WHERE history_id = ANY(%s)", (ids,))
+    conn.commit()
+    conn.close()
+
+
+def _finished_deliveries(get_schedule_db_connection, ids: list[int]) -> dict[int, set[int]]:
+    """
+    telegram_id -> id изменений, которые ему больше не отправляются:
+    доставленные и те, на которые исчерпаны SCHEDULE_NOTIFY_MAX_ATTEMPTS попыток.
+    """
+    conn = get_schedule_db_connection()
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT history_id, telegram_id FROM schedule_change_deliveries
+         WHERE history_id = ANY(%s) AND (delivered OR failures >= %s)
+    """, (ids, SCHEDULE_NOTIFY_MAX_ATTEMPTS))
+    finished = {}
+    for row in cur.fetchall():
+        finished.setdefault(row["telegram_id"], set()).add(row["history_id"])
+    conn.close()
+    return finished
+
+
+def _record_deliveries(get_schedule_db_connection, ids: list[int], delivered: list[int],
+                       failed: list[int]) -> list[int]:
+    """
+    Отмечает доставку изменений ids получателям delivered и неудачную попытку – получателям failed.
+    Возвращает тех из failed, для кого попытки исчерпаны.
+    """
+    conn = get_schedule_db_connection()
+    cur = conn.cursor()
+    cur.execute("""
+        INSERT INTO schedule_change_deliveries (history_id, telegram_id, delivered)
+        SELECT h, t, TRUE FROM unnest(%s::bigint[]) AS h CROSS JOIN unnest(%s::bigint[]) AS t
+        ON CONFLICT (history_id, telegram_id) DO UPDATE SET delivered = TRUE
+    """, (ids, delivered))
+    cur.execute("""
+        INSERT INTO schedule_change_deliveries AS d (history_id, telegram_id, failures)
+        SELECT h, t, 1 FROM unnest(%s::bigint[]) AS h CROSS JOIN unnest(%s::bigint[]) AS t
+        ON CONFLICT (history_id, telegram_id) DO UPDATE SET failures = d.failures + 1
+        RETURNING telegram_id, failures
+    """, (ids, failed))
+    exhausted = {row["telegram_id"] for row in cur.fetchall() if row["failures"] >= SCHEDULE_NOTIFY_MAX_ATTEMPTS}
+    conn.commit()
+    conn.close()
+    return sorted(exhausted)
+
+
+def _group_chat_ids(get_db_connection, direction: str, group_number: str) -> list[int]:
+    conn = get_db_connection()
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT telegram_id FROM students
+         WHERE direction = %s AND group_number = %s AND telegram_id IS NOT NULL
+    """, (direction, group_number))
+    chat_ids = [row["telegram_id"] for row in cur.fetchall()]
+    conn.close()
+    return chat_ids
+
+
+def format_schedule_changes(direction: str, group_number: str, changes: list[dict]) -> str:
+    """
+    Одно сообщение по всем изменениям группы за окно: для каждого дня –
+    только изменённые пары в их новом виде (по последней версии дня).
+    """
+    days = {}
+    for change in sorted(changes, key=lambda c: c["id"]):
+        key = (change["week_type"], change["day_of_week"])
+        pairs, _ = days.get(key, (set(), None))
+        days[key] = (pairs | set(change["changed_pairs"]), change["schedule_text"])
+
+    def day_order(key):
+        week_type, day = key
+        return (WEEK_TYPES.index(week_type) if week_type in WEEK_TYPES else len(WEEK_TYPES),
+                DAYS_OF_WEEK.index(day) if day in DAYS_OF_WEEK else len(DAYS_OF_WEEK))
+
+    lines = [f"<b>Изменилось расписание группы {html.escape(direction)}-{html.escape(group_number)}</b>"]
+    for key in sorted(days, key=day_order):
+        changed, schedule_text = days[key]
+        current = {p["pair_number"]: p for p in parse_schedule_text(schedule_text)}
+        lines.append(f"\n<u>{key[0]} неделя, {key[1]}</u>")
+        for number in sorted(changed):
+            start_time, end_time = PAIRS_INFO[number - 1]
+            pair = current.get(number)
+            if not pair:
+                lines.append(f"{number}) {start_time}-{end_time}: пары нет")
+                continue
+            line = f"{number}) {start_time}-{end_time}: <b>{html.escape(pair['subject'] or '-')}</b>"
+            if pair["lesson_type"]:
+                line += f" ({html.escape(pair['lesson_type'])})"
+            if pair["teacher"]:
+                line += f", {html.escape(pair['teacher'])}"
+            if pair["room"]:
+                line += f", ауд. {html.escape(pair['room'])}"
+            lines.append(line)
+    return "\n".join(lines)
+
+
+async def schedule_change_notifier(bot, get_db_connection, get_schedule_db_connection):
+    """
+    Фоновая задача бота: раз в SCHEDULE_NOTIFY_POLL секунд рассылает изменения расписания
+    только студентам изменённых групп. Несколько правок одной группы подряд
+    объединяются в одно сообщение. Доставка отмечается по каждому студенту
+    (schedule_change_deliveries): тем, кому отправить не удалось, уведомление повторяется
+    на следующем проходе, а группа отмечается notified, только когда разослано всем.
+    """
+    while True:
+        await asyncio.sleep(SCHEDULE_NOTIFY_POLL)
+        try:
+            rows = await asyncio.to_thread(_take_pending_changes, get_schedule_db_connection)
+        except Exception as e:
+            logging.error(f"Ошибка чтения изменений расписания: {e}")
+            continue
+        by_group = {}
+        for row in rows:
+            by_group.setdefault((row["direction"], row["group_number"]), []).append(row)
+        for (direction, group_number), changes in by_group.items():
+            try:
+                await _notify_group(bot, get_db_connection, get_schedule_db_connection,
+                                    direction, group_number, changes)
+            except Exception as e:
+                logging.error(f"Ошибка рассылки изменений расписания {direction}-{group_number}: {e}")
+
+
+async def _notify_group(bot, get_db_connection, get_schedule_db_connection,
+                        direction: str, group_number: str, changes: list[dict]):
+    ids = [change["id"] for change in changes]
+    chat_ids = await asyncio.to_thread(_group_chat_ids, get_db_connection, direction, group_number)
+    finished = await asyncio.to_thread(_finished_deliveries, get_schedule_db_connection, ids)
+    # Получатели по набору ещё не полученных изменений: обычно один набор на всю группу,
+    # после сбоя – отдельный для тех, кому не дошла прошлая попытка
+    pending = {}
+    for chat_id in chat_ids:
+        left = [change for change in changes if change["id"] not in finished.get(chat_id, ())]
+        if left:
+            pending.setdefault(tuple(change["id"] for change in left), (left, []))[1].append(chat_id)
+
+    retry = False
+    for left_ids, (left, recipients) in pending.items():
+        text = format_schedule_changes(direction, group_number, left)
+        results = await asyncio.gather(*(send_limited(bot, chat_id, text, parse_mode="HTML")
+                                         for chat_id in recipients), return_exceptions=True)
+        delivered, failed = [], []
+        for chat_id, result in zip(recipients, results):
+            if isinstance(result, BaseException):
+                logging.warning(f"Изменения {direction}-{group_number} не отправлены {chat_id}: {result!r}")
+                failed.append(chat_id)
+            else:
+                # False – бот заблокирован: повторять незачем
+                delivered.append(chat_id)
+        exhausted = await asyncio.to_thread(_record_deliveries, get_schedule_db_connection,
+                                            list(left_ids), delivered, failed)
+        if exhausted:
+            logging.error(f"Изменения {direction}-{group_number} не отправлены после "
+                          f"{SCHEDULE_NOTIFY_MAX_ATTEMPTS} попыток: {exhausted}")
+        retry |= len(failed) > len(exhausted)
+
+    # Группа остаётся неотмеченной, пока хоть кому-то нужно повторить отправку
+    if not retry:
+        await asyncio.to_thread(_mark_notified, get_schedule_db_connection, ids)
@@ -0,0 +1,30 @@
+"""
+Настройки gunicorn для панели деканата:
+    gunicorn -c gunicorn.conf.py "app:create_app()"
+preload_app: приложение собирается один раз в главном процессе – импорт Flask и aiogram
+и создание таблиц выполняются до fork, рабочие процессы стартуют уже готовыми.
+Подключения к базам открываются на каждый запрос, поэтому общих соединений у процессов нет;
+после fork сбрасывается только состояние маршрутизации на реплики (db.py).
+"""
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+threads = int(os.getenv("WEB_THREADS", "4"))
+timeout = int(os.getenv("WEB_TIMEOUT", "60"))
+preload_app = True
+
+
+def post_fork(server, worker):
+    from db import main_database, schedule_database
+
+    main_database.reset()
+    schedule_database.reset()
+
+
+def child_exit(server, worker):
+    # Метрики завершившегося процесса больше не должны суммироваться в /metrics
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,133 @@
+"""
+HTTP-кэширование ответов панели деканата: ETag/Last-Modified, ответы 304 и gzip.
+Используется для iCal-лент и JSON API расписания.
+compress_response сжимает остальные ответы панели (HTML-страницы) brotli или gzip,
+compress_quart_response – то же для маршрутов, которые обслуживает Quart (asgi.py).
+"""
+import gzip
+import threading
+from collections import OrderedDict
+from flask import request, make_response
+
+from metrics import cache_hit, cache_miss
+
+try:
+    import brotli
+except ImportError:  # без brotli ответы сжимаются только gzip
+    brotli = None
+
+# Сжимать ответы меньше этого размера нет смысла
+GZIP_MIN_SIZE = 512
+COMPRESSIBLE_TYPES = {"text/html", "text/plain", "text/css", "application/javascript", "application/json"}
+
+
+class VersionedCache:
+    """
+    Ограниченный LRU-кэш: ключ -> (версия, значение).
+    Запись, построенная для другой версии, считается промахом и перестраивается.
+    """
+
+    def __init__(self, maxsize: int, name: str = "versioned"):
+        self.maxsize = maxsize
+        self.name = name
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_build(self, key, version, build):
+        with self._lock:
+            cached = self._data.get(key)
+            if cached and cached[0] == version:
+                self._data.move_to_end(key)
+                cache_hit(self.name)
+                return cached[1]
+        cache_miss(self.name)
+        value = build()
+        with self._lock:
+            self._data[key] = (version, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return value
+
+
+def conditional_response(cache: VersionedCache, key, version, etag: str, last_modified,
+                         render, mimetype: str, max_age: int, compress: bool = False):
+    """
+    Отдаёт закэшированный ответ с ETag/Last-Modified.
+    Если клиент прислал совпадающий If-None-Match (или If-Modified-Since не старше
+    last_modified), отвечает 304, не вызывая render() и не обращаясь к кэшу.
+    При compress=True и поддержке gzip клиентом тело сжимается один раз на версию;
+    у сжатого варианта свой сильный ETag, т.к. это другие байты.
+    """
+    use_gzip = compress and 'gzip' in request.accept_encodings
+    if use_gzip:
+        etag += '-gz'
+
+    if request.if_none_match:
+        not_modified = request.if_none_match.contains(etag)
+    else:
+        not_modified = request.if_modified_since is not None and last_modified <= request.if_modified_since
+
+    if not_modified:
+        response = make_response('', 304)
+    else:
+        def build():
+            body = render().encode('utf-8')
+            if use_gzip and len(body) >= GZIP_MIN_SIZE:
+                return gzip.compress(body, compresslevel=6, mtime=0), True
+            return body, False
+
+        body, gzipped = cache.get_or_build((key, use_gzip), version, build)
+        response = make_response(body)
+        response.mimetype = mimetype
+        if gzipped:
+            response.headers['Content-Encoding'] = 'gzip'
+
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.cache_control.public = True
+    response.cache_control.max_age = max_age
+    if compress:
+        response.vary.add('Accept-Encoding')
+    return response
+
+
+def _compressible(response) -> bool:
+    return not (response.status_code < 200 or response.status_code in (204, 304)
+                or 'Content-Encoding' in response.headers or 'ETag' in response.headers
+                or response.mimetype not in COMPRESSIBLE_TYPES)
+
+
+def _compress_body(response, body: bytes, accept_encodings):
+    """Сжимает уже прочитанное тело ответа; общая часть для Flask и Quart."""
+    if len(body) < GZIP_MIN_SIZE:
+        return response
+    response.vary.add('Accept-Encoding')
+    if brotli is not None and 'br' in accept_encodings:
+        response.set_data(brotli.compress(body, quality=5))
+        response.headers['Content-Encoding'] = 'br'
+    elif 'gzip' in accept_encodings:
+        response.set_data(gzip.compress(body, compresslevel=6, mtime=0))
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+
+def compress_response(response):
+    """
+    after_request: сжатие ответа, если клиент это принимает.
+    Ответы с ETag не трогаем – у сжатого тела должен быть свой ETag (см. conditional_response),
+    файлы (send_file) уже отдаются как есть или заранее сжатыми.
+    """
+    if response.direct_passthrough or response.is_streamed or not _compressible(response):
+        return response
+    return _compress_body(response, response.get_data(), request.accept_encodings)
+
+
+async def compress_quart_response(response):
+    """То же сжатие для маршрутов, которые обслуживает Quart (asgi.py); потоковые ответы не трогаем."""
+    from quart import request as quart_request
+    from quart.wrappers.response import DataBody
+
+    if not isinstance(response.response, DataBody) or not _compressible(response):
+        return response
+    return _compress_body(response, await response.get_data(), quart_request.accept_encodings)
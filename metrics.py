@@ -0,0 +1,270 @@
+"""
+Метрики Prometheus для панели деканата и бота.
+- время ответа маршрутов Flask и Quart (asgi.py) и обработчиков aiogram (гистограммы);
+- время SQL-запросов по виду запроса ("SELECT students", "INSERT schedule_slots", ...),
+  в том числе из асинхронного пула asgi.py;
+- подключения к основной базе и к репликам;
+- длительность и ошибки обращений к порталу по странице;
+- попадания/промахи кэшей;
+- время и ошибки ответов ассистента «Задать вопрос»;
+- исходящие вызовы Telegram Bot API.
+Панель отдаёт метрики на /metrics (декану после входа или по заголовку Authorization: Bearer METRICS_TOKEN),
+бот – на отдельном порту BOT_METRICS_PORT.
+На горячем пути – только perf_counter() и observe()/inc() у заранее созданных дочерних метрик.
+"""
+import os
+import re
+import hmac
+import time
+import logging
+from functools import lru_cache
+
+from psycopg2.extras import RealDictCursor
+from prometheus_client import (
+    Counter, Histogram, CollectorRegistry, REGISTRY, CONTENT_TYPE_LATEST, generate_latest, start_http_server,
+)
+
+# Порт HTTP-сервера метрик бота (0 – не запускать)
+BOT_METRICS_PORT = int(os.getenv("BOT_METRICS_PORT", "9101"))
+# Токен для сборщика Prometheus (bearer_token в scrape_config); пусто – только после входа в панель
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+# Интервалы гистограмм: запросы к базе – миллисекунды, портал – секунды
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1, 5)
+SCRAPE_BUCKETS = (0.5, 1, 2, 5, 10, 20, 30, 45, 60, 120)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Время обработки запроса панели деканата",
+    ["route", "method", "status"], buckets=LATENCY_BUCKETS,
+)
+BOT_HANDLER_SECONDS = Histogram(
+    "bot_handler_duration_seconds", "Время работы обработчика бота",
+    ["event", "handler"], buckets=LATENCY_BUCKETS,
+)
+BOT_HANDLER_ERRORS = Counter(
+    "bot_handler_errors_total", "Необработанные исключения в обработчиках бота", ["event", "handler"],
+)
+DB_QUERY_SECONDS = Histogram(
+    "db_query_duration_seconds", "Время выполнения SQL-запроса", ["statement"], buckets=DB_BUCKETS,
+)
+DB_CONNECTIONS = Counter(
+    "db_connections_total", "Подключения к базам: primary, replica и fallback (чтение ушло в основную базу "
+    "из-за отставания или недоступности реплики; такие подключения учтены и в primary)", ["database", "target"],
+)
+PORTAL_REQUEST_SECONDS = Histogram(
+    "portal_request_duration_seconds", "Длительность получения данных с портала (вход, страница, разбор)",
+    ["page"], buckets=SCRAPE_BUCKETS,
+)
+PORTAL_FAILURES = Counter(
+    "portal_failures_total", "Неудачные обращения к порталу", ["page", "reason"],
+)
+ASSISTANT_ANSWER_SECONDS = Histogram(
+    "assistant_answer_duration_seconds", "Время ответа ассистента: model – от модели, cache – из кэша, "
+    "shared – общий ответ на одинаковые вопросы, заданные одновременно", ["source"], buckets=SCRAPE_BUCKETS,
+)
+ASSISTANT_FAILURES = Counter(
+    "assistant_failures_total", "Вопросы без ответа: busy – превышены лимиты, error – модель недоступна", ["reason"],
+)
+CACHE_REQUESTS = Counter(
+    "cache_requests_total", "Обращения к кэшам", ["cache", "result"],
+)
+TELEGRAM_REQUESTS = Counter(
+    "telegram_api_requests_total", "Вызовы Telegram Bot API", ["method", "status"],
+)
+TELEGRAM_REQUEST_SECONDS = Histogram(
+    "telegram_api_request_duration_seconds", "Время вызова Telegram Bot API", ["method"], buckets=LATENCY_BUCKETS,
+)
+
+_CTE_RE = re.compile(r"^\s*WITH\b.*?\bAS\s*\(\s*", re.IGNORECASE | re.DOTALL)
+_VERB_RE = re.compile(r"^\s*(SELECT|INSERT|UPDATE|DELETE|CREATE|ALTER|COPY|DROP|TRUNCATE)\b", re.IGNORECASE)
+_TABLE_RE = {
+    "SELECT": re.compile(r"\bFROM\s+([\w.\"]+)", re.IGNORECASE),
+    "DELETE": re.compile(r"\bFROM\s+([\w.\"]+)", re.IGNORECASE),
+    "INSERT": re.compile(r"\bINTO\s+([\w.\"]+)", re.IGNORECASE),
+    "UPDATE": re.compile(r"^\s*UPDATE\s+([\w.\"]+)", re.IGNORECASE),
+    "COPY": re.compile(r"\bCOPY\s+([\w.\"]+)", re.IGNORECASE),
+}
+
+
+@lru_cache(maxsize=1024)
+def statement_label(sql: str) -> str:
+    """
+    Короткая метка запроса для метрик: глагол и основная таблица.
+    Значения параметров в метку не попадают, поэтому число меток ограничено.
+    Для запросов с WITH метка берётся по первому подзапросу (в наших CTE это изменяющий запрос).
+    """
+    sql = _CTE_RE.sub("", sql, count=1)
+    match = _VERB_RE.match(sql)
+    if not match:
+        return "other"
+    verb = match.group(1).upper()
+    table_re = _TABLE_RE.get(verb)
+    table = table_re.search(sql) if table_re else None
+    return f"{verb} {table.group(1).strip(chr(34)).lower()}" if table else verb
+
+
+def _query_label(query) -> str:
+    # execute_values передаёт в execute() готовый запрос в bytes вместе со значениями,
+    # поэтому для метки достаточно начала запроса
+    if isinstance(query, bytes):
+        query = query[:256].decode("utf-8", "ignore")
+    elif not isinstance(query, str):
+        query = str(query)
+    return statement_label(query[:256])
+
+
+def observe_query(query, started: float):
+    """Время запроса, начатого в started (perf_counter), – в DB_QUERY_SECONDS."""
+    DB_QUERY_SECONDS.labels(_query_label(query)).observe(time.perf_counter() - started)
+
+
+class TimedCursor(RealDictCursor):
+    """RealDictCursor, который записывает время каждого запроса в DB_QUERY_SECONDS."""
+
+    def execute(self, query, vars=None):
+        started = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            observe_query(query, started)
+
+    def executemany(self, query, vars_list):
+        started = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            observe_query(query, started)
+
+    def copy_expert(self, sql, file, size=8192):
+        started = time.perf_counter()
+        try:
+            return super().copy_expert(sql, file, size)
+        finally:
+            observe_query(sql, started)
+
+
+def cache_hit(cache: str):
+    CACHE_REQUESTS.labels(cache, "hit").inc()
+
+
+def cache_miss(cache: str):
+    CACHE_REQUESTS.labels(cache, "miss").inc()
+
+
+# -------------------- Flask --------------------
+
+def _metrics_registry():
+    """При запуске под gunicorn с PROMETHEUS_MULTIPROC_DIR метрики собираются со всех процессов."""
+    if not os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        return REGISTRY
+    from prometheus_client import multiprocess
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def _observe_http(request, response, started: float | None):
+    if started is not None:
+        # Шаблон маршрута, а не фактический путь: /ical/<feed>.ics, а не адрес каждой ленты
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        HTTP_REQUEST_SECONDS.labels(route, request.method, str(response.status_code)).observe(
+            time.perf_counter() - started)
+
+
+def init_flask(app):
+    """Гистограммы времени маршрутов и закрытый эндпоинт /metrics."""
+    from flask import g, request, session, abort
+
+    @app.before_request
+    def _start_timer():
+        g._metrics_started = time.perf_counter()
+
+    @app.after_request
+    def _observe_request(response):
+        _observe_http(request, response, g.pop("_metrics_started", None))
+        return response
+
+    def _metrics_allowed() -> bool:
+        if 'user' in session:
+            return True
+        scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+        return bool(METRICS_TOKEN) and scheme.lower() == "bearer" and hmac.compare_digest(
+            token.encode("utf-8"), METRICS_TOKEN.encode("utf-8"))
+
+    @app.route("/metrics")
+    def metrics():
+        # Имена маршрутов, запросов к базе и объёмы нагрузки – не для посторонних
+        if not _metrics_allowed():
+            abort(403)
+        return generate_latest(_metrics_registry()), 200, {"Content-Type": CONTENT_TYPE_LATEST}
+
+
+# -------------------- Quart --------------------
+
+def init_quart(app):
+    """Те же гистограммы времени для маршрутов, которые обслуживает Quart (asgi.py)."""
+    from quart import g, request
+
+    @app.before_request
+    async def _start_timer():
+        g._metrics_started = time.perf_counter()
+
+    @app.after_request
+    async def _observe_request(response):
+        _observe_http(request, response, g.pop("_metrics_started", None))
+        return response
+
+
+# -------------------- aiogram --------------------
+
+def _handler_name(data: dict) -> str:
+    handler = data.get("handler")
+    callback = getattr(handler, "callback", None)
+    return getattr(callback, "__name__", "unknown")
+
+
+def init_bot(dp, bot):
+    """Метрики обработчиков (message / callback_query) и исходящих вызовов Bot API."""
+    from aiogram import BaseMiddleware
+    from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+
+    class HandlerMetricsMiddleware(BaseMiddleware):
+        def __init__(self, event: str):
+            self.event = event
+
+        async def __call__(self, handler, event, data):
+            name = _handler_name(data)
+            started = time.perf_counter()
+            try:
+                return await handler(event, data)
+            except Exception:
+                BOT_HANDLER_ERRORS.labels(self.event, name).inc()
+                raise
+            finally:
+                BOT_HANDLER_SECONDS.labels(self.event, name).observe(time.perf_counter() - started)
+
+    class TelegramRequestMetrics(BaseRequestMiddleware):
+        async def __call__(self, make_request, bot, method):
+            name = type(method).__name__
+            started = time.perf_counter()
+            status = "error"
+            try:
+                response = await make_request(bot, method)
+                status = "ok"
+                return response
+            finally:
+                TELEGRAM_REQUESTS.labels(name, status).inc()
+                TELEGRAM_REQUEST_SECONDS.labels(name).observe(time.perf_counter() - started)
+
+    # Внутренние middleware вызываются уже для найденного обработчика (так известно его имя)
+    # и действуют на обработчики всех вложенных роутеров
+    dp.message.middleware(HandlerMetricsMiddleware("message"))
+    dp.callback_query.middleware(HandlerMetricsMiddleware("callback_query"))
+    bot.session.middleware(TelegramRequestMetrics())
+
+
+def start_bot_metrics_server(port: int = BOT_METRICS_PORT):
+    if port:
+        start_http_server(port)
+        logging.info(f"Метрики бота: http://0.0.0.0:{port}/metrics")
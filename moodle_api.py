@@ -0,0 +1,200 @@
+"""
+Клиент веб-сервисов Moodle (REST, формат JSON) для портала eu.iit.csu.ru.
+Токен пользователя получается через /login/token.php по логину и паролю,
+дальше курсы и оценки запрашиваются функциями веб-сервиса вместо разбора HTML-страниц.
+"""
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+import requests
+
+MOODLE_SERVICE = os.getenv("MOODLE_SERVICE", "moodle_mobile_app")
+MOODLE_TIMEOUT = float(os.getenv("MOODLE_TIMEOUT", "10"))
+# Сколько клиентов (токенов) держать в памяти и сколько секунд доверять токену
+MOODLE_CLIENT_CACHE_SIZE = int(os.getenv("MOODLE_CLIENT_CACHE_SIZE", "1000"))
+MOODLE_CLIENT_TTL = float(os.getenv("MOODLE_CLIENT_TTL", str(6 * 3600)))
+# Коды ошибок Moodle, означающие, что токен больше не действует
+INVALID_TOKEN_ERRORS = ("invalidtoken", "accessexception")
+
+
+class MoodleAPIError(Exception):
+    """Ошибка веб-сервиса Moodle (неверный логин, отключённый сервис, исключение функции)."""
+
+    def __init__(self, message: str, errorcode: str | None = None):
+        super().__init__(message)
+        self.errorcode = errorcode
+
+
+# Ошибки, при которых бот переходит на разбор HTML-страниц
+MOODLE_WS_ERRORS = (MoodleAPIError, requests.RequestException, KeyError, ValueError)
+
+
+class MoodleClient:
+    def __init__(self, base_url: str, token: str, timeout: float = MOODLE_TIMEOUT, session=None):
+        self.base_url = base_url.rstrip("/")
+        self.token = token
+        self.timeout = timeout
+        self.session = session or requests.Session()
+
+    @classmethod
+    def login(cls, base_url: str, username: str, password: str,
+              service: str = MOODLE_SERVICE, timeout: float = MOODLE_TIMEOUT, session=None):
+        session = session or requests.Session()
+        response = session.post(
+            f"{base_url.rstrip('/')}/login/token.php",
+            data={"username": username, "password": password, "service": service},
+            timeout=timeout,
+        )
+        response.raise_for_status()
+        data = response.json()
+        if "token" not in data:
+            raise MoodleAPIError(data.get("error") or "Moodle не выдал токен")
+        return cls(base_url, data["token"], timeout, session)
+
+    def call(self, wsfunction: str, **params):
+        data = {"wstoken": self.token, "wsfunction": wsfunction, "moodlewsrestformat": "json"}
+        data.update(_flatten_params(params))
+        response = self.session.post(f"{self.base_url}/webservice/rest/server.php", data=data, timeout=self.timeout)
+        response.raise_for_status()
+        result = response.json()
+        if isinstance(result, dict) and "exception" in result:
+            raise MoodleAPIError(f"{wsfunction}: {result.get('errorcode')}: {result.get('message')}",
+                                 result.get("errorcode"))
+        return result
+
+    def site_info(self) -> dict:
+        return self.call("core_webservice_get_site_info")
+
+    def get_user_courses(self, userid: int) -> list[dict]:
+        """Все курсы пользователя одним запросом."""
+        return self.call("core_enrol_get_users_courses", userid=userid)
+
+    def get_grade_items(self, courseid: int, userid: int) -> list[dict]:
+        result = self.call("gradereport_user_get_grade_items", courseid=courseid, userid=userid)
+        usergrades = result.get("usergrades") or []
+        return usergrades[0].get("gradeitems", []) if usergrades else []
+
+
+def _flatten_params(params: dict, prefix: str = "") -> dict:
+    """Moodle ждёт массивы и объекты в виде courseids[0]=1&options[0][name]=..."""
+    flat = {}
+    for key, value in params.items():
+        name = f"{prefix}[{key}]" if prefix else str(key)
+        if isinstance(value, dict):
+            flat.update(_flatten_params(value, name))
+        elif isinstance(value, (list, tuple)):
+            flat.update(_flatten_params(dict(enumerate(value)), name))
+        else:
+            flat[name] = value
+    return flat
+
+
+class ClientCache:
+    """
+    LRU-кэш клиентов: (адрес портала, логин, хэш пароля) -> (время входа, клиент, userid).
+    Токен и userid запрашиваются один раз; запись живёт не дольше ttl, а самые старые
+    вытесняются сверх maxsize, чтобы кэш не рос с каждым новым пользователем.
+    """
+
+    def __init__(self, maxsize: int = MOODLE_CLIENT_CACHE_SIZE, ttl: float = MOODLE_CLIENT_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry and time.monotonic() - entry[0] > self.ttl:
+                del self._data[key]
+                entry = None
+            if entry:
+                self._data.move_to_end(key)
+        return (entry[1], entry[2]) if entry else None
+
+    def put(self, key, client: MoodleClient, userid: int):
+        with self._lock:
+            self._data[key] = (time.monotonic(), client, userid)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                _, (_, evicted, _) = self._data.popitem(last=False)
+                evicted.session.close()
+
+    def pop(self, key):
+        with self._lock:
+            entry = self._data.pop(key, None)
+        if entry:
+            entry[1].session.close()
+
+
+_clients = ClientCache()
+
+
+def _client_key(base_url: str, user_login: str, user_password: str) -> tuple:
+    return (base_url, user_login, hashlib.sha256(user_password.encode("utf-8")).hexdigest())
+
+
+def get_client(base_url: str, user_login: str, user_password: str) -> tuple[MoodleClient, int]:
+    key = _client_key(base_url, user_login, user_password)
+    cached = _clients.get(key)
+    if cached:
+        return cached
+    client = MoodleClient.login(base_url, user_login, user_password)
+    userid = client.site_info()["userid"]
+    _clients.put(key, client, userid)
+    return client, userid
+
+
+def forget_client(base_url: str, user_login: str, user_password: str):
+    _clients.pop(_client_key(base_url, user_login, user_password))
+
+
+def _with_client(base_url: str, user_login: str, user_password: str, func):
+    """
+    func(client, userid) с клиентом из кэша. Если Moodle отклонил токен (истёк или отозван),
+    клиент удаляется из кэша и запрос повторяется один раз с новым входом.
+    """
+    client, userid = get_client(base_url, user_login, user_password)
+    try:
+        return func(client, userid)
+    except MoodleAPIError as e:
+        if e.errorcode not in INVALID_TOKEN_ERRORS:
+            raise
+        forget_client(base_url, user_login, user_password)
+    client, userid = get_client(base_url, user_login, user_password)
+    return func(client, userid)
+
+
+def ws_get_courses_list(base_url: str, user_login: str, user_password: str, semester_str: str) -> dict:
+    """То же, что get_courses_list в main.py: { course_id: course_name } для курсов семестра."""
+    user_courses = _with_client(base_url, user_login, user_password,
+                                lambda client, userid: client.get_user_courses(userid))
+    courses = {}
+    for course in user_courses:
+        name = course.get("fullname") or course.get("shortname") or ""
+        if semester_str in name:
+            courses[str(course["id"])] = name
+    return courses
+
+
+def ws_get_course_grades(base_url: str, user_login: str, user_password: str, course_id: str) -> list[dict]:
+    """То же, что get_course_grades в main.py: список {assignment, grade, range}."""
+    grade_items = _with_client(base_url, user_login, user_password,
+                               lambda client, userid: client.get_grade_items(int(course_id), userid))
+    result = []
+    for item in grade_items:
+        if item.get("itemtype") == "category":
+            continue
+        assignment = "Итоговая оценка за курс" if item.get("itemtype") == "course" else (item.get("itemname") or "")
+        result.append({
+            "assignment": assignment,
+            "grade": item.get("gradeformatted") or "-",
+            "range": item.get("rangeformatted") or "",
+        })
+    # Итоговая оценка – последней строкой, как в таблице на сайте
+    result.sort(key=lambda g: g["assignment"] == "Итоговая оценка за курс")
+    return result
+
@@ -0,0 +1,123 @@
+"""
+Постраничный вывод длинных HTML-сообщений бота.
+Текст делится на страницы по границам строк с учётом открытых тегов (<pre>, <b>, ...):
+на границе страницы теги закрываются и открываются заново на следующей, поэтому
+Telegram всегда получает корректный HTML. Отправляется только первая страница
+с кнопками "◀ / ▶", остальные хранятся в ограниченном кэше и показываются
+редактированием того же сообщения.
+"""
+import re
+from collections import OrderedDict
+
+from aiogram.utils.keyboard import InlineKeyboardBuilder
+
+from metrics import cache_hit, cache_miss
+
+MAX_MESSAGE_LENGTH = 4096
+# Сколько многостраничных сообщений помнить (самые старые вытесняются)
+PAGE_CACHE_SIZE = 1000
+
+TAG_RE = re.compile(r"<(/?)([a-zA-Z][\w-]*)[^>]*?(/?)>")
+
+
+def _update_open_tags(open_tags: list[tuple[str, str]], line: str) -> list[tuple[str, str]]:
+    """Стек открытых тегов (имя, открывающий тег) после строки line."""
+    stack = list(open_tags)
+    for match in TAG_RE.finditer(line):
+        closing, name, self_closing = match.group(1), match.group(2).lower(), match.group(3)
+        if self_closing:
+            continue
+        if closing:
+            for i in range(len(stack) - 1, -1, -1):
+                if stack[i][0] == name:
+                    del stack[i]
+                    break
+        else:
+            stack.append((name, match.group(0)))
+    return stack
+
+
+def _closing(open_tags) -> str:
+    return "".join(f"</{name}>" for name, _ in reversed(open_tags))
+
+
+def _opening(open_tags) -> str:
+    return "".join(tag for _, tag in open_tags)
+
+
+def _safe_cut(line: str, size: int) -> int:
+    """Позиция разреза не дальше size: по пробелу, но не внутри тега или HTML-сущности."""
+    cut = line.rfind(" ", 0, size)
+    if cut <= 0:
+        cut = size
+    if line.rfind("<", 0, cut) > line.rfind(">", 0, cut):
+        cut = line.rfind("<", 0, cut)
+    if line.rfind("&", 0, cut) > line.rfind(";", 0, cut):
+        cut = line.rfind("&", 0, cut)
+    return cut if cut > 0 else size
+
+
+def _split_long_lines(lines: list[str], size: int):
+    for line in lines:
+        while len(line) > size:
+            cut = _safe_cut(line, size)
+            yield line[:cut]
+            line = line[cut:].lstrip(" ")
+        yield line
+
+
+def split_html_pages(text: str, limit: int = MAX_MESSAGE_LENGTH) -> list[str]:
+    """Делит HTML-текст на страницы не длиннее limit с корректно закрытыми тегами."""
+    if len(text) <= limit:
+        return [text]
+    pages = []
+    open_tags = []
+    current = ""
+    for line in _split_long_lines(text.split("\n"), limit // 2):
+        new_open = _update_open_tags(open_tags, line)
+        candidate = f"{current}\n{line}" if current else line
+        if current and len(candidate) + len(_closing(new_open)) > limit:
+            pages.append(current + _closing(open_tags))
+            current = _opening(open_tags) + line
+        else:
+            current = candidate
+        open_tags = new_open
+    if current:
+        pages.append(current + _closing(open_tags))
+    return pages
+
+
+def page_keyboard(page: int, total: int):
+    builder = InlineKeyboardBuilder()
+    # На крайних страницах кнопка ничего не делает: Telegram не даёт "изменить" сообщение на тот же текст
+    builder.button(text="◀", callback_data=f"page:{page - 1}" if page > 0 else "page:noop")
+    builder.button(text=f"{page + 1}/{total}", callback_data="page:noop")
+    builder.button(text="▶", callback_data=f"page:{page + 1}" if page < total - 1 else "page:noop")
+    builder.adjust(3)
+    return builder.as_markup()
+
+
+class PageCache:
+    """LRU-кэш страниц: (chat_id, message_id) -> (страницы, parse_mode)."""
+
+    def __init__(self, maxsize: int = PAGE_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+
+    def put(self, chat_id: int, message_id: int, pages: list[str], parse_mode):
+        self._data[(chat_id, message_id)] = (pages, parse_mode)
+        self._data.move_to_end((chat_id, message_id))
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def get(self, chat_id: int, message_id: int):
+        entry = self._data.get((chat_id, message_id))
+        if entry:
+            self._data.move_to_end((chat_id, message_id))
+            cache_hit("pages")
+        else:
+            cache_miss("pages")
+        return entry
+
+
+page_cache = PageCache()
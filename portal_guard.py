@@ -0,0 +1,182 @@
+"""
+Защита бота от медленного или недоступного портала eu.iit.csu.ru.
+Все обращения к порталу (Selenium, веб-сервисы Moodle) выполняются через PortalGuard:
+- не больше PORTAL_MAX_CONCURRENT одновременных запросов, остальные ждут в очереди;
+- общий срок на запрос PORTAL_DEADLINE секунд, включая ожидание в очереди;
+- после PORTAL_FAILURE_THRESHOLD ошибок подряд портал считается недоступным
+  на PORTAL_RESET_TIMEOUT секунд, и запросы сразу завершаются PortalUnavailable;
+- пока портал недоступен, отдаются последние успешные результаты (не старше PORTAL_STALE_TTL);
+  проверка логина и пароля (allow_stale=False) сохранённым результатом не подменяется.
+"""
+import os
+import time
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+
+from metrics import PORTAL_REQUEST_SECONDS, PORTAL_FAILURES, cache_hit, cache_miss
+from profiling import profiled_thread
+
+PORTAL_MAX_CONCURRENT = int(os.getenv("PORTAL_MAX_CONCURRENT", "4"))
+PORTAL_DEADLINE = float(os.getenv("PORTAL_DEADLINE", "45"))
+PORTAL_FAILURE_THRESHOLD = int(os.getenv("PORTAL_FAILURE_THRESHOLD", "3"))
+PORTAL_RESET_TIMEOUT = float(os.getenv("PORTAL_RESET_TIMEOUT", "60"))
+PORTAL_STALE_TTL = float(os.getenv("PORTAL_STALE_TTL", str(6 * 3600)))
+PORTAL_STALE_SIZE = 2000
+
+
+class PortalUnavailable(Exception):
+    """Портал не ответил вовремя или отключён автоматом, а сохранённого результата нет."""
+
+    user_message = "Портал университета сейчас не отвечает. Попробуйте через пару минут."
+
+
+class CircuitBreaker:
+    """
+    closed – запросы идут на портал; open – сразу отказ;
+    half-open – после reset_timeout пропускается один пробный запрос.
+    """
+
+    def __init__(self, failure_threshold: int = PORTAL_FAILURE_THRESHOLD,
+                 reset_timeout: float = PORTAL_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._probe = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._probe:
+                self._probe = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.opened_at is not None:
+                logging.info("Портал снова отвечает, автомат закрыт.")
+            self.failures = 0
+            self.opened_at = None
+            self._probe = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probe = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    logging.warning(f"Портал не отвечает ({self.failures} ошибок подряд), автомат открыт.")
+                self.opened_at = time.monotonic()
+
+
+class StaleCache:
+    """Последние успешные ответы портала: ключ -> (время, результат)."""
+
+    def __init__(self, ttl: float = PORTAL_STALE_TTL, maxsize: int = PORTAL_STALE_SIZE):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+
+    def put(self, key, value):
+        self._data[key] = (time.time(), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def get(self, key):
+        """(результат, время получения) или None."""
+        entry = self._data.get(key)
+        if not entry or time.time() - entry[0] > self.ttl:
+            return None
+        return entry[1], entry[0]
+
+
+class PortalGuard:
+    def __init__(self, max_concurrent: int = PORTAL_MAX_CONCURRENT, deadline: float = PORTAL_DEADLINE,
+                 breaker: CircuitBreaker | None = None, stale: StaleCache | None = None):
+        self.deadline = deadline
+        self.breaker = breaker or CircuitBreaker()
+        self.stale = stale or StaleCache()
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+
+    async def call(self, key, func, *args, allow_stale: bool = True):
+        """
+        Выполняет блокирующую func(*args) в отдельном потоке.
+        Возвращает (результат, время получения), где время – None для свежего результата
+        и метка time.time() для результата из кэша. Если портал недоступен и в кэше
+        ничего нет – PortalUnavailable.
+        allow_stale=False – только свежий результат: для авторизации старое «пароль подошёл»
+        ничего не доказывает, поэтому такие ответы и не сохраняются.
+        """
+        page = key[0]
+        if not self.breaker.allow():
+            PORTAL_FAILURES.labels(page, "circuit_open").inc()
+            return self._stale_or_raise(key, "автомат открыт", allow_stale)
+
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.deadline)
+        except asyncio.TimeoutError:
+            # Очередь к порталу не двигается – это тоже признак недоступности
+            self.breaker.record_failure()
+            PORTAL_FAILURES.labels(page, "queue_timeout").inc()
+            return self._stale_or_raise(key, "очередь к порталу переполнена", allow_stale)
+
+        task = asyncio.ensure_future(asyncio.to_thread(profiled_thread(func), *args))
+        # Слот освобождается, только когда поток действительно завершился,
+        # иначе зависшие браузеры копились бы сверх лимита
+        task.add_done_callback(lambda _: self._semaphore.release())
+        remaining = max(self.deadline - (loop.time() - started), 0.1)
+        try:
+            result = await asyncio.wait_for(asyncio.shield(task), remaining)
+        except asyncio.TimeoutError:
+            self.breaker.record_failure()
+            PORTAL_FAILURES.labels(page, "timeout").inc()
+            return self._stale_or_raise(key, f"нет ответа за {self.deadline:g} с", allow_stale)
+        except Exception as e:
+            self.breaker.record_failure()
+            PORTAL_FAILURES.labels(page, "error").inc()
+            return self._stale_or_raise(key, str(e), allow_stale)
+
+        PORTAL_REQUEST_SECONDS.labels(page).observe(loop.time() - started)
+        self.breaker.record_success()
+        if allow_stale:
+            self.stale.put(key, result)
+        return result, None
+
+    def _stale_or_raise(self, key, reason: str, allow_stale: bool = True):
+        if not allow_stale:
+            logging.warning(f"Портал недоступен ({reason}), {key[0]} без сохранённых данных.")
+            raise PortalUnavailable(reason)
+        cached = self.stale.get(key)
+        (cache_miss if cached is None else cache_hit)("portal_stale")
+        if cached is None:
+            logging.warning(f"Портал недоступен ({reason}), сохранённых данных для {key[0]} нет.")
+            raise PortalUnavailable(reason)
+        logging.warning(f"Портал недоступен ({reason}), отдаём сохранённые данные для {key[0]}.")
+        return cached
+
+
+def stale_note(fetched_at: float | None) -> str:
+    """Подпись к ответу из кэша: пустая строка для свежих данных."""
+    if fetched_at is None:
+        return ""
+    return f"\n\n<i>Портал не отвечает, показаны данные от {time.strftime('%d.%m %H:%M', time.localtime(fetched_at))}.</i>"
+
+
+portal_guard = PortalGuard()
@@ -0,0 +1,263 @@
+"""
+Выборочное профилирование медленных запросов панели и обработчиков бота.
+Для доли запросов sample_rate включается сэмплирующий профайлер: фоновый поток
+раз в interval_ms снимает стеки потоков запроса через sys._current_frames().
+Если запрос оказался дольше threshold_ms, стеки записываются в output_dir в формате
+collapsed stacks ("кадр;кадр;кадр N"), который понимают flamegraph.pl и speedscope;
+корневой кадр – маршрут или данные callback-кнопки. Быстрые запросы отбрасываются.
+В боте обработчики делят поток цикла событий, поэтому в профиль могут попасть кадры
+соседних обработчиков; работа в asyncio.to_thread (портал) снимается со своего потока.
+
+Настройки читаются из переменных окружения и из JSON-файла PROFILING_CONFIG
+(по умолчанию profiling.json), файл перечитывается при изменении – без перезапуска:
+    {"enabled": true, "sample_rate": 0.1, "threshold_ms": 1000, "interval_ms": 5, "output_dir": "profiles"}
+"""
+import os
+import re
+import sys
+import json
+import time
+import random
+import logging
+import threading
+import contextvars
+from collections import Counter
+
+PROFILING_CONFIG = os.getenv("PROFILING_CONFIG", "profiling.json")
+# Как часто проверять, не изменился ли файл настроек
+CONFIG_CHECK_INTERVAL = 1.0
+MAX_STACK_DEPTH = 128
+
+DEFAULTS = {
+    "enabled": os.getenv("PROFILING_ENABLED", "0") == "1",
+    "sample_rate": float(os.getenv("PROFILING_SAMPLE_RATE", "0.05")),
+    "threshold_ms": float(os.getenv("PROFILING_THRESHOLD_MS", "1000")),
+    "interval_ms": float(os.getenv("PROFILING_INTERVAL_MS", "5")),
+    "output_dir": os.getenv("PROFILING_OUTPUT_DIR", "profiles"),
+}
+
+
+class ProfilingConfig:
+    """Текущие настройки; файл PROFILING_CONFIG перечитывается, когда меняется его mtime."""
+
+    def __init__(self, path: str = PROFILING_CONFIG):
+        self.path = path
+        self.values = dict(DEFAULTS)
+        self._mtime = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def current(self) -> dict:
+        now = time.monotonic()
+        if now - self._checked_at >= CONFIG_CHECK_INTERVAL:
+            with self._lock:
+                if now - self._checked_at >= CONFIG_CHECK_INTERVAL:
+                    self._checked_at = now
+                    self._reload()
+        return self.values
+
+    def _reload(self):
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError:
+            mtime = None
+        if mtime == self._mtime:
+            return
+        self._mtime = mtime
+        values = dict(DEFAULTS)
+        if mtime is not None:
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    values.update(json.load(f))
+            except (OSError, ValueError) as e:
+                logging.error(f"Не удалось прочитать настройки профилирования {self.path}: {e}")
+                return
+        self.values = values
+        logging.info(f"Профилирование: {'включено' if values['enabled'] else 'выключено'}, "
+                     f"доля {values['sample_rate']}, порог {values['threshold_ms']} мс")
+
+
+class Profile:
+    """Стеки, снятые с потоков одного запроса."""
+
+    def __init__(self, tag: str, thread_id: int):
+        self.tag = tag
+        self.threads = {thread_id}
+        self.counts = Counter()
+        self.started = time.perf_counter()
+
+
+def _collapse(frame) -> str:
+    frames = []
+    while frame is not None and len(frames) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        frames.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+        frame = frame.f_back
+    return ";".join(reversed(frames))
+
+
+class Sampler:
+    """Один фоновый поток на процесс; работает, только пока есть активные профили."""
+
+    def __init__(self):
+        self._profiles = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        self.interval = DEFAULTS["interval_ms"] / 1000
+
+    def add(self, profile: Profile):
+        with self._lock:
+            self._profiles.add(profile)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="profiling-sampler", daemon=True)
+                self._thread.start()
+
+    def remove(self, profile: Profile):
+        with self._lock:
+            self._profiles.discard(profile)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._profiles:
+                    self._thread = None
+                    return
+                profiles = list(self._profiles)
+            frames = sys._current_frames()
+            for profile in profiles:
+                for thread_id in tuple(profile.threads):
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        profile.counts[_collapse(frame)] += 1
+            del frames
+            time.sleep(self.interval)
+
+
+config = ProfilingConfig()
+sampler = Sampler()
+# Профиль текущего запроса: через него потоки asyncio.to_thread добавляются к профилю
+current_profile = contextvars.ContextVar("current_profile", default=None)
+
+
+def start(tag: str) -> Profile | None:
+    """Начинает профиль с вероятностью sample_rate; при выключенном профилировании – None."""
+    values = config.current()
+    if not values["enabled"] or random.random() >= values["sample_rate"]:
+        return None
+    sampler.interval = max(values["interval_ms"], 1) / 1000
+    profile = Profile(tag, threading.get_ident())
+    sampler.add(profile)
+    return profile
+
+
+def finish(profile: Profile | None):
+    """Останавливает профиль и записывает его, если запрос был дольше порога."""
+    if profile is None:
+        return
+    sampler.remove(profile)
+    elapsed_ms = (time.perf_counter() - profile.started) * 1000
+    values = config.current()
+    if elapsed_ms < values["threshold_ms"] or not profile.counts:
+        return
+    try:
+        write_profile(profile, elapsed_ms, values["output_dir"])
+    except OSError as e:
+        logging.error(f"Не удалось записать профиль {profile.tag}: {e}")
+
+
+def write_profile(profile: Profile, elapsed_ms: float, output_dir: str) -> str:
+    os.makedirs(output_dir, exist_ok=True)
+    slug = re.sub(r"[^\w.-]+", "_", profile.tag).strip("_")[:80]
+    path = os.path.join(output_dir, f"{time.strftime('%Y%m%d-%H%M%S')}-{int(elapsed_ms)}ms-{slug}.folded")
+    root = profile.tag.replace(";", ",").replace(" ", "_")
+    with open(path, "w", encoding="utf-8") as f:
+        for stack, count in profile.counts.most_common():
+            f.write(f"{root};{stack} {count}\n")
+    logging.info(f"Медленный запрос {profile.tag} ({elapsed_ms:.0f} мс), профиль: {path}")
+    return path
+
+
+def profiled_thread(func):
+    """
+    Обёртка для функций, которые уходят в asyncio.to_thread: поток добавляется к профилю
+    запроса (to_thread копирует контекст), чтобы в профиль попали Selenium и разбор страниц.
+    """
+    def wrapper(*args, **kwargs):
+        profile = current_profile.get()
+        if profile is None:
+            return func(*args, **kwargs)
+        thread_id = threading.get_ident()
+        profile.threads.add(thread_id)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profile.threads.discard(thread_id)
+    return wrapper
+
+
+# -------------------- Flask --------------------
+
+def install_flask_profiler(app):
+    from flask import g, request
+
+    @app.before_request
+    def _start_profile():
+        rule = request.url_rule.rule if request.url_rule else request.path
+        profile = start(f"{request.method} {rule}")
+        if profile is not None:
+            g._profile = profile
+            g._profile_token = current_profile.set(profile)
+
+    @app.teardown_request
+    def _finish_profile(exc):
+        profile = g.pop("_profile", None)
+        if profile is not None:
+            current_profile.reset(g.pop("_profile_token"))
+            finish(profile)
+
+
+def install_quart_profiler(app):
+    """То же для маршрутов, которые обслуживает Quart (asgi.py); как и в боте, поток цикла событий общий."""
+    from quart import g, request
+
+    @app.before_request
+    async def _start_profile():
+        rule = request.url_rule.rule if request.url_rule else request.path
+        profile = start(f"{request.method} {rule}")
+        if profile is not None:
+            g._profile = profile
+            g._profile_token = current_profile.set(profile)
+
+    @app.teardown_request
+    async def _finish_profile(exc):
+        profile = g.pop("_profile", None)
+        if profile is not None:
+            current_profile.reset(g.pop("_profile_token"))
+            finish(profile)
+
+
+# -------------------- aiogram --------------------
+
+def install_bot_profiler(dp):
+    from aiogram import BaseMiddleware
+
+    class ProfilingMiddleware(BaseMiddleware):
+        async def __call__(self, handler, event, data):
+            callback_data = getattr(event, "data", None)
+            if callback_data is not None:
+                tag = f"callback {callback_data}"
+            else:
+                # Текст сообщений в метку не попадает: это могут быть логин и пароль
+                tag = f"message {getattr(getattr(data.get('handler'), 'callback', None), '__name__', 'unknown')}"
+            profile = start(tag)
+            if profile is None:
+                return await handler(event, data)
+            token = current_profile.set(profile)
+            try:
+                return await handler(event, data)
+            finally:
+                current_profile.reset(token)
+                finish(profile)
+
+    dp.message.middleware(ProfilingMiddleware())
+    dp.callback_query.middleware(ProfilingMiddleware())
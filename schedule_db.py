@@ -0,0 +1,548 @@
+"""
+Общие функции для работы с базой расписания.
+Используются и веб-панелью деканата (app.py), и ботом (main.py).
+Все функции принимают уже открытый курсор, подключением и commit управляет вызывающий код.
+"""
+import os
+import re
+from datetime import date, timedelta
+from psycopg2.extras import execute_values
+
+# Временные интервалы пар
+PAIRS_INFO = [
+    ("08:00", "09:30"),
+    ("09:40", "11:10"),
+    ("11:20", "12:50"),
+    ("13:20", "14:50"),
+    ("15:00", "16:30"),
+    ("16:40", "18:10"),
+    ("18:20", "19:50"),
+    ("19:55", "21:25"),
+]
+
+DAYS_OF_WEEK = ["Понедельник", "Вторник", "Среда", "Четверг", "Пятница", "Суббота"]
+WEEK_TYPES = ["Четная", "Нечетная"]
+
+# Границы семестра (YYYY-MM-DD) и тип первой недели семестра
+SEMESTER_START = date.fromisoformat(os.getenv("SEMESTER_START", "2025-02-10"))
+SEMESTER_END = date.fromisoformat(os.getenv("SEMESTER_END", "2025-06-30"))
+FIRST_WEEK_TYPE = os.getenv("FIRST_WEEK_TYPE", "Нечетная")
+# Часовой пояс, в котором заданы времена пар
+SCHEDULE_TIMEZONE = os.getenv("SCHEDULE_TIMEZONE", "Asia/Yekaterinburg")
+
+
+def get_table_name_by_direction(direction: str) -> str:
+    d = direction.upper()
+    if d == "ПИ":
+        return "schedule_PI"
+    elif d == "ПРИ":
+        return "schedule_PRI"
+    elif d == "БИ":
+        return "schedule_BI"
+    else:
+        return "schedule_other"
+
+
+def week_type_for_date(d: date) -> str:
+    """Тип недели (Четная/Нечетная) для даты, считая от понедельника первой недели семестра."""
+    first_monday = SEMESTER_START - timedelta(days=SEMESTER_START.weekday())
+    weeks_passed = (d - first_monday).days // 7
+    if weeks_passed % 2 == 0:
+        return FIRST_WEEK_TYPE
+    return WEEK_TYPES[0] if FIRST_WEEK_TYPE == WEEK_TYPES[1] else WEEK_TYPES[1]
+
+
+def normalize_teacher_name(name: str) -> str:
+    """
+    Приводит ФИО преподавателя к виду для поиска:
+    'Иванов  И. И.' -> 'иванов и.и.', 'Ёлкин' -> 'елкин'.
+    """
+    name = (name or "").strip().lower().replace("ё", "е")
+    name = re.sub(r"\s*\.\s*", ".", name)
+    name = re.sub(r"\s+", " ", name)
+    return name.strip()
+
+
+# -------------------- Структурированные пары (индекс по преподавателям) --------------------
+
+def init_schedule_slots(cur):
+    """
+    Таблица schedule_slots хранит каждую пару отдельной строкой.
+    По teacher_norm построен индекс с text_pattern_ops, поэтому поиск по началу ФИО
+    (teacher_norm LIKE 'иван%') – это один проход по индексу, а не LIKE по schedule_text.
+    """
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS schedule_slots (
+            id SERIAL PRIMARY KEY,
+            direction TEXT NOT NULL,
+            group_number TEXT NOT NULL,
+            week_type TEXT NOT NULL,
+            day_of_week TEXT NOT NULL,
+            pair_number INTEGER NOT NULL,
+            subject TEXT,
+            lesson_type TEXT,
+            teacher TEXT,
+            teacher_norm TEXT,
+            room TEXT
+        )
+    ''')
+    cur.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS schedule_slots_unique_idx
+            ON schedule_slots (direction, group_number, week_type, day_of_week, pair_number)
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS schedule_slots_teacher_idx
+            ON schedule_slots (teacher_norm text_pattern_ops)
+         WHERE teacher_norm <> ''
+    """)
+    # Одна аудитория и один преподаватель не могут быть заняты дважды в одну пару
+    cur.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS schedule_slots_room_slot_idx
+            ON schedule_slots (week_type, day_of_week, pair_number, room)
+         WHERE room <> ''
+    """)
+    cur.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS schedule_slots_teacher_slot_idx
+            ON schedule_slots (week_type, day_of_week, pair_number, teacher_norm)
+         WHERE teacher_norm <> ''
+    """)
+
+
+# -------------------- Версии расписания групп --------------------
+
+def init_schedule_versions(cur):
+    """
+    Счётчик версий расписания по группам. Увеличивается при каждой записи,
+    по нему строятся ETag и ключи кэшей (iCal-ленты, API).
+    """
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS schedule_versions (
+            direction TEXT NOT NULL,
+            group_number TEXT NOT NULL,
+            version BIGINT NOT NULL DEFAULT 1,
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            PRIMARY KEY (direction, group_number)
+        )
+    ''')
+
+
+def init_schedule_history(cur):
+    """
+    История изменений расписания: каждая запись дня с изменёнными парами.
+    notified – отправлено ли студентам группы уведомление об изменении;
+    schedule_change_deliveries – доставка уведомления каждому студенту.
+    """
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS schedule_history (
+            id BIGSERIAL PRIMARY KEY,
+            direction TEXT NOT NULL,
+            group_number TEXT NOT NULL,
+            week_type TEXT NOT NULL,
+            day_of_week TEXT NOT NULL,
+            version BIGINT NOT NULL,
+            changed_pairs INTEGER[] NOT NULL,
+            schedule_text TEXT,
+            changed_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            notified BOOLEAN NOT NULL DEFAULT FALSE
+        )
+    ''')
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS schedule_history_pending_idx
+            ON schedule_history (direction, group_number, changed_at)
+         WHERE NOT notified
+    """)
+    # Кому изменение уже отправлено (или сколько раз не удалось): при ошибке отправки
+    # повторяется только этот получатель, а группа отмечается notified, когда разослано всем
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS schedule_change_deliveries (
+            history_id BIGINT NOT NULL REFERENCES schedule_history (id) ON DELETE CASCADE,
+            telegram_id BIGINT NOT NULL,
+            delivered BOOLEAN NOT NULL DEFAULT FALSE,
+            failures INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (history_id, telegram_id)
+        )
+    ''')
+
+
+def init_timetable_images(cur):
+    """
+    file_id картинок с расписанием недели, уже загруженных в Telegram.
+    Ключ – хэш содержимого (пары недели группы и версия отрисовки): пока расписание
+    не изменилось, картинка не рисуется и не загружается заново.
+    """
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS timetable_images (
+            content_hash TEXT PRIMARY KEY,
+            direction TEXT NOT NULL,
+            group_number TEXT NOT NULL,
+            week_type TEXT NOT NULL,
+            file_id TEXT NOT NULL,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        )
+    ''')
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS timetable_images_group_idx
+            ON timetable_images (direction, group_number, week_type)
+    """)
+
+
+def get_timetable_image(cur, content_hash: str) -> str | None:
+    cur.execute("SELECT file_id FROM timetable_images WHERE content_hash = %s", (content_hash,))
+    row = cur.fetchone()
+    return row["file_id"] if row else None
+
+
+def save_timetable_image(cur, content_hash: str, direction: str, group_number: str, week_type: str, file_id: str):
+    """Сохраняет file_id новой картинки; картинки прежних версий расписания этой недели удаляются."""
+    cur.execute("""
+        DELETE FROM timetable_images
+         WHERE direction = %s AND group_number = %s AND week_type = %s AND content_hash <> %s
+    """, (direction, group_number, week_type, content_hash))
+    cur.execute("""
+        INSERT INTO timetable_images (content_hash, direction, group_number, week_type, file_id)
+        VALUES (%s, %s, %s, %s, %s)
+        ON CONFLICT (content_hash) DO UPDATE SET file_id = EXCLUDED.file_id, created_at = now()
+    """, (content_hash, direction, group_number, week_type, file_id))
+
+
+def delete_timetable_image(cur, content_hash: str):
+    cur.execute("DELETE FROM timetable_images WHERE content_hash = %s", (content_hash,))
+
+
+# -------------------- Заполненность расписания --------------------
+
+# Как group_stats в students_db: триггер на уровне оператора прибавляет к счётчику пар
+# дня разницу по таблицам переходов schedule_slots
+SCHEDULE_COVERAGE_FUNCTION = """
+    CREATE OR REPLACE FUNCTION schedule_coverage_trigger() RETURNS trigger LANGUAGE plpgsql AS $$
+    DECLARE
+        added schedule_slots[];
+        removed schedule_slots[];
+    BEGIN
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            SELECT array_agg(n) INTO added FROM new_rows n;
+        END IF;
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            SELECT array_agg(o) INTO removed FROM old_rows o;
+        END IF;
+        INSERT INTO schedule_coverage AS sc (direction, group_number, week_type, day_of_week, pairs)
+        SELECT direction, group_number, week_type, day_of_week, sum(sign)
+          FROM (SELECT 1 AS sign, a.* FROM unnest(added) a
+                UNION ALL
+                SELECT -1 AS sign, r.* FROM unnest(removed) r) d
+         GROUP BY 1, 2, 3, 4
+        HAVING sum(sign) <> 0
+         ORDER BY 1, 2, 3, 4
+        ON CONFLICT (direction, group_number, week_type, day_of_week) DO UPDATE
+        SET pairs = sc.pairs + EXCLUDED.pairs, updated_at = now();
+        RETURN NULL;
+    END
+    $$
+"""
+
+
+def init_schedule_coverage(cur):
+    """
+    schedule_coverage – число пар группы по дням, по ней панель показывает, у каких групп
+    расписание не заполнено. Обновляется триггерами на schedule_slots; строк в ней не больше,
+    чем групп x 12 дней, сколько бы ни было пар и истории изменений.
+    """
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS schedule_coverage (
+            direction TEXT NOT NULL,
+            group_number TEXT NOT NULL,
+            week_type TEXT NOT NULL,
+            day_of_week TEXT NOT NULL,
+            pairs INTEGER NOT NULL DEFAULT 0,
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            PRIMARY KEY (direction, group_number, week_type, day_of_week)
+        )
+    ''')
+    cur.execute(SCHEDULE_COVERAGE_FUNCTION)
+    for event, referencing in (("INSERT", "NEW TABLE AS new_rows"),
+                               ("UPDATE", "OLD TABLE AS old_rows NEW TABLE AS new_rows"),
+                               ("DELETE", "OLD TABLE AS old_rows")):
+        name = f"schedule_coverage_{event.lower()}"
+        cur.execute(f"DROP TRIGGER IF EXISTS {name} ON schedule_slots")
+        cur.execute(f"""
+            CREATE TRIGGER {name} AFTER {event} ON schedule_slots
+            REFERENCING {referencing}
+            FOR EACH STATEMENT EXECUTE FUNCTION schedule_coverage_trigger()
+        """)
+    cur.execute("SELECT EXISTS (SELECT 1 FROM schedule_coverage) AS filled")
+    if not cur.fetchone()["filled"]:
+        rebuild_schedule_coverage(cur)
+
+
+def rebuild_schedule_coverage(cur):
+    """Полный пересчёт по schedule_slots (первое заполнение или исправление вручную)."""
+    cur.execute("DELETE FROM schedule_coverage")
+    cur.execute("""
+        INSERT INTO schedule_coverage (direction, group_number, week_type, day_of_week, pairs)
+        SELECT direction, group_number, week_type, day_of_week, count(*)
+          FROM schedule_slots
+         GROUP BY 1, 2, 3, 4
+    """)
+
+
+def get_schedule_coverage(cur) -> list[dict]:
+    """Для каждой группы с расписанием: сколько дней (из 12) заполнено и сколько всего пар."""
+    cur.execute("""
+        SELECT direction, group_number,
+               count(*) FILTER (WHERE pairs > 0) AS days,
+               sum(pairs) AS pairs
+          FROM schedule_coverage
+         GROUP BY direction, group_number
+        HAVING sum(pairs) > 0
+    """)
+    return cur.fetchall()
+
+
+def bump_schedule_version(cur, direction: str, group_number: str) -> int:
+    cur.execute("""
+        INSERT INTO schedule_versions (direction, group_number)
+        VALUES (%s, %s)
+        ON CONFLICT (direction, group_number)
+        DO UPDATE SET version = schedule_versions.version + 1, updated_at = now()
+        RETURNING version
+    """, (direction, group_number))
+    return cur.fetchone()["version"]
+
+
+def get_schedule_version(cur, direction: str, group_number: str):
+    """Строка {version, updated_at} или None, если расписание группы ещё не заполнялось."""
+    cur.execute("""
+        SELECT version, updated_at FROM schedule_versions
+         WHERE direction = %s AND group_number = %s
+    """, (direction, group_number))
+    return cur.fetchone()
+
+
+class ScheduleConflictError(Exception):
+    """Аудитория или преподаватель уже заняты в эту пару другой группой."""
+
+    def __init__(self, conflicts: list[dict]):
+        self.conflicts = conflicts
+        super().__init__(f"Найдено конфликтов: {len(conflicts)}")
+
+
+def find_slot_conflicts(cur, direction: str, group_number: str, week_type: str, day_of_week: str,
+                        pairs: list[dict]) -> list[dict]:
+    """
+    Проверяет все пары дня одним запросом. Для каждой пары это одна проба
+    уникального индекса по аудитории и одна – по преподавателю.
+    Возвращает список словарей: pair_number, kind ('room' или 'teacher'), value,
+    direction и group_number группы, которая уже занимает слот.
+    """
+    if not pairs:
+        return []
+    numbers = [p["pair_number"] for p in pairs]
+    rooms = [p.get("room", "") for p in pairs]
+    teachers = [normalize_teacher_name(p.get("teacher", "")) for p in pairs]
+    cur.execute("""
+        WITH v AS (
+            SELECT * FROM unnest(%(numbers)s::int[], %(rooms)s::text[], %(teachers)s::text[])
+                       AS v(pair_number, room, teacher_norm)
+        )
+        SELECT v.pair_number, 'room' AS kind, s.room AS value, s.direction, s.group_number
+          FROM v
+          JOIN schedule_slots s
+            ON s.week_type = %(week_type)s AND s.day_of_week = %(day)s
+           AND s.pair_number = v.pair_number AND s.room = v.room AND s.room <> ''
+         WHERE v.room <> '' AND NOT (s.direction = %(direction)s AND s.group_number = %(group)s)
+        UNION ALL
+        SELECT v.pair_number, 'teacher' AS kind, s.teacher AS value, s.direction, s.group_number
+          FROM v
+          JOIN schedule_slots s
+            ON s.week_type = %(week_type)s AND s.day_of_week = %(day)s
+           AND s.pair_number = v.pair_number AND s.teacher_norm = v.teacher_norm AND s.teacher_norm <> ''
+         WHERE v.teacher_norm <> '' AND NOT (s.direction = %(direction)s AND s.group_number = %(group)s)
+         ORDER BY pair_number, kind
+    """, {
+        "numbers": numbers, "rooms": rooms, "teachers": teachers,
+        "week_type": week_type, "day": day_of_week,
+        "direction": direction, "group": group_number,
+    })
+    return cur.fetchall()
+
+
+def save_day_slots(cur, direction: str, group_number: str, week_type: str, day_of_week: str, pairs: list[dict],
+                   skip_conflicts: bool = False):
+    """
+    Перезаписывает пары группы на один день.
+    pairs – список словарей с ключами pair_number, subject, lesson_type, teacher, room
+    (только непустые пары).
+    skip_conflicts=True пропускает пары, нарушающие уникальность слота (нужно только при
+    заполнении по старым данным, где конфликты уже могли быть).
+    """
+    cur.execute("""
+        DELETE FROM schedule_slots
+         WHERE direction = %s AND group_number = %s AND week_type = %s AND day_of_week = %s
+    """, (direction, group_number, week_type, day_of_week))
+    if not pairs:
+        return
+    rows = [
+        (direction, group_number, week_type, day_of_week, p["pair_number"],
+         p.get("subject", ""), p.get("lesson_type", ""), p.get("teacher", ""),
+         normalize_teacher_name(p.get("teacher", "")), p.get("room", ""))
+        for p in pairs
+    ]
+    execute_values(cur, """
+        INSERT INTO schedule_slots (direction, group_number, week_type, day_of_week, pair_number,
+                                    subject, lesson_type, teacher, teacher_norm, room)
+        VALUES %s
+    """ + (" ON CONFLICT DO NOTHING" if skip_conflicts else ""), rows)
+
+
+def get_day_slots(cur, direction: str, group_number: str, week_type: str, day_of_week: str) -> list[dict]:
+    cur.execute("""
+        SELECT pair_number, subject, lesson_type, teacher, room
+          FROM schedule_slots
+         WHERE direction = %s AND group_number = %s AND week_type = %s AND day_of_week = %s
+    """, (direction, group_number, week_type, day_of_week))
+    return cur.fetchall()
+
+
+def diff_day_pairs(old_pairs: list[dict], new_pairs: list[dict]) -> list[int]:
+    """Номера пар, которые добавились, пропали или изменились."""
+    fields = ("subject", "lesson_type", "teacher", "room")
+    old = {p["pair_number"]: tuple(p.get(f) or "" for f in fields) for p in old_pairs}
+    new = {p["pair_number"]: tuple(p.get(f) or "" for f in fields) for p in new_pairs}
+    return sorted(n for n in old.keys() | new.keys() if old.get(n) != new.get(n))
+
+
+def save_day_schedule(cur, direction: str, group_number: str, week_type: str, day_of_week: str,
+                      schedule_text: str, pairs: list[dict]):
+    """
+    Единая точка записи расписания на день: текст в таблицу направления
+    и структурированные пары в schedule_slots (в одной транзакции вызывающего кода).
+    Если аудитория или преподаватель уже заняты другой группой, выбрасывает
+    ScheduleConflictError со всеми конфликтами дня сразу.
+    Если пары изменились (или день заполняется впервые), увеличивает версию расписания
+    группы и пишет запись в schedule_history со списком изменённых пар.
+    """
+    conflicts = find_slot_conflicts(cur, direction, group_number, week_type, day_of_week, pairs)
+    if conflicts:
+        raise ScheduleConflictError(conflicts)
+
+    table_name = get_table_name_by_direction(direction)
+    if table_name == "schedule_other":
+        cur.execute(f"""
+            INSERT INTO {table_name} (direction, group_number, week_type, day_of_week, schedule_text)
+            VALUES (%s, %s, %s, %s, %s)
+            ON CONFLICT (direction, group_number, week_type, day_of_week)
+            DO UPDATE SET schedule_text = EXCLUDED.schedule_text
+            RETURNING (xmax = 0) AS inserted
+        """, (direction, group_number, week_type, day_of_week, schedule_text))
+    else:
+        cur.execute(f"""
+            INSERT INTO {table_name} (group_number, week_type, day_of_week, schedule_text)
+            VALUES (%s, %s, %s, %s)
+            ON CONFLICT (group_number, week_type, day_of_week)
+            DO UPDATE SET schedule_text = EXCLUDED.schedule_text
+            RETURNING (xmax = 0) AS inserted
+        """, (group_number, week_type, day_of_week, schedule_text))
+    inserted = cur.fetchone()["inserted"]
+
+    old_pairs = get_day_slots(cur, direction, group_number, week_type, day_of_week)
+    changed_pairs = diff_day_pairs(old_pairs, pairs)
+    save_day_slots(cur, direction, group_number, week_type, day_of_week, pairs)
+    if not (inserted or changed_pairs):
+        return
+
+    version = bump_schedule_version(cur, direction, group_number)
+    if not changed_pairs:
+        return
+    cur.execute("""
+        INSERT INTO schedule_history (direction, group_number, week_type, day_of_week, version,
+                                      changed_pairs, schedule_text)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+    """, (direction, group_number, week_type, day_of_week, version, changed_pairs, schedule_text))
+
+
+# Строка пары в schedule_text, например:
+# 2) 09:40-11:10: <b>Матанализ</b> (Лекция)<br><i>Иванов И.И.</i>, ауд. 101
+PAIR_LINE_RE = re.compile(
+    r"(\d+)\) \d{2}:\d{2}-\d{2}:\d{2}: (.*?)(?=<br>\d+\) \d{2}:\d{2}-|$)", re.S
+)
+
+
+def parse_schedule_text(schedule_text: str) -> list[dict]:
+    """
+    Разбирает schedule_text, сформированный в add_schedule, обратно в список пар.
+    Нужна для заполнения schedule_slots по уже сохранённому расписанию.
+    """
+    pairs = []
+    for match in PAIR_LINE_RE.finditer(schedule_text or ""):
+        pair_number = int(match.group(1))
+        body = match.group(2)
+        if body.startswith("Пары нет"):
+            continue
+        subject = re.search(r"<b>(.*?)</b>", body)
+        lesson_type = re.search(r"</b> \((.*?)\)", body)
+        teacher = re.search(r"<i>(.*?)</i>", body)
+        room = re.search(r"ауд\. (.*)$", body)
+        subject = subject.group(1) if subject else ""
+        pairs.append({
+            "pair_number": pair_number,
+            "subject": "" if subject == "-" else subject,
+            "lesson_type": lesson_type.group(1) if lesson_type else "",
+            "teacher": teacher.group(1) if teacher else "",
+            "room": room.group(1).strip() if room else "",
+        })
+    return pairs
+
+
+def rebuild_schedule_slots(cur):
+    """Заполняет schedule_slots и schedule_versions по всем таблицам расписания (однократно, для старых данных)."""
+    for table_name, direction in (("schedule_PI", "ПИ"), ("schedule_PRI", "ПРИ"), ("schedule_BI", "БИ")):
+        cur.execute(f"SELECT group_number, week_type, day_of_week, schedule_text FROM {table_name}")
+        for row in cur.fetchall():
+            save_day_slots(cur, direction, row["group_number"], row["week_type"], row["day_of_week"],
+                           parse_schedule_text(row["schedule_text"]), skip_conflicts=True)
+    cur.execute("SELECT direction, group_number, week_type, day_of_week, schedule_text FROM schedule_other")
+    for row in cur.fetchall():
+        save_day_slots(cur, row["direction"], row["group_number"], row["week_type"], row["day_of_week"],
+                       parse_schedule_text(row["schedule_text"]), skip_conflicts=True)
+    cur.execute("""
+        INSERT INTO schedule_versions (direction, group_number)
+        SELECT DISTINCT direction, group_number FROM schedule_slots
+        ON CONFLICT DO NOTHING
+    """)
+
+
+def get_group_slots(cur, direction: str, group_number: str) -> list[dict]:
+    """Все пары группы за обе недели, отсортированные по неделе, дню и номеру пары."""
+    cur.execute("""
+        SELECT week_type, day_of_week, pair_number, subject, lesson_type, teacher, room
+          FROM schedule_slots
+         WHERE direction = %s AND group_number = %s
+         ORDER BY array_position(%s::text[], week_type),
+                  array_position(%s::text[], day_of_week),
+                  pair_number
+    """, (direction, group_number, WEEK_TYPES, DAYS_OF_WEEK))
+    return cur.fetchall()
+
+
+def find_teacher_slots(cur, query: str, limit: int = 500) -> list[dict]:
+    """
+    Все пары преподавателей, чьё ФИО начинается с query (без учёта регистра).
+    Результат отсортирован по преподавателю, типу недели, дню и номеру пары.
+    """
+    prefix = normalize_teacher_name(query)
+    if not prefix:
+        return []
+    # Экранируем спецсимволы LIKE, чтобы '%' и '_' в запросе искались буквально
+    prefix = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    cur.execute("""
+        SELECT teacher, direction, group_number, week_type, day_of_week, pair_number,
+               subject, lesson_type, room
+          FROM schedule_slots
+         WHERE teacher_norm <> '' AND teacher_norm LIKE %s
+         ORDER BY teacher_norm,
+                  array_position(%s::text[], week_type),
+                  array_position(%s::text[], day_of_week),
+                  pair_number
+         LIMIT %s
+    """, (prefix + "%", WEEK_TYPES, DAYS_OF_WEEK, limit))
+    return cur.fetchall()
@@ -0,0 +1,103 @@
+"""
+Формирование iCalendar-ленты (RFC 5545) с расписанием группы.
+Каждая пара – повторяющееся событие раз в две недели (четная/нечетная неделя)
+с первого подходящего дня семестра до его конца.
+"""
+import hashlib
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from schedule_db import (
+    PAIRS_INFO, DAYS_OF_WEEK, SEMESTER_START, SEMESTER_END, SCHEDULE_TIMEZONE, week_type_for_date,
+)
+
+def ical_etag(direction: str, group_number: str, version: int) -> str:
+    """ETag ленты: меняется при записи расписания группы или смене границ семестра."""
+    key = f"{direction}|{group_number}|{version}|{SEMESTER_START}|{SEMESTER_END}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:20]
+
+
+def _escape(text: str) -> str:
+    return (text.replace("\\", "\\\\").replace(";", "\\;")
+                .replace(",", "\\,").replace("\n", "\\n"))
+
+
+def _fold(line: str) -> str:
+    """Перенос строк длиннее 75 октетов (RFC 5545, 3.1)."""
+    encoded = line.encode("utf-8")
+    if len(encoded) <= 75:
+        return line
+    parts = []
+    current = ""
+    limit = 75
+    for char in line:
+        if len((current + char).encode("utf-8")) > limit:
+            parts.append(current)
+            current = char
+            limit = 74  # у продолжения первый октет – пробел
+        else:
+            current += char
+    parts.append(current)
+    return "\r\n ".join(parts)
+
+
+def _first_date(week_type: str, day_index: int):
+    """Первая дата семестра с нужным днём недели и типом недели."""
+    d = SEMESTER_START + timedelta(days=(day_index - SEMESTER_START.weekday()) % 7)
+    if week_type_for_date(d) != week_type:
+        d += timedelta(days=7)
+    return d if d <= SEMESTER_END else None
+
+
+def render_group_calendar(direction: str, group_number: str, slots: list[dict], updated_at: datetime) -> str:
+    tz = ZoneInfo(SCHEDULE_TIMEZONE)
+    offset = datetime.combine(SEMESTER_START, datetime.min.time(), tz).strftime("%z")
+    dtstamp = updated_at.astimezone(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    until = datetime.combine(SEMESTER_END, datetime.max.time(), tz).astimezone(timezone.utc)
+
+    lines = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        "PRODID:-//IIT-Helper//Schedule//RU",
+        "CALSCALE:GREGORIAN",
+        "METHOD:PUBLISH",
+        f"X-WR-CALNAME:{_escape(f'Расписание {direction}-{group_number}')}",
+        f"X-WR-TIMEZONE:{SCHEDULE_TIMEZONE}",
+        "BEGIN:VTIMEZONE",
+        f"TZID:{SCHEDULE_TIMEZONE}",
+        "BEGIN:STANDARD",
+        "DTSTART:19700101T000000",
+        f"TZOFFSETFROM:{offset}",
+        f"TZOFFSETTO:{offset}",
+        "END:STANDARD",
+        "END:VTIMEZONE",
+    ]
+    for slot in slots:
+        if slot["day_of_week"] not in DAYS_OF_WEEK or not 1 <= slot["pair_number"] <= len(PAIRS_INFO):
+            continue
+        day_index = DAYS_OF_WEEK.index(slot["day_of_week"])
+        first = _first_date(slot["week_type"], day_index)
+        if first is None:
+            continue
+        start_time, end_time = PAIRS_INFO[slot["pair_number"] - 1]
+        summary = slot["subject"] or "Пара"
+        if slot["lesson_type"]:
+            summary += f" ({slot['lesson_type']})"
+        uid = f"{direction}-{group_number}-{slot['week_type']}-{day_index}-{slot['pair_number']}@iit-helper"
+        lines += [
+            "BEGIN:VEVENT",
+            f"UID:{_escape(uid)}",
+            f"DTSTAMP:{dtstamp}",
+            f"DTSTART;TZID={SCHEDULE_TIMEZONE}:{first:%Y%m%d}T{start_time.replace(':', '')}00",
+            f"DTEND;TZID={SCHEDULE_TIMEZONE}:{first:%Y%m%d}T{end_time.replace(':', '')}00",
+            f"RRULE:FREQ=WEEKLY;INTERVAL=2;UNTIL={until:%Y%m%dT%H%M%SZ}",
+            f"SUMMARY:{_escape(summary)}",
+        ]
+        if slot["room"]:
+            lines.append(f"LOCATION:{_escape('ауд. ' + slot['room'])}")
+        if slot["teacher"]:
+            lines.append(f"DESCRIPTION:{_escape(slot['teacher'])}")
+        lines.append("END:VEVENT")
+    lines.append("END:VCALENDAR")
+    return "\r\n".join(_fold(line) for line in lines) + "\r\n"
+
@@ -0,0 +1,82 @@
+"""
+Статика панели деканата без внешнего CDN.
+build_assets.py собирает файлы с хэшем содержимого в имени (static/dist) и manifest.json;
+asset_url('bootstrap.min.css') возвращает /assets/bootstrap.min.<хэш>.css. Содержимое по такому
+адресу никогда не меняется, поэтому он отдаётся с Cache-Control: immutable на год, а рядом
+лежат заранее сжатые .br и .gz – отдаётся тот вариант, который принимает браузер.
+Пока сборки нет (manifest.json не найден), asset_url возвращает прежний адрес на CDN.
+"""
+import os
+import json
+import logging
+import mimetypes
+
+from flask import request, abort, send_from_directory
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+SOURCE_DIR = os.path.join(ROOT_DIR, "assets")
+DIST_DIR = os.path.join(ROOT_DIR, "static", "dist")
+MANIFEST_PATH = os.path.join(DIST_DIR, "manifest.json")
+ASSETS_URL = "/assets"
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+# Исходные файлы: имя -> (адрес на CDN, SRI-хэш для проверки скачанного)
+SOURCES = {
+    "bootstrap.min.css": (
+        "https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css",
+        "sha384-9ndCyUaIbzAi2FUVXJi0CjmCapSmO7SnpJef0486qhLnuZ2cdeRhO02iuK6FUUVM",
+    ),
+    "bootstrap.bundle.min.js": (
+        "https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/js/bootstrap.bundle.min.js",
+        "sha384-geWF76RCwLtnZ8qwWowPQNguL3RmwHVBC9FhGdlKrxdiJJigb/j/68SIy3Te4Bkz",
+    ),
+}
+# Заранее сжатые варианты в порядке предпочтения
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+def load_manifest() -> dict:
+    try:
+        with open(MANIFEST_PATH, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        logging.info("Статика не собрана (python build_assets.py), Bootstrap загружается с CDN.")
+    except (OSError, ValueError) as e:
+        logging.error(f"Не удалось прочитать {MANIFEST_PATH}: {e}")
+    return {}
+
+
+manifest = load_manifest()
+hashed_names = set(manifest.values())
+
+
+def asset_url(name: str) -> str:
+    hashed = manifest.get(name)
+    if hashed:
+        return f"{ASSETS_URL}/{hashed}"
+    return SOURCES[name][0]
+
+
+def hashed_asset(filename):
+    # Отдаются только файлы из манифеста, не произвольные пути из static/dist
+    if filename not in hashed_names:
+        abort(404)
+    path, encoding = filename, None
+    for name, suffix in ENCODINGS:
+        if name in request.accept_encodings and os.path.exists(os.path.join(DIST_DIR, filename + suffix)):
+            path, encoding = filename + suffix, name
+            break
+    response = send_from_directory(DIST_DIR, path, mimetype=mimetypes.guess_type(filename)[0],
+                                   max_age=IMMUTABLE_MAX_AGE)
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    response.vary.add("Accept-Encoding")
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+def init_static_assets(app):
+    """asset_url() в шаблонах и маршрут /assets/<файл с хэшем>."""
+    app.jinja_env.globals["asset_url"] = asset_url
+    app.add_url_rule(f"{ASSETS_URL}/<path:filename>", "hashed_asset", hashed_asset)
@@ -0,0 +1,274 @@
+"""
+Общие функции для работы с таблицей студентов.
+Используются и веб-панелью деканата (app.py), и ботом (main.py).
+"""
+import io
+import re
+import csv
+from psycopg2.extras import execute_values
+
+
+def parse_group(group_str: str) -> tuple[str, str]:
+    """'ПИ-201' / 'pri201' -> ('ПИ', '201'); нераспознанная группа -> ('OTHER', group_str)."""
+    match = re.match(r"([А-ЯЁA-Z]+)-?(\d+)", group_str, re.IGNORECASE)
+    if match:
+        return match.group(1).upper(), match.group(2)
+    return "OTHER", group_str
+
+
+def init_roster(cur):
+    """
+    Студенты из загруженного деканатом списка хранятся в students с telegram_id = NULL,
+    пока не будут привязаны к аккаунту Telegram. Уникальность по ФИО и группе
+    делает повторную загрузку того же списка безопасной.
+    """
+    cur.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS students_roster_unique_idx
+            ON students (lower(first_name), lower(last_name), direction, group_number)
+         WHERE telegram_id IS NULL
+    """)
+
+
+# -------------------- Сводка по группам --------------------
+
+# Триггер на уровне оператора: по таблицам переходов считает, на сколько изменились
+# счётчики каждой затронутой группы, и прибавляет разницу к строке group_stats.
+# Прибавление (а не пересчёт) безопасно при параллельных записях в одну группу.
+GROUP_STATS_FUNCTION = """
+    CREATE OR REPLACE FUNCTION group_stats_trigger() RETURNS trigger LANGUAGE plpgsql AS $$
+    DECLARE
+        added students[];
+        removed students[];
+    BEGIN
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            SELECT array_agg(n) INTO added FROM new_rows n;
+        END IF;
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            SELECT array_agg(o) INTO removed FROM old_rows o;
+        END IF;
+        INSERT INTO group_stats AS gs (direction, group_number, students, registered, with_credentials)
+        SELECT coalesce(direction, ''), coalesce(group_number, ''), sum(sign),
+               sum(sign * (telegram_id IS NOT NULL)::int),
+               sum(sign * (coalesce(user_login, '') <> '' AND coalesce(user_password, '') <> '')::int)
+          FROM (SELECT 1 AS sign, a.* FROM unnest(added) a
+                UNION ALL
+                SELECT -1 AS sign, r.* FROM unnest(removed) r) d
+         GROUP BY 1, 2
+        HAVING sum(sign) <> 0
+            OR sum(sign * (telegram_id IS NOT NULL)::int) <> 0
+            OR sum(sign * (coalesce(user_login, '') <> '' AND coalesce(user_password, '') <> '')::int) <> 0
+         ORDER BY 1, 2
+        ON CONFLICT (direction, group_number) DO UPDATE
+        SET students = gs.students + EXCLUDED.students,
+            registered = gs.registered + EXCLUDED.registered,
+            with_credentials = gs.with_credentials + EXCLUDED.with_credentials,
+            updated_at = now();
+        RETURN NULL;
+    END
+    $$
+"""
+
+
+def init_group_stats(cur):
+    """
+    group_stats – сколько студентов каждой группы в списке, сколько привязали Telegram
+    и сохранили логин/пароль портала. Обновляется триггерами на students только для
+    затронутых групп, поэтому панель читает сводку, не сканируя students.
+    При первом создании заполняется по имеющимся данным.
+    """
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS group_stats (
+            direction TEXT NOT NULL,
+            group_number TEXT NOT NULL,
+            students INTEGER NOT NULL DEFAULT 0,
+            registered INTEGER NOT NULL DEFAULT 0,
+            with_credentials INTEGER NOT NULL DEFAULT 0,
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            PRIMARY KEY (direction, group_number)
+        )
+    ''')
+    cur.execute(GROUP_STATS_FUNCTION)
+    for event, referencing in (("INSERT", "NEW TABLE AS new_rows"),
+                               ("UPDATE", "OLD TABLE AS old_rows NEW TABLE AS new_rows"),
+                               ("DELETE", "OLD TABLE AS old_rows")):
+        name = f"group_stats_{event.lower()}"
+        cur.execute(f"DROP TRIGGER IF EXISTS {name} ON students")
+        cur.execute(f"""
+            CREATE TRIGGER {name} AFTER {event} ON students
+            REFERENCING {referencing}
+            FOR EACH STATEMENT EXECUTE FUNCTION group_stats_trigger()
+        """)
+    cur.execute("SELECT EXISTS (SELECT 1 FROM group_stats) AS filled")
+    if not cur.fetchone()["filled"]:
+        rebuild_group_stats(cur)
+
+
+def rebuild_group_stats(cur):
+    """Полный пересчёт сводки по students (первое заполнение или исправление вручную)."""
+    cur.execute("DELETE FROM group_stats")
+    cur.execute("""
+        INSERT INTO group_stats (direction, group_number, students, registered, with_credentials)
+        SELECT coalesce(direction, ''), coalesce(group_number, ''), count(*), count(telegram_id),
+               count(*) FILTER (WHERE coalesce(user_login, '') <> '' AND coalesce(user_password, '') <> '')
+          FROM students
+         GROUP BY 1, 2
+    """)
+
+
+def get_group_stats(cur) -> list[dict]:
+    cur.execute("""
+        SELECT direction, group_number, students, registered, with_credentials
+          FROM group_stats
+         WHERE students > 0
+         ORDER BY direction, group_number
+    """)
+    return cur.fetchall()
+
+
+def _decode_roster(data: bytes) -> str:
+    for encoding in ("utf-8-sig", "cp1251"):
+        try:
+            return data.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    raise ValueError("Не удалось определить кодировку файла (ожидается UTF-8 или Windows-1251)")
+
+
+def parse_roster_csv(data: bytes) -> tuple[list[tuple], list[int]]:
+    """
+    Разбирает CSV со столбцами: имя, фамилия, группа[, telegram_id].
+    Разделитель – запятая или точка с запятой, строка заголовка необязательна.
+    Возвращает (строки для загрузки, номера пропущенных некорректных строк).
+    """
+    text = _decode_roster(data)
+    delimiter = ";" if text.split("\n", 1)[0].count(";") > text.split("\n", 1)[0].count(",") else ","
+    rows, skipped = [], []
+    for line_no, cols in enumerate(csv.reader(io.StringIO(text), delimiter=delimiter), start=1):
+        cols = [c.strip() for c in cols]
+        if not any(cols):
+            continue
+        if line_no == 1 and len(cols) >= 3 and not re.search(r"\d", cols[2]):
+            continue  # заголовок: в группе всегда есть номер
+        if len(cols) < 3 or not all(cols[:3]) or (len(cols) > 3 and cols[3] and not cols[3].isdigit()):
+            skipped.append(line_no)
+            continue
+        first_name, last_name, group = cols[:3]
+        direction, group_number = parse_group(group)
+        telegram_id = int(cols[3]) if len(cols) > 3 and cols[3] else None
+        rows.append((first_name, last_name, direction, group_number, telegram_id))
+    return rows, skipped
+
+
+def import_roster(conn, rows: list[tuple]) -> dict:
+    """
+    Загружает список студентов одной транзакцией: COPY во временную таблицу,
+    затем два INSERT ... SELECT с ON CONFLICT.
+    Строки с telegram_id обновляют/создают привязанных студентов, остальные
+    добавляются непривязанными, если такого студента ещё нет.
+    """
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for first_name, last_name, direction, group_number, telegram_id in rows:
+        writer.writerow([first_name, last_name, direction, group_number, "" if telegram_id is None else telegram_id])
+    buf.seek(0)
+
+    with conn.cursor() as cur:
+        cur.execute("""
+            CREATE TEMP TABLE roster_staging (
+                first_name TEXT,
+                last_name TEXT,
+                direction TEXT,
+                group_number TEXT,
+                telegram_id BIGINT
+            ) ON COMMIT DROP
+        """)
+        cur.copy_expert("COPY roster_staging FROM STDIN WITH (FORMAT csv)", buf)
+
+        cur.execute("""
+            INSERT INTO students (telegram_id, first_name, last_name, direction, group_number)
+            SELECT DISTINCT ON (telegram_id) telegram_id, first_name, last_name, direction, group_number
+              FROM roster_staging
+             WHERE telegram_id IS NOT NULL
+            ON CONFLICT (telegram_id) DO UPDATE
+            SET first_name = EXCLUDED.first_name,
+                last_name = EXCLUDED.last_name,
+                direction = EXCLUDED.direction,
+                group_number = EXCLUDED.group_number
+        """)
+        linked = cur.rowcount
+        # Студенты, которые теперь привязаны, больше не нужны в списке непривязанных
+        cur.execute("""
+            DELETE FROM students s
+             USING roster_staging r
+             WHERE s.telegram_id IS NULL AND r.telegram_id IS NOT NULL
+               AND lower(s.first_name) = lower(r.first_name)
+               AND lower(s.last_name) = lower(r.last_name)
+               AND s.direction = r.direction AND s.group_number = r.group_number
+        """)
+
+        cur.execute("""
+            INSERT INTO students (first_name, last_name, direction, group_number)
+            SELECT DISTINCT ON (lower(r.first_name), lower(r.last_name), r.direction, r.group_number)
+                   r.first_name, r.last_name, r.direction, r.group_number
+              FROM roster_staging r
+             WHERE r.telegram_id IS NULL
+               AND NOT EXISTS (
+                   SELECT 1 FROM students s
+                    WHERE s.telegram_id IS NOT NULL
+                      AND lower(s.first_name) = lower(r.first_name)
+                      AND lower(s.last_name) = lower(r.last_name)
+                      AND s.direction = r.direction AND s.group_number = r.group_number
+               )
+            ON CONFLICT (lower(first_name), lower(last_name), direction, group_number)
+                WHERE telegram_id IS NULL
+            DO NOTHING
+        """)
+        unlinked = cur.rowcount
+    conn.commit()
+    return {"linked": linked, "unlinked": unlinked}
+
+
+def link_roster_student(cur, telegram_id: int, first_name: str, last_name: str,
+                        direction: str | None = None, group_number: str | None = None):
+    """
+    Привязывает непривязанного студента из загруженного списка к аккаунту Telegram.
+    Привязка выполняется, только если кандидат ровно один (а группа, если задана, совпадает).
+    Возвращает {direction, group_number} привязанного студента или None.
+    """
+    if not first_name or not last_name:
+        return None
+    cur.execute("""
+        UPDATE students SET telegram_id = %(telegram_id)s
+         WHERE id = (
+             SELECT min(id) FROM students
+              WHERE telegram_id IS NULL
+                AND lower(first_name) = lower(%(first_name)s)
+                AND lower(last_name) = lower(%(last_name)s)
+                AND (%(direction)s::text IS NULL OR direction = %(direction)s)
+                AND (%(group_number)s::text IS NULL OR group_number = %(group_number)s)
+             HAVING count(*) = 1
+         )
+           AND NOT EXISTS (SELECT 1 FROM students WHERE telegram_id = %(telegram_id)s)
+        RETURNING direction, group_number
+    """, {
+        "telegram_id": telegram_id, "first_name": first_name, "last_name": last_name,
+        "direction": direction, "group_number": group_number,
+    })
+    return cur.fetchone()
+
+
+def link_roster_students(cur, rows: list[tuple]):
+    """
+    Пакетная версия link_roster_student для регистраций через бота.
+    rows – кортежи (telegram_id, first_name, last_name, direction, group_number).
+    """
+    execute_values(cur, """
+        UPDATE students s
+           SET telegram_id = v.telegram_id
+          FROM (VALUES %s) AS v(telegram_id, first_name, last_name, direction, group_number)
+         WHERE s.telegram_id IS NULL
+           AND lower(s.first_name) = lower(v.first_name)
+           AND lower(s.last_name) = lower(v.last_name)
+           AND s.direction = v.direction AND s.group_number = v.group_number
+           AND NOT EXISTS (SELECT 1 FROM students x WHERE x.telegram_id = v.telegram_id)
+    """, rows, template="(%s::bigint, %s, %s, %s, %s)", page_size=len(rows))
@@ -0,0 +1,263 @@
+"""
+Расписание недели картинкой: сетка «пары x дни» в PNG (Pillow).
+Картинка определяется хэшем содержимого – пар недели группы и версии отрисовки RENDER_VERSION.
+Первый запрос после изменения расписания рисует её и загружает в Telegram, дальше отправляется
+сохранённый file_id (в памяти и в таблице timetable_images): Telegram не принимает файл заново,
+а бот ничего не рисует. Одновременные запросы одной картинки ждут первого (single-flight),
+поэтому на одно изменение расписания приходится одна отрисовка, сколько бы студентов ни спросили.
+Если загрузка не удалась, ожидающие получают ту же ошибку, а следующий запрос пробует заново.
+"""
+import io
+import os
+import json
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import BufferedInputFile
+
+from schedule_db import (
+    PAIRS_INFO, DAYS_OF_WEEK, get_group_slots, get_timetable_image, save_timetable_image, delete_timetable_image,
+)
+from db import schedule_database
+from metrics import cache_hit, cache_miss
+from profiling import profiled_thread
+
+# Меняется вместе с оформлением картинки: старые file_id перестают подходить
+RENDER_VERSION = 1
+# Шрифт с кириллицей; по умолчанию DejaVu из системных шрифтов
+TIMETABLE_FONT = os.getenv("TIMETABLE_FONT", "DejaVuSans.ttf")
+TIMETABLE_FONT_BOLD = os.getenv("TIMETABLE_FONT_BOLD", "DejaVuSans-Bold.ttf")
+# Сколько file_id держать в памяти процесса
+TIMETABLE_IMAGE_CACHE_SIZE = 1000
+
+# Размеры сетки, px
+TITLE_HEIGHT = 64
+HEADER_HEIGHT = 44
+TIME_COLUMN_WIDTH = 120
+CELL_WIDTH = 250
+CELL_HEIGHT = 104
+PADDING = 8
+
+BACKGROUND = "#ffffff"
+HEADER_BACKGROUND = "#343a40"
+HEADER_TEXT = "#ffffff"
+PAIR_BACKGROUND = "#e7f1ff"
+GRID = "#dee2e6"
+TEXT = "#212529"
+MUTED = "#6c757d"
+
+
+def content_hash(direction: str, group_number: str, week_type: str, slots: list[dict]) -> str:
+    """Хэш всего, что видно на картинке: одинаковое расписание – одинаковый хэш."""
+    payload = [RENDER_VERSION, direction, group_number, week_type] + [
+        [s["day_of_week"], s["pair_number"], s["subject"], s["lesson_type"], s["teacher"], s["room"]]
+        for s in slots
+    ]
+    return hashlib.sha256(json.dumps(payload, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def _load_font(name: str, size: int):
+    from PIL import ImageFont
+    try:
+        return ImageFont.truetype(name, size)
+    except OSError:
+        logging.warning(f"Шрифт {name} не найден (TIMETABLE_FONT), кириллица на картинке может не отображаться.")
+        return ImageFont.load_default(size)
+
+
+def _wrap(draw, text: str, font, width: int, max_lines: int) -> list[str]:
+    """Переносит текст по словам в ширину width; лишнее обрезается многоточием."""
+    lines = []
+    for word in text.split():
+        if lines and draw.textlength(f"{lines[-1]} {word}", font=font) <= width:
+            lines[-1] = f"{lines[-1]} {word}"
+        else:
+            lines.append(word)
+    if len(lines) > max_lines:
+        lines = lines[:max_lines]
+        lines[-1] += "…"
+    for i, line in enumerate(lines):
+        while len(line) > 1 and draw.textlength(line, font=font) > width:
+            line = line[:-2] + "…"
+        lines[i] = line
+    return lines
+
+
+def render_week_png(direction: str, group_number: str, week_type: str, slots: list[dict]) -> bytes:
+    """Сетка недели: строки – пары из PAIRS_INFO, столбцы – дни из DAYS_OF_WEEK."""
+    from PIL import Image, ImageDraw
+
+    title_font = _load_font(TIMETABLE_FONT_BOLD, 26)
+    header_font = _load_font(TIMETABLE_FONT_BOLD, 17)
+    subject_font = _load_font(TIMETABLE_FONT_BOLD, 15)
+    text_font = _load_font(TIMETABLE_FONT, 14)
+
+    width = TIME_COLUMN_WIDTH + CELL_WIDTH * len(DAYS_OF_WEEK)
+    height = TITLE_HEIGHT + HEADER_HEIGHT + CELL_HEIGHT * len(PAIRS_INFO)
+    image = Image.new("RGB", (width, height), BACKGROUND)
+    draw = ImageDraw.Draw(image)
+
+    draw.text((PADDING * 2, TITLE_HEIGHT // 2), f"{direction}-{group_number}, {week_type} неделя",
+              font=title_font, fill=TEXT, anchor="lm")
+    draw.rectangle((0, TITLE_HEIGHT, width, TITLE_HEIGHT + HEADER_HEIGHT), fill=HEADER_BACKGROUND)
+    for col, day in enumerate(DAYS_OF_WEEK):
+        x = TIME_COLUMN_WIDTH + col * CELL_WIDTH + CELL_WIDTH // 2
+        draw.text((x, TITLE_HEIGHT + HEADER_HEIGHT // 2), day, font=header_font, fill=HEADER_TEXT, anchor="mm")
+
+    by_cell = {(s["day_of_week"], s["pair_number"]): s for s in slots}
+    for row, (start_time, end_time) in enumerate(PAIRS_INFO):
+        top = TITLE_HEIGHT + HEADER_HEIGHT + row * CELL_HEIGHT
+        draw.text((TIME_COLUMN_WIDTH // 2, top + CELL_HEIGHT // 2 - 10), f"{row + 1} пара",
+                  font=subject_font, fill=TEXT, anchor="mm")
+        draw.text((TIME_COLUMN_WIDTH // 2, top + CELL_HEIGHT // 2 + 12), f"{start_time}-{end_time}",
+                  font=text_font, fill=MUTED, anchor="mm")
+        for col, day in enumerate(DAYS_OF_WEEK):
+            left = TIME_COLUMN_WIDTH + col * CELL_WIDTH
+            slot = by_cell.get((day, row + 1))
+            if not slot:
+                continue
+            draw.rectangle((left, top, left + CELL_WIDTH, top + CELL_HEIGHT), fill=PAIR_BACKGROUND)
+            inner = CELL_WIDTH - PADDING * 2
+            y = top + PADDING
+            for line in _wrap(draw, slot["subject"] or "-", subject_font, inner, 2):
+                draw.text((left + PADDING, y), line, font=subject_font, fill=TEXT)
+                y += subject_font.size + 5
+            details = ", ".join(x for x in (slot["lesson_type"], slot["room"] and f"ауд. {slot['room']}") if x)
+            for text, color in ((details, TEXT), (slot["teacher"] or "", MUTED)):
+                for line in _wrap(draw, text, text_font, inner, 1):
+                    draw.text((left + PADDING, y), line, font=text_font, fill=color)
+                    y += text_font.size + 5
+
+    # Сетка поверх заливки ячеек
+    grid_top = TITLE_HEIGHT + HEADER_HEIGHT
+    for row in range(len(PAIRS_INFO) + 1):
+        y = grid_top + row * CELL_HEIGHT
+        draw.line((0, y, width, y), fill=GRID, width=1)
+    for col in range(len(DAYS_OF_WEEK) + 1):
+        x = TIME_COLUMN_WIDTH + col * CELL_WIDTH
+        draw.line((x, grid_top, x, height), fill=GRID, width=1)
+
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG", optimize=True)
+    return buffer.getvalue()
+
+
+class WeekImages:
+    """Отправка картинки недели: file_id из памяти или базы, иначе одна отрисовка и загрузка."""
+
+    def __init__(self, database=schedule_database, cache_size: int = TIMETABLE_IMAGE_CACHE_SIZE):
+        self.database = database
+        self.cache_size = cache_size
+        self._file_ids = OrderedDict()
+        self._inflight = {}      # хэш -> Future с file_id картинки, которую сейчас загружает другой запрос
+
+    # ----- база (вызываются в потоке) -----
+
+    def load_slots(self, direction: str, group_number: str, week_type: str) -> list[dict]:
+        conn = self.database.connect_read()
+        cur = conn.cursor()
+        slots = [s for s in get_group_slots(cur, direction, group_number) if s["week_type"] == week_type]
+        conn.close()
+        return slots
+
+    def lookup(self, digest: str) -> str | None:
+        conn = self.database.connect_read()
+        cur = conn.cursor()
+        file_id = get_timetable_image(cur, digest)
+        conn.close()
+        return file_id
+
+    def store(self, digest: str, direction: str, group_number: str, week_type: str, file_id: str | None):
+        """Сохраняет file_id; None – удалить запись (Telegram больше не принимает этот file_id)."""
+        conn = self.database.connect()
+        cur = conn.cursor()
+        if file_id is None:
+            delete_timetable_image(cur, digest)
+        else:
+            save_timetable_image(cur, digest, direction, group_number, week_type, file_id)
+        conn.commit()
+        conn.close()
+
+    # ----- отправка -----
+
+    def _remember(self, digest: str, file_id: str | None):
+        if file_id is None:
+            self._file_ids.pop(digest, None)
+            return
+        self._file_ids[digest] = file_id
+        self._file_ids.move_to_end(digest)
+        while len(self._file_ids) > self.cache_size:
+            self._file_ids.popitem(last=False)
+
+    async def _send_cached(self, message, digest: str, caption: str, key: tuple) -> bool:
+        file_id = self._file_ids.get(digest)
+        if file_id is None:
+            file_id = await asyncio.to_thread(self.lookup, digest)
+        if file_id is None:
+            return False
+        try:
+            await message.answer_photo(file_id, caption=caption)
+        except TelegramBadRequest as e:
+            logging.warning(f"file_id картинки {caption} больше не действует: {e}")
+            self._remember(digest, None)
+            await asyncio.to_thread(self.store, digest, *key, None)
+            return False
+        self._remember(digest, file_id)
+        return True
+
+    async def send(self, message, direction: str, group_number: str, week_type: str):
+        slots = await asyncio.to_thread(self.load_slots, direction, group_number, week_type)
+        caption = f"{direction}-{group_number}, {week_type} неделя"
+        if not slots:
+            await message.answer(f"Расписание для {caption} не найдено.")
+            return
+        key = (direction, group_number, week_type)
+        digest = content_hash(direction, group_number, week_type, slots)
+        if await self._send_cached(message, digest, caption, key):
+            cache_hit("timetable_image")
+            return
+        cache_miss("timetable_image")
+
+        inflight = self._inflight.get(digest)
+        if inflight is None:
+            # Пока искали в базе, картинку мог загрузить другой запрос
+            file_id = self._file_ids.get(digest)
+            if file_id is None:
+                await self._upload_once(message, digest, caption, key, slots)
+                return
+        else:
+            # Картинку уже рисует и загружает другой запрос: ждём его file_id
+            file_id = await asyncio.shield(inflight)
+        await message.answer_photo(file_id, caption=caption)
+
+    async def _upload_once(self, message, digest: str, caption: str, key: tuple, slots: list[dict]):
+        """Одна отрисовка и загрузка на хэш; остальные запросы ждут file_id из _inflight."""
+        future = asyncio.get_running_loop().create_future()
+        # Ошибку получат только те, кто ждёт эту картинку; без ожидающих она не должна попадать в лог
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._inflight[digest] = future
+        try:
+            png = await asyncio.to_thread(profiled_thread(render_week_png), *key, slots)
+            sent = await message.answer_photo(
+                BufferedInputFile(png, filename=f"{key[0]}-{key[1]}.png"), caption=caption)
+            file_id = sent.photo[-1].file_id
+        except asyncio.CancelledError:
+            future.set_exception(RuntimeError(f"загрузка картинки {caption} отменена"))
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            del self._inflight[digest]
+        self._remember(digest, file_id)
+        future.set_result(file_id)
+        try:
+            await asyncio.to_thread(self.store, digest, *key, file_id)
+        except Exception as e:
+            logging.error(f"Не удалось сохранить file_id картинки {caption}: {e}")
+
+
+week_images = WeekImages()
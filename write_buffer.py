@@ -0,0 +1,154 @@
+"""
+Буфер отложенной записи в таблицу students для бота.
+Во время массовой регистрации каждое сообщение приводило к отдельному подключению и COMMIT.
+Буфер собирает записи за несколько миллисекунд и пишет их одной транзакцией
+многострочными INSERT ... ON CONFLICT / UPDATE ... FROM (VALUES ...).
+"""
+import asyncio
+import logging
+import psycopg2
+from psycopg2.extras import execute_values
+
+from students_db import link_roster_students
+
+# Сколько ждать других записей перед сбросом и максимальный размер пачки
+FLUSH_DELAY = 0.005
+MAX_BATCH = 500
+
+
+class StudentWriteBuffer:
+    """
+    upsert_student() и update_credentials() возвращаются только после того, как пачка
+    с этой записью зафиксирована в базе (групповой COMMIT), поэтому ошибки записи
+    по-прежнему видны обработчику, а последующие запросы того же пользователя
+    читают уже записанные данные. Параллельные чтения до сброса должны вызывать
+    wait_flushed(telegram_id).
+    Если пачка не записалась, её записи повторяются по одной: ошибку получает только
+    обработчик строки, которую база не принимает, остальные пользователи не страдают.
+    """
+
+    def __init__(self, get_db_connection, delay: float = FLUSH_DELAY, max_batch: int = MAX_BATCH,
+                 on_written=None):
+        self.get_db_connection = get_db_connection
+        # Вызывается с telegram_id каждой записи после COMMIT (например, Database.mark_written)
+        self.on_written = on_written
+        self.delay = delay
+        self.max_batch = max_batch
+        self._profiles = {}      # telegram_id -> (first_name, last_name, direction, group_number)
+        self._credentials = {}   # telegram_id -> (user_login, user_password)
+        self._waiters = []       # (telegram_id, future)
+        self._writing = set()    # telegram_id пачки, которая пишется прямо сейчас
+        self._flush_task = None
+        self._flush_lock = asyncio.Lock()
+
+    async def upsert_student(self, telegram_id: int, first_name: str, last_name: str,
+                             direction: str, group_number: str):
+        self._profiles[telegram_id] = (first_name, last_name, direction, group_number)
+        await self._enqueue(telegram_id)
+
+    async def update_credentials(self, telegram_id: int, user_login: str, user_password: str):
+        self._credentials[telegram_id] = (user_login, user_password)
+        await self._enqueue(telegram_id)
+
+    def has_pending(self, telegram_id: int) -> bool:
+        return telegram_id in self._profiles or telegram_id in self._credentials
+
+    async def wait_flushed(self, telegram_id: int):
+        """
+        Чтение своих записей: если у пользователя есть несброшенные данные, сбрасываем их сейчас.
+        Если его запись уже в пачке, которая пишется, flush() дождётся её COMMIT на _flush_lock.
+        """
+        if self.has_pending(telegram_id) or telegram_id in self._writing:
+            await self.flush()
+
+    async def close(self):
+        """Сброс всех ожидающих записей при остановке бота."""
+        await self.flush()
+
+    async def _enqueue(self, telegram_id: int):
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append((telegram_id, future))
+        if len(self._profiles) + len(self._credentials) >= self.max_batch:
+            asyncio.create_task(self.flush())
+        elif self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_later())
+        await future
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.delay)
+        await self.flush()
+
+    async def flush(self):
+        async with self._flush_lock:
+            profiles, self._profiles = self._profiles, {}
+            credentials, self._credentials = self._credentials, {}
+            waiters, self._waiters = self._waiters, []
+            self._flush_task = None
+            if not waiters:
+                return
+            self._writing = profiles.keys() | credentials.keys()
+            try:
+                await asyncio.to_thread(self._write, profiles, credentials)
+                errors = {}
+            except psycopg2.OperationalError as e:
+                # База недоступна: повтор по одной ничего не даст
+                logging.error(f"Ошибка пакетной записи студентов ({len(waiters)} записей): {e}")
+                errors = dict.fromkeys(self._writing, e)
+            except Exception as e:
+                logging.error(f"Ошибка пакетной записи студентов ({len(waiters)} записей), "
+                              f"повторяем по одной: {e}")
+                errors = await asyncio.to_thread(self._write_each, profiles, credentials)
+            finally:
+                self._writing = set()
+            for telegram_id, future in waiters:
+                if future.done():
+                    continue
+                if telegram_id in errors:
+                    future.set_exception(errors[telegram_id])
+                else:
+                    future.set_result(None)
+
+    def _write_each(self, profiles: dict, credentials: dict) -> dict:
+        """Записывает каждого пользователя отдельной транзакцией; возвращает telegram_id -> ошибка."""
+        errors = {}
+        for telegram_id in profiles.keys() | credentials.keys():
+            profile = {telegram_id: profiles[telegram_id]} if telegram_id in profiles else {}
+            credential = {telegram_id: credentials[telegram_id]} if telegram_id in credentials else {}
+            try:
+                self._write(profile, credential)
+            except Exception as e:
+                logging.error(f"Ошибка записи студента {telegram_id}: {e}")
+                errors[telegram_id] = e
+        return errors
+
+    def _write(self, profiles: dict, credentials: dict):
+        conn = self.get_db_connection()
+        try:
+            cur = conn.cursor()
+            if profiles:
+                rows = [(telegram_id, *values) for telegram_id, values in profiles.items()]
+                # Студенты из загруженного деканатом списка привязываются, а не создаются заново
+                link_roster_students(cur, rows)
+                execute_values(cur, """
+                    INSERT INTO students (telegram_id, first_name, last_name, direction, group_number)
+                    VALUES %s
+                    ON CONFLICT (telegram_id) DO UPDATE
+                    SET first_name = EXCLUDED.first_name,
+                        last_name = EXCLUDED.last_name,
+                        direction = EXCLUDED.direction,
+                        group_number = EXCLUDED.group_number
+                """, rows, page_size=len(rows))
+            if credentials:
+                execute_values(cur, """
+                    UPDATE students s
+                       SET user_login = v.user_login, user_password = v.user_password
+                      FROM (VALUES %s) AS v(telegram_id, user_login, user_password)
+                     WHERE s.telegram_id = v.telegram_id
+                """, [(telegram_id, *values) for telegram_id, values in credentials.items()],
+                    template="(%s::bigint, %s, %s)", page_size=len(credentials))
+            conn.commit()
+        finally:
+            conn.close()
+        if self.on_written is not None:
+            for telegram_id in profiles.keys() | credentials.keys():
+                self.on_written(telegram_id)